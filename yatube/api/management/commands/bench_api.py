@@ -0,0 +1,81 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.test import Client, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from core.benchmark import measure, scratch_database
+from posts.models import Comment, Follow, Group, Post, User
+from posts.utils import explicit_auto_now
+
+NO_CACHE = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.dummy.DummyCache',
+    }
+}
+AUTHORS = 20
+
+
+class Command(BaseCommand):
+    help = ('Запросов в секунду у JSON API и HTML-страниц с теми же '
+            'данными. Данные создаются во временной БД, кеш страниц '
+            'выключен, чтобы сравнивать отрисовку.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=10000)
+        parser.add_argument('--repeat', type=int, default=200)
+
+    def seed(self, count):
+        reader = User.objects.create_user(username='reader')
+        group = Group.objects.create(title='Группа', slug='group')
+        authors = [User.objects.create_user(username=f'author_{i}',
+                                            first_name=f'Автор {i}')
+                   for i in range(AUTHORS)]
+        now = timezone.now()
+        with explicit_auto_now(Post, 'pub_date'):
+            Post.objects.bulk_create(
+                (Post(author=authors[i % AUTHORS], group=group,
+                      text=f'Пост {i} ' * 20,
+                      pub_date=now - timedelta(minutes=i))
+                 for i in range(count)),
+                batch_size=500,
+            )
+        post = Post.objects.order_by('-pub_date').first()
+        Comment.objects.bulk_create(
+            Comment(author=reader, post=post, text=f'Комментарий {i}')
+            for i in range(50))
+        for author in authors:
+            Follow.objects.create(user=reader, author=author)
+        return reader, post
+
+    def pairs(self, post):
+        author = post.author.username
+        return (
+            ('главная', reverse('posts:index'), reverse('api:post_list')),
+            ('пост', reverse('posts:post_detail', args=[post.id]),
+             reverse('api:post_detail', args=[post.id])),
+            ('группа', reverse('posts:group_posts', args=['group']),
+             reverse('api:group_posts', args=['group'])),
+            ('профиль', reverse('posts:profile', args=[author]),
+             reverse('api:profile_posts', args=[author])),
+            ('подписки', reverse('posts:follow_index'),
+             reverse('api:follow_feed')),
+        )
+
+    def handle(self, *args, **options):
+        repeat = options['repeat']
+        with scratch_database(), \
+                override_settings(CACHES=NO_CACHE, DEBUG=False):
+            reader, post = self.seed(options['posts'])
+            client = Client()
+            client.force_login(reader)
+            for name, html_url, api_url in self.pairs(post):
+                results = []
+                for kind, url in (('HTML', html_url), ('API', api_url)):
+                    size = len(client.get(url).content)
+                    timing = measure(lambda: client.get(url), repeat)
+                    results.append(
+                        f'{kind} {1000 / timing["median"]:.0f} запр/с '
+                        f'(p95 {timing["p95"]:.2f} мс, {size} байт)')
+                self.stdout.write(f'{name}: ' + ', '.join(results))
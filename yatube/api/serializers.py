@@ -0,0 +1,105 @@
+from django.core.files.storage import default_storage
+
+
+def isoformat(value):
+    return value.isoformat() if value is not None else None
+
+
+def image(row):
+    if not row['image']:
+        return None
+    return {
+        'url': default_storage.url(row['image']),
+        'width': row['image_width'],
+        'height': row['image_height'],
+    }
+
+
+class UnknownFields(Exception):
+    """В ?fields= есть поля, которых у сериализатора нет."""
+
+
+class Serializer:
+    """Сериализатор строк values(): только запрошенные поля.
+
+    fields: имя поля -> (колонки для values(), функция от строки).
+    Запрос выбирает лишь колонки нужных полей, а соединения с другими
+    таблицами появляются, только если поле их требует.
+    """
+
+    fields = {}
+
+    def __init__(self, names=None):
+        names = list(dict.fromkeys(names or self.fields))
+        unknown = [name for name in names if name not in self.fields]
+        if unknown:
+            raise UnknownFields(
+                f'Неизвестные поля: {", ".join(unknown)}. '
+                f'Доступны: {", ".join(self.fields)}.')
+        self.names = names
+        self.getters = [(name, self.fields[name][1]) for name in names]
+
+    @classmethod
+    def from_request(cls, request):
+        fields = request.GET.get('fields', '')
+        return cls([name.strip() for name in fields.split(',')
+                    if name.strip()])
+
+    def columns(self):
+        return list(dict.fromkeys(
+            column for name in self.names for column in self.fields[name][0]
+        ))
+
+    def rows(self, queryset):
+        return queryset.values(*self.columns())
+
+    def __call__(self, row):
+        return {name: getter(row) for name, getter in self.getters}
+
+
+class PostSerializer(Serializer):
+    fields = {
+        'id': (('id',), lambda row: row['id']),
+        'text': (('text',), lambda row: row['text']),
+        'pub_date': (('pub_date',), lambda row: isoformat(row['pub_date'])),
+        'author': (('author__username',),
+                   lambda row: row['author__username']),
+        'group': (('group__slug',), lambda row: row['group__slug']),
+        'image': (('image', 'image_width', 'image_height'), image),
+    }
+
+
+class CommentSerializer(Serializer):
+    fields = {
+        'id': (('id',), lambda row: row['id']),
+        'post': (('post_id',), lambda row: row['post_id']),
+        'author': (('author__username',),
+                   lambda row: row['author__username']),
+        'text': (('text',), lambda row: row['text']),
+        'created': (('created',), lambda row: isoformat(row['created'])),
+    }
+
+
+class GroupSerializer(Serializer):
+    fields = {
+        'id': (('id',), lambda row: row['id']),
+        'title': (('title',), lambda row: row['title']),
+        'slug': (('slug',), lambda row: row['slug']),
+        'description': (('description',), lambda row: row['description']),
+    }
+
+
+class ProfileSerializer(Serializer):
+    fields = {
+        'username': (('username',), lambda row: row['username']),
+        'first_name': (('first_name',), lambda row: row['first_name']),
+        'last_name': (('last_name',), lambda row: row['last_name']),
+        'posts': (('counters__posts',),
+                  lambda row: row['counters__posts'] or 0),
+        'comments': (('counters__comments',),
+                     lambda row: row['counters__comments'] or 0),
+        'followers': (('counters__followers',),
+                      lambda row: row['counters__followers'] or 0),
+        'following': (('counters__following',),
+                      lambda row: row['counters__following'] or 0),
+    }
@@ -0,0 +1,109 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from api import views
+from posts.models import Comment, Follow, Group, Post, User
+
+POSTS_COUNT = 5
+
+
+class ApiTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='author',
+                                              first_name='Лев')
+        cls.group = Group.objects.create(title='Группа', slug='group')
+        for i in range(POSTS_COUNT):
+            cls.post = Post.objects.create(author=cls.author, group=cls.group,
+                                           text=f'Пост {i}')
+        Comment.objects.create(author=cls.reader, post=cls.post,
+                               text='Комментарий')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_post_list_cursor_and_fields(self):
+        """Список постов листается курсором и отдает только ?fields=."""
+        url = reverse('api:post_list')
+        with self.assertNumQueries(1):
+            first = self.client.get(url, {'limit': 3,
+                                          'fields': 'id,author'}).json()
+        self.assertEqual(first['results'][0],
+                         {'id': self.post.id, 'author': 'author'})
+        self.assertIsNone(first['previous'])
+        rest = self.client.get(first['next']).json()
+        ids = [post['id'] for post in first['results'] + rest['results']]
+        self.assertEqual(ids, list(Post.objects.order_by(
+            '-pub_date', '-id').values_list('id', flat=True)))
+        self.assertIsNone(rest['next'])
+
+    def test_unknown_field(self):
+        response = self.client.get(reverse('api:post_list'),
+                                   {'fields': 'id,password'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('password', response.json()['detail'])
+
+    def test_other_errors_are_not_bad_requests(self):
+        """Ошибка в представлении не выдается клиенту как ответ 400."""
+        with mock.patch('api.views.get_limit', side_effect=ValueError):
+            with self.assertRaises(ValueError):
+                self.client.get(reverse('api:post_list'))
+
+    def test_view_metadata_kept(self):
+        self.assertEqual(views.post_list.__module__, 'api.views')
+        self.assertEqual(views.group_list.__doc__,
+                         views.group_list.__wrapped__.__doc__)
+
+    def test_details(self):
+        """Пост, группа и профиль отдаются одним запросом."""
+        expected = {
+            reverse('api:post_detail', args=[self.post.id]): {
+                'text': self.post.text, 'group': 'group', 'image': None},
+            reverse('api:group_detail', args=['group']): {
+                'title': 'Группа'},
+            reverse('api:profile_detail', args=['author']): {
+                'first_name': 'Лев', 'posts': POSTS_COUNT, 'followers': 1},
+        }
+        for url, fields in expected.items():
+            with self.subTest(url=url):
+                with self.assertNumQueries(1):
+                    data = self.client.get(url).json()
+                self.assertEqual({name: data[name] for name in fields},
+                                 fields)
+
+    def test_nested_lists(self):
+        urls = {
+            reverse('api:comment_list', args=[self.post.id]): 1,
+            reverse('api:group_posts', args=['group']): POSTS_COUNT,
+            reverse('api:profile_posts', args=['author']): POSTS_COUNT,
+            reverse('api:group_list'): 1,
+        }
+        for url, count in urls.items():
+            with self.subTest(url=url):
+                self.assertEqual(
+                    len(self.client.get(url).json()['results']), count)
+
+    def test_not_found(self):
+        urls = (
+            reverse('api:post_detail', args=[0]),
+            reverse('api:comment_list', args=[0]),
+            reverse('api:group_posts', args=['missing']),
+            reverse('api:profile_posts', args=['missing']),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(url).status_code, 404)
+
+    def test_feed(self):
+        url = reverse('api:follow_feed')
+        self.assertEqual(self.client.get(url).status_code, 401)
+        self.client.force_login(self.reader)
+        data = self.client.get(url, {'fields': 'id'}).json()
+        self.assertEqual(len(data['results']), POSTS_COUNT)
@@ -0,0 +1,156 @@
+from functools import wraps
+
+from django.http import JsonResponse
+from django.views.decorators.http import require_safe
+
+from posts import feed
+from posts.models import Comment, Group, Post, User
+from posts.paginators import CursorPaginator
+
+from .serializers import (CommentSerializer, GroupSerializer, PostSerializer,
+                          ProfileSerializer, UnknownFields)
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+# Кириллица без \uXXXX: ответ почти вдвое короче.
+JSON_PARAMS = {'ensure_ascii': False}
+
+
+def json_response(data, status=200):
+    return JsonResponse(data, status=status, json_dumps_params=JSON_PARAMS)
+
+
+def error(detail, status):
+    return json_response({'detail': detail}, status)
+
+
+def not_found():
+    return error('Не найдено.', 404)
+
+
+def api_view(view):
+    """Только GET/HEAD; неизвестные поля в ?fields= дают ответ 400."""
+    @require_safe
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        try:
+            return view(request, *args, **kwargs)
+        except UnknownFields as exc:
+            return error(str(exc), 400)
+    return wrapper
+
+
+def get_limit(request):
+    try:
+        limit = int(request.GET.get('limit', DEFAULT_LIMIT))
+    except ValueError:
+        return DEFAULT_LIMIT
+    return min(max(limit, 1), MAX_LIMIT)
+
+
+def page_link(request, cursor):
+    if cursor is None:
+        return None
+    params = request.GET.copy()
+    params['cursor'] = cursor
+    return f'{request.path}?{params.urlencode()}'
+
+
+def cursor_list(request, queryset, serializer_class,
+                keys=('pub_date', 'id')):
+    """Страница списка по курсору одним запросом к БД."""
+    serializer = serializer_class.from_request(request)
+    paginator = CursorPaginator(serializer.rows(queryset), get_limit(request),
+                                keys)
+    page = paginator.get_page(request.GET.get('cursor'))
+    return {
+        'results': [serializer(row) for row in page],
+        'next': page_link(request, page.next_cursor),
+        'previous': page_link(request, page.previous_cursor),
+    }
+
+
+def detail(request, queryset, serializer_class):
+    serializer = serializer_class.from_request(request)
+    row = serializer.rows(queryset).first()
+    if row is None:
+        return not_found()
+    return json_response(serializer(row))
+
+
+@api_view
+def post_list(request):
+    return json_response(cursor_list(request, Post.objects.all(),
+                                     PostSerializer))
+
+
+@api_view
+def post_detail(request, post_id):
+    return detail(request, Post.objects.filter(pk=post_id), PostSerializer)
+
+
+@api_view
+def comment_list(request, post_id):
+    data = cursor_list(request, Comment.objects.filter(post=post_id),
+                       CommentSerializer, ('created', 'id'))
+    # Пустой ответ бывает и у поста без комментариев: проверяем пост
+    # только тогда, чтобы обычный запрос оставался одним.
+    if not data['results'] and not Post.objects.filter(pk=post_id).exists():
+        return not_found()
+    return json_response(data)
+
+
+@api_view
+def group_list(request):
+    """Группы по возрастанию id; курсор - id последней в странице."""
+    serializer = GroupSerializer.from_request(request)
+    groups = Group.objects.order_by('id').values('id', *serializer.columns())
+    cursor = request.GET.get('cursor', '')
+    if cursor.isdigit():
+        groups = groups.filter(id__gt=int(cursor))
+    limit = get_limit(request)
+    rows = list(groups[:limit + 1])
+    next_cursor = str(rows[limit - 1]['id']) if len(rows) > limit else None
+    return json_response({
+        'results': [serializer(row) for row in rows[:limit]],
+        'next': page_link(request, next_cursor),
+    })
+
+
+@api_view
+def group_detail(request, slug):
+    return detail(request, Group.objects.filter(slug=slug), GroupSerializer)
+
+
+@api_view
+def group_posts(request, slug):
+    data = cursor_list(request, Post.objects.filter(group__slug=slug),
+                       PostSerializer)
+    if not data['results'] and not Group.objects.filter(slug=slug).exists():
+        return not_found()
+    return json_response(data)
+
+
+@api_view
+def profile_detail(request, username):
+    return detail(request, User.objects.filter(username=username),
+                  ProfileSerializer)
+
+
+@api_view
+def profile_posts(request, username):
+    data = cursor_list(request, Post.objects.filter(author__username=username),
+                       PostSerializer)
+    if (not data['results']
+            and not User.objects.filter(username=username).exists()):
+        return not_found()
+    return json_response(data)
+
+
+@api_view
+def follow_feed(request):
+    if not request.user.is_authenticated:
+        return error('Нужна авторизация.', 401)
+    return json_response(cursor_list(
+        request, feed.feed_posts(request.user), PostSerializer,
+        feed.CURSOR_KEYS))
@@ -0,0 +1,134 @@
+import json
+
+from django.conf import settings
+from django.contrib import admin
+from django.core.exceptions import PermissionDenied
+from django.http import FileResponse, Http404
+from django.shortcuts import get_object_or_404
+from django.urls import path, reverse
+from django.utils.html import format_html
+
+from . import profiling
+from .models import MemoryDiagnostic, RequestProfile
+
+
+class DiagnosticAdmin(admin.ModelAdmin):
+    """Записи диагностики только для просмотра; над списком - ключ
+    запуска для вошедшего сотрудника."""
+
+    change_list_template = 'admin/core/diagnostic_change_list.html'
+    empty_value_display = '-пусто-'
+    trigger_subject = ''
+    trigger_parameter = ''
+    trigger_header = ''
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def changelist_view(self, request, extra_context=None):
+        extra_context = {
+            **(extra_context or {}),
+            'trigger_subject': self.trigger_subject,
+            'trigger_parameter': getattr(settings, self.trigger_parameter),
+            'trigger_header': self.trigger_header,
+            'trigger_token': profiling.token(request.user),
+        }
+        return super().changelist_view(request, extra_context)
+
+
+class RequestProfileAdmin(DiagnosticAdmin):
+    list_display = ('pk',
+                    'created',
+                    'method',
+                    'path',
+                    'view',
+                    'status',
+                    'duration_ms',
+                    'user',
+                    'download',
+                    )
+    list_filter = ('created', 'view')
+    search_fields = ('path',)
+    fields = ('created', 'user', 'method', 'path', 'view', 'status',
+              'duration_ms', 'download', 'summary_text')
+    readonly_fields = fields
+    trigger_subject = 'профиль запроса'
+    trigger_parameter = 'PROFILING_PARAMETER'
+    trigger_header = 'X-Profile-Token'
+
+    def download(self, obj):
+        url = reverse('admin:core_requestprofile_download', args=[obj.pk])
+        return format_html('<a href="{}">.pstats</a>', url)
+    download.short_description = 'Файл'
+
+    def summary_text(self, obj):
+        return format_html('<pre>{}</pre>', obj.summary)
+    summary_text.short_description = 'Сводка'
+
+    def get_urls(self):
+        return [
+            path('<int:pk>/download/',
+                 self.admin_site.admin_view(self.download_view),
+                 name='core_requestprofile_download'),
+        ] + super().get_urls()
+
+    def download_view(self, request, pk):
+        if not self.has_view_permission(request):
+            raise PermissionDenied
+        record = get_object_or_404(RequestProfile, pk=pk)
+        try:
+            file = record.stats.open('rb')
+        except FileNotFoundError:
+            raise Http404
+        return FileResponse(file, as_attachment=True,
+                            filename=f'profile-{record.pk}.pstats')
+
+    def delete_model(self, request, obj):
+        obj.stats.delete(save=False)
+        super().delete_model(request, obj)
+
+    def delete_queryset(self, request, queryset):
+        for obj in queryset:
+            obj.stats.delete(save=False)
+        super().delete_queryset(request, queryset)
+
+
+class MemoryDiagnosticAdmin(DiagnosticAdmin):
+    list_display = ('pk',
+                    'created',
+                    'kind',
+                    'view',
+                    'path',
+                    'size_diff',
+                    'traced',
+                    'pid',
+                    'user',
+                    )
+    list_filter = ('kind', 'created', 'view')
+    search_fields = ('path', 'view')
+    fields = ('created', 'kind', 'pid', 'user', 'path', 'view', 'size_diff',
+              'traced', 'sites_text', 'views_text')
+    readonly_fields = fields
+    trigger_subject = 'снимки памяти вокруг запроса'
+    trigger_parameter = 'MEMORY_PARAMETER'
+    trigger_header = 'X-Memory-Token'
+
+    def sites_text(self, obj):
+        lines = [f'{size_diff:>+12} Б {count_diff:>+8} блоков  {site}'
+                 for site, size_diff, count_diff in json.loads(obj.sites)]
+        return format_html('<pre>{}</pre>', '\n'.join(lines))
+    sites_text.short_description = 'Места выделения'
+
+    def views_text(self, obj):
+        views = json.loads(obj.views or '{}')
+        lines = [f'{size_diff:>+12} Б  {view or "-"}' for view, size_diff
+                 in sorted(views.items(), key=lambda item: -item[1])]
+        return format_html('<pre>{}</pre>', '\n'.join(lines))
+    views_text.short_description = 'Прирост по представлениям'
+
+
+admin.site.register(RequestProfile, RequestProfileAdmin)
+admin.site.register(MemoryDiagnostic, MemoryDiagnosticAdmin)
@@ -0,0 +1,111 @@
+import os
+import statistics
+import tempfile
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connection
+from django.template.base import Template
+from django.test import override_settings
+
+
+@contextmanager
+def private_cache():
+    """Кеш по умолчанию в отдельном временном файле.
+
+    Кеш общий для процессов хоста: без этого cache.clear() тестов и
+    замеров стирал бы кеш работающих воркеров, а их записи попадали бы
+    в проверки.
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        default = {**settings.CACHES['default'],
+                   'LOCATION': os.path.join(directory, 'cache.sqlite3')}
+        with override_settings(CACHES={**settings.CACHES,
+                                       'default': default}):
+            yield
+
+
+@contextmanager
+def scratch_database():
+    """Временные тестовая БД и кеш, чтобы замеры не трогали рабочие
+    данные."""
+    old_name = connection.settings_dict['NAME']
+    connection.creation.create_test_db(
+        verbosity=0, autoclobber=True, serialize=False)
+    try:
+        with private_cache():
+            yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+def percentile(timings, share):
+    """Перцентиль отсортированного списка без интерполяции."""
+    return timings[round(share * (len(timings) - 1))]
+
+
+def measure(func, repeat=20):
+    """Время вызова func в миллисекундах: медиана, 95-й и 99-й
+    перцентили."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return {
+        'median': statistics.median(timings),
+        'p95': percentile(timings, 0.95),
+        'p99': percentile(timings, 0.99),
+    }
+
+
+class QueryTimer:
+    """Обертка connection.execute_wrapper: число запросов и их время
+    в миллисекундах."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += (time.perf_counter() - start) * 1000
+            self.count += 1
+
+
+class TemplateTimer:
+    """Время отрисовки шаблонов в миллисекундах.
+
+    Считаются только внешние вызовы Template.render: include и
+    наследование уже входят в их время.
+    """
+
+    def __init__(self):
+        self.duration = 0.0
+        self.depth = 0
+
+    @contextmanager
+    def installed(self):
+        render = Template.render
+        timer = self
+
+        def timed_render(template, context):
+            timer.depth += 1
+            start = time.perf_counter()
+            try:
+                return render(template, context)
+            finally:
+                timer.depth -= 1
+                if not timer.depth:
+                    timer.duration += (time.perf_counter() - start) * 1000
+
+        Template.render = timed_render
+        try:
+            yield self
+        finally:
+            Template.render = render
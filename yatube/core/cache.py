@@ -0,0 +1,271 @@
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+from django.core.cache.backends import locmem
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+from .timing import CacheStatsMixin
+
+# Предел SQLite на число параметров в одном запросе.
+MAX_VARIABLES = 900
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value BLOB '
+    'NOT NULL, expires REAL, accessed REAL NOT NULL, size INTEGER NOT '
+    'NULL) WITHOUT ROWID',
+    'CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed)',
+    'CREATE INDEX IF NOT EXISTS cache_expires ON cache (expires)',
+    # Число и объем записей ведут триггеры в той же транзакции, что и
+    # запись: все процессы видят одни и те же итоги.
+    'CREATE TABLE IF NOT EXISTS cache_stats (id INTEGER PRIMARY KEY, '
+    'entries INTEGER NOT NULL, size INTEGER NOT NULL)',
+    'INSERT OR IGNORE INTO cache_stats VALUES (1, 0, 0)',
+    'CREATE TRIGGER IF NOT EXISTS cache_insert AFTER INSERT ON cache '
+    'BEGIN UPDATE cache_stats SET entries = entries + 1, '
+    'size = size + NEW.size; END',
+    'CREATE TRIGGER IF NOT EXISTS cache_delete AFTER DELETE ON cache '
+    'BEGIN UPDATE cache_stats SET entries = entries - 1, '
+    'size = size - OLD.size; END',
+    'CREATE TRIGGER IF NOT EXISTS cache_update AFTER UPDATE OF size ON cache '
+    'BEGIN UPDATE cache_stats SET size = size + NEW.size - OLD.size; END',
+)
+UPSERT_SQL = (
+    'INSERT INTO cache (key, value, expires, accessed, size) '
+    'VALUES (?, ?, ?, ?, ?) ON CONFLICT (key) DO UPDATE SET '
+    'value = excluded.value, expires = excluded.expires, '
+    'accessed = excluded.accessed, size = excluded.size')
+
+
+def chunks(items, size=MAX_VARIABLES):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+class LocMemCache(CacheStatsMixin, locmem.LocMemCache):
+    """LocMemCache с учетом попаданий в замере ServerTimingMiddleware."""
+
+
+class BaseSQLiteCache(BaseCache):
+    """Кеш в файле SQLite (LOCATION), общий для процессов одного хоста.
+
+    Сброс версии страниц в одном воркере виден всем, попадания не
+    делятся на число воркеров. Чтение в режиме WAL не ждет записи, файл
+    читается через mmap. Записи одного вызова, в том числе set_many, -
+    одна транзакция.
+
+    OPTIONS: MAX_ENTRIES и MAX_SIZE (байт) ограничивают кеш; сверх них
+    сначала удаляются истекшие записи, затем давно не читанные, каждый
+    раз 1/CULL_FREQUENCY записей. Время чтения для LRU копится в
+    процессе и пишется вместе со следующей записью, чтобы get не
+    блокировал другие процессы.
+    """
+
+    # Сколько прочитанных ключей копить до записи времени чтения.
+    PENDING_ACCESS_LIMIT = 1000
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self.path = location
+        self.max_size = int(options.get('MAX_SIZE', 256 * 1024 * 1024))
+        self.mmap_size = int(options.get('MMAP_SIZE', self.max_size))
+        self.busy_timeout = float(options.get('BUSY_TIMEOUT', 5))
+        self.local = threading.local()
+        self.pending = {}
+        self.pending_lock = threading.Lock()
+
+    def connection(self):
+        # После fork соединение родителя использовать нельзя.
+        if getattr(self.local, 'pid', None) != os.getpid():
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            connection = sqlite3.connect(
+                self.path, timeout=self.busy_timeout, isolation_level=None)
+            connection.execute('PRAGMA journal_mode = WAL')
+            connection.execute('PRAGMA synchronous = NORMAL')
+            connection.execute(f'PRAGMA mmap_size = {self.mmap_size}')
+            connection.execute('BEGIN IMMEDIATE')
+            for sql in SCHEMA:
+                connection.execute(sql)
+            connection.execute('COMMIT')
+            self.local.connection = connection
+            self.local.pid = os.getpid()
+        return self.local.connection
+
+    def write(self, func):
+        """Выполняет func(connection) в транзакции записи, заодно
+        сохраняет время чтения и вытесняет лишнее."""
+        connection = self.connection()
+        with self.pending_lock:
+            pending, self.pending = self.pending, {}
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            result = func(connection)
+            if pending:
+                connection.executemany(
+                    'UPDATE cache SET accessed = ? WHERE key = ?',
+                    [(accessed, key) for key, accessed in pending.items()])
+            self._cull(connection)
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        connection.execute('COMMIT')
+        return result
+
+    def _over_limit(self, connection):
+        entries, size = connection.execute(
+            'SELECT entries, size FROM cache_stats').fetchone()
+        return entries, entries > self._max_entries or size > self.max_size
+
+    def _cull(self, connection):
+        entries, over = self._over_limit(connection)
+        if not over:
+            return
+        connection.execute('DELETE FROM cache WHERE expires <= ?',
+                           [time.time()])
+        entries, over = self._over_limit(connection)
+        while over and entries:
+            connection.execute(
+                'DELETE FROM cache WHERE key IN (SELECT key FROM cache '
+                'ORDER BY accessed LIMIT ?)',
+                [max(entries // self._cull_frequency, 1)])
+            entries, over = self._over_limit(connection)
+
+    def _touch_later(self, keys):
+        now = time.time()
+        with self.pending_lock:
+            for key in keys:
+                self.pending[key] = now
+            flush = len(self.pending) >= self.PENDING_ACCESS_LIMIT
+        if flush:
+            self.write(lambda connection: None)
+
+    def _read(self, keys):
+        """{ключ в кеше: значение} для неистекших записей."""
+        now = time.time()
+        found = {}
+        connection = self.connection()
+        for part in chunks(keys):
+            rows = connection.execute(
+                f'SELECT key, value, expires FROM cache WHERE key IN '
+                f'({", ".join("?" * len(part))})', part)
+            for key, value, expires in rows:
+                if expires is None or expires > now:
+                    found[key] = value
+        if found:
+            self._touch_later(found)
+        return {key: pickle.loads(value) for key, value in found.items()}
+
+    def _rows(self, data, timeout):
+        expires = self.get_backend_timeout(timeout)
+        now = time.time()
+        for key, value in data.items():
+            value = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+            yield key, value, expires, now, len(key) + len(value)
+
+    def _key(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    def get(self, key, default=None, version=None):
+        key = self._key(key, version)
+        return self._read([key]).get(key, default)
+
+    def get_many(self, keys, version=None):
+        keys = {self._key(key, version): key for key in keys}
+        if not keys:
+            return {}
+        return {keys[key]: value
+                for key, value in self._read(list(keys)).items()}
+
+    def has_key(self, key, version=None):
+        key = self._key(key, version)
+        row = self.connection().execute(
+            'SELECT expires FROM cache WHERE key = ?', [key]).fetchone()
+        return row is not None and (row[0] is None or row[0] > time.time())
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.set_many({key: value}, timeout, version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        rows = list(self._rows(
+            {self._key(key, version): value for key, value in data.items()},
+            timeout))
+        if rows:
+            self.write(lambda connection: connection.executemany(
+                UPSERT_SQL, rows))
+        return []
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        (row,) = self._rows({key: value}, timeout)
+
+        def add(connection):
+            if connection.execute(
+                    'SELECT 1 FROM cache WHERE key = ? AND (expires IS NULL '
+                    'OR expires > ?)', [key, time.time()]).fetchone():
+                return False
+            connection.execute(UPSERT_SQL, row)
+            return True
+
+        return self.write(add)
+
+    def incr(self, key, delta=1, version=None):
+        # Чтение и запись в одной транзакции: счетчики версий страниц
+        # не теряют увеличений из разных процессов.
+        key = self._key(key, version)
+
+        def incr(connection):
+            row = connection.execute(
+                'SELECT value, expires FROM cache WHERE key = ?',
+                [key]).fetchone()
+            if row is None or (row[1] is not None and row[1] <= time.time()):
+                raise ValueError(f"Key '{key}' not found")
+            value = pickle.loads(row[0]) + delta
+            data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+            connection.execute(
+                'UPDATE cache SET value = ?, size = ?, accessed = ? '
+                'WHERE key = ?', [data, len(key) + len(data), time.time(),
+                                  key])
+            return value
+
+        return self.write(incr)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        expires = self.get_backend_timeout(timeout)
+        return self.write(lambda connection: connection.execute(
+            'UPDATE cache SET expires = ? WHERE key = ? AND (expires IS NULL '
+            'OR expires > ?)', [expires, key, time.time()]).rowcount > 0)
+
+    def delete(self, key, version=None):
+        self.delete_many([key], version)
+
+    def delete_many(self, keys, version=None):
+        keys = [self._key(key, version) for key in keys]
+
+        def delete(connection):
+            for part in chunks(keys):
+                connection.execute(
+                    f'DELETE FROM cache WHERE key IN '
+                    f'({", ".join("?" * len(part))})', part)
+
+        self.write(delete)
+
+    def clear(self):
+        with self.pending_lock:
+            self.pending.clear()
+        self.write(lambda connection: connection.execute(
+            'DELETE FROM cache'))
+
+    def close(self, **kwargs):
+        # Соединения живут весь поток: открытие с PRAGMA дороже запроса.
+        pass
+
+
+class SQLiteCache(CacheStatsMixin, BaseSQLiteCache):
+    """BaseSQLiteCache с учетом попаданий в замере ServerTimingMiddleware."""
@@ -0,0 +1,64 @@
+import tempfile
+
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.management.base import BaseCommand
+
+from core.benchmark import measure
+from core.cache import LocMemCache, SQLiteCache
+
+# Похоже на кеш страниц и карточек: HTML в несколько килобайт.
+VALUE = '<article class="card">' + 'x' * 4000 + '</article>'
+
+
+def backends(directory):
+    options = {'MAX_ENTRIES': 100000}
+    return {
+        'locmem': LocMemCache('bench', {'OPTIONS': options}),
+        'filebased': FileBasedCache(f'{directory}/files',
+                                    {'OPTIONS': options}),
+        'sqlite': SQLiteCache(f'{directory}/cache.sqlite3',
+                              {'OPTIONS': options}),
+    }
+
+
+class Command(BaseCommand):
+    help = ('Задержка операций кеша core.cache.SQLiteCache рядом с '
+            'LocMemCache и FileBasedCache: get с попаданием и промахом, '
+            'set, get_many и set_many по --batch ключей, в мкс на вызов.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=200)
+        parser.add_argument('--batch', type=int, default=20)
+        parser.add_argument('--keys', type=int, default=5000,
+                            help='Сколько записей в кеше до замера.')
+
+    def operations(self, cache, batch):
+        counter = iter(range(10 ** 9))
+        keys = [f'page:{number}' for number in range(batch)]
+        data = dict.fromkeys(keys, VALUE)
+        return {
+            'get': lambda: cache.get('page:0'),
+            'get (промах)': lambda: cache.get('missing'),
+            'set': lambda: cache.set(f'new:{next(counter)}', VALUE),
+            f'get_many {batch}': lambda: cache.get_many(keys),
+            f'set_many {batch}': lambda: cache.set_many(data),
+        }
+
+    def handle(self, *args, **options):
+        with tempfile.TemporaryDirectory() as directory:
+            results = {}
+            for name, cache in backends(directory).items():
+                cache.set_many({f'page:{number}': VALUE
+                                for number in range(options['keys'])})
+                for operation, func in self.operations(
+                        cache, options['batch']).items():
+                    timing = measure(func, options['repeat'])
+                    results.setdefault(operation, {})[name] = timing
+                cache.clear()
+        names = ('locmem', 'filebased', 'sqlite')
+        self.stdout.write(f'{"операция":<16}' + ''.join(
+            f'{name:>20}' for name in names) + '   (мкс: медиана / p95)')
+        for operation, timings in results.items():
+            self.stdout.write(f'{operation:<16}' + ''.join(
+                f'{timings[name]["median"] * 1000:>11.1f} / '
+                f'{timings[name]["p95"] * 1000:<6.1f}' for name in names))
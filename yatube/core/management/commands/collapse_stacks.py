@@ -0,0 +1,35 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core import sampling
+
+
+class Command(BaseCommand):
+    help = ('Сводит стеки всех процессов из SAMPLING_DIR в один файл '
+            'свернутых стеков для flamegraph.pl, speedscope или inferno.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', '-o',
+                            help='Файл результата, по умолчанию stdout.')
+        parser.add_argument('--filter', metavar='TEXT',
+                            help='Только стеки, где есть TEXT, например '
+                                 'posts.views:Profile.')
+
+    def handle(self, *args, **options):
+        if not settings.SAMPLING_DIR:
+            raise CommandError('Выборка выключена: задайте SAMPLING_DIR.')
+        paths = sampling.process_files(settings.SAMPLING_DIR)
+        if not paths:
+            raise CommandError(f'В {settings.SAMPLING_DIR} нет стеков.')
+        counts = sampling.merge(paths)
+        if options['filter']:
+            counts = {stack: count for stack, count in counts.items()
+                      if options['filter'] in stack}
+        lines = sampling.folded(counts)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                file.write(lines)
+        else:
+            self.stdout.write(lines, ending='')
+        self.stderr.write(f'{len(paths)} процессов, '
+                          f'{sum(counts.values())} выборок.')
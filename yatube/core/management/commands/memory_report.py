@@ -0,0 +1,58 @@
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core import memory
+from core.models import MemoryDiagnostic
+
+
+class Command(BaseCommand):
+    help = ('Прирост памяти по представлениям из снимков tracemalloc '
+            '(core.memory): снятые сотрудниками запросы с главными '
+            'местами выделения и прирост из периодических снимков '
+            'процессов.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=settings.MEMORY_TOP,
+                            help='Мест выделения на представление.')
+        parser.add_argument('--view', help='Только это представление, '
+                                           'например posts:post_detail.')
+        parser.add_argument('--hours', type=float,
+                            help='Только снимки за последние часы.')
+
+    def handle(self, *args, **options):
+        records = MemoryDiagnostic.objects.all()
+        if options['hours']:
+            records = records.filter(created__gte=timezone.now() - timedelta(
+                hours=options['hours']))
+        report = memory.by_view(records, options['limit'])
+        if options['view']:
+            report = {view: item for view, item in report.items()
+                      if view == options['view']}
+        if not report:
+            self.stdout.write('Снимков нет.')
+        for view, item in report.items():
+            self.stdout.write(
+                f'{view or "<без представления>"}: запросов '
+                f'{item["requests"]}, прирост {item["size_diff"]} Б, '
+                f'в периодических снимках {item["periodic"]} Б')
+            for site, (size_diff, count_diff) in item['sites']:
+                self.stdout.write(
+                    f'   {size_diff:>+12} Б {count_diff:>+8} блоков  {site}')
+        if not options['view']:
+            self.report_periodic_sites(records, options['limit'])
+
+    def report_periodic_sites(self, records, limit):
+        sites = {}
+        for record in records.filter(kind=MemoryDiagnostic.PERIODIC):
+            for site, size_diff, _ in json.loads(record.sites):
+                sites[site] = sites.get(site, 0) + size_diff
+        if not sites:
+            return
+        self.stdout.write('Периодические снимки, все процессы:')
+        for site, size_diff in sorted(sites.items(),
+                                      key=lambda item: -item[1])[:limit]:
+            self.stdout.write(f'   {size_diff:>+12} Б  {site}')
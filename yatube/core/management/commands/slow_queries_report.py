@@ -0,0 +1,50 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core import slow_queries
+
+
+class Command(BaseCommand):
+    help = ('Самые затратные SQL-запросы из журнала медленных запросов '
+            '(SLOW_QUERY_PATH) по суммарному времени.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=20)
+        parser.add_argument('--view', help='Только это представление, '
+                                           'например posts:follow_index.')
+        parser.add_argument('--hours', type=float,
+                            help='Только записи за последние часы.')
+        parser.add_argument('--slow-only', action='store_true',
+                            help='Без случайной выборки быстрых запросов.')
+
+    def handle(self, *args, **options):
+        store = slow_queries.store()
+        if store is None:
+            raise CommandError('Журнал выключен: задайте SLOW_QUERY_PATH.')
+        records = store.read()
+        if options['view']:
+            records = (record for record in records
+                       if record['view'] == options['view'])
+        if options['hours']:
+            since = time.time() - options['hours'] * 3600
+            records = (record for record in records
+                       if record['created'] >= since)
+        if options['slow_only']:
+            records = (record for record in records
+                       if not record['sampled'])
+        groups = slow_queries.top(records, options['limit'])
+        if not groups:
+            self.stdout.write('Записей нет.')
+        for number, group in enumerate(groups, 1):
+            self.stdout.write(
+                f'{number}. {group["total_ms"]:.1f} мс всего, '
+                f'{group["count"]} раз (медленных {group["slow"]}), '
+                f'среднее {group["mean_ms"]:.1f}, '
+                f'максимум {group["max_ms"]:.1f}')
+            self.stdout.write(f'   {group["sql"]}')
+            self.stdout.write('   представления: '
+                              + (', '.join(sorted(group['views'])) or '-'))
+            self.stdout.write('   места вызова: '
+                              + (', '.join(sorted(group['call_sites']))
+                                 or '-'))
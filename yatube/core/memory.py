@@ -0,0 +1,218 @@
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+
+from django.conf import settings
+
+from . import profiling
+from .models import MemoryDiagnostic
+
+# Выделения самой диагностики и загрузчика модулей в отчет не идут.
+IGNORED = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>'),
+    tracemalloc.Filter(False, '<unknown>'),
+)
+
+_lock = threading.Lock()
+# Трассировка общая для процесса: ее включают и выключают только
+# start_tracing и stop_tracing.
+_tracing_lock = threading.Lock()
+_tracing_users = 0
+_tracing_started = False
+
+
+def short_path(filename):
+    """Путь относительно самого длинного подходящего каталога sys.path."""
+    for directory in sorted(filter(None, sys.path), key=len, reverse=True):
+        if filename.startswith(directory + os.sep):
+            return filename[len(directory) + 1:]
+    return filename
+
+
+def start_tracing():
+    """Включает трассировку, если она еще не идет, для еще одного
+    пользователя: запроса с диагностикой или периодических снимков."""
+    global _tracing_users, _tracing_started
+    with _tracing_lock:
+        if _tracing_users == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start(settings.MEMORY_TRACEBACK_FRAMES)
+            _tracing_started = True
+        _tracing_users += 1
+
+
+def stop_tracing():
+    """Выключает трассировку, когда ее больше никто не использует.
+
+    Параллельный запрос не потеряет трассировку между снимками, а
+    трассировку, включенную не здесь (python -X tracemalloc), этот
+    модуль не выключает.
+    """
+    global _tracing_users, _tracing_started
+    with _tracing_lock:
+        _tracing_users -= 1
+        if _tracing_users == 0 and _tracing_started:
+            tracemalloc.stop()
+            _tracing_started = False
+
+
+def snapshot():
+    return tracemalloc.take_snapshot().filter_traces(IGNORED)
+
+
+def top_sites(new, old, limit):
+    """Места выделения с наибольшим приростом между снимками:
+    [«файл:строка», байт, блоков] и суммарный прирост в байтах."""
+    stats = new.compare_to(old, 'lineno')
+    sites = [
+        [f'{short_path(stat.traceback[0].filename)}:'
+         f'{stat.traceback[0].lineno}', stat.size_diff, stat.count_diff]
+        for stat in stats[:limit] if stat.size_diff > 0
+    ]
+    return sites, sum(stat.size_diff for stat in stats)
+
+
+def view_name(request):
+    match = request.resolver_match
+    return match.view_name if match else ''
+
+
+class Periodic:
+    """Периодические снимки процесса: раз в MEMORY_SNAPSHOT_INTERVAL
+    секунд прирост с прошлого снимка по местам выделения и по
+    представлениям.
+
+    Прирост представления - разница tracemalloc.get_traced_memory() до
+    и после его запросов. С несколькими потоками в процессе туда
+    попадают и выделения соседних запросов.
+    """
+
+    def __init__(self):
+        self.pid = os.getpid()
+        self.previous = snapshot()
+        self.taken = time.monotonic()
+        self.views = {}
+
+    def count(self, view, size_diff):
+        with _lock:
+            self.views[view] = self.views.get(view, 0) + size_diff
+
+    def due(self):
+        return (time.monotonic() - self.taken
+                >= settings.MEMORY_SNAPSHOT_INTERVAL)
+
+    def save(self):
+        with _lock:
+            if not self.due():
+                return None
+            self.taken = time.monotonic()
+            views, self.views = self.views, {}
+            previous = self.previous
+            current = self.previous = snapshot()
+        sites, size_diff = top_sites(current, previous, settings.MEMORY_TOP)
+        return MemoryDiagnostic.objects.create(
+            kind=MemoryDiagnostic.PERIODIC,
+            pid=self.pid,
+            size_diff=size_diff,
+            traced=tracemalloc.get_traced_memory()[0],
+            sites=json.dumps(sites),
+            views=json.dumps(views, ensure_ascii=False),
+        )
+
+
+class MemoryDiagnosticsMiddleware:
+    """Диагностика памяти через tracemalloc.
+
+    Сотрудник с ключом core.profiling.token в параметре
+    MEMORY_PARAMETER или заголовке X-Memory-Token получает снимки до и
+    после своего запроса: места выделения, память которых запрос не
+    вернул, сохраняются в MemoryDiagnostic, номер записи - в заголовке
+    X-Memory-Diagnostic-Id.
+
+    С MEMORY_SNAPSHOT_INTERVAL трассировка идет в процессе постоянно и
+    после запросов периодически пишутся снимки процесса (см. Periodic).
+    Снимок делается в потоке запроса, который его застал.
+
+    Стоит после AuthenticationMiddleware.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.periodic = None
+        if settings.MEMORY_SNAPSHOT_INTERVAL:
+            # Трассировка идет, пока работает процесс.
+            start_tracing()
+            self.periodic = Periodic()
+
+    def __call__(self, request):
+        if profiling.requested(request, settings.MEMORY_PARAMETER,
+                               settings.MEMORY_HEADER):
+            response = self.diagnose(request)
+        elif self.periodic is not None:
+            before = tracemalloc.get_traced_memory()[0]
+            response = self.get_response(request)
+            self.periodic.count(view_name(request),
+                                tracemalloc.get_traced_memory()[0] - before)
+        else:
+            return self.get_response(request)
+        if self.periodic is not None and self.periodic.due():
+            self.periodic.save()
+        return response
+
+    def diagnose(self, request):
+        # Без периодических снимков трассировка идет только на время
+        # таких запросов: в снимке останутся лишь их выделения.
+        start_tracing()
+        try:
+            before = snapshot()
+            response = self.get_response(request)
+            after = snapshot()
+            traced = tracemalloc.get_traced_memory()[0]
+        finally:
+            stop_tracing()
+        sites, size_diff = top_sites(after, before, settings.MEMORY_TOP)
+        record = MemoryDiagnostic.objects.create(
+            kind=MemoryDiagnostic.REQUEST,
+            pid=os.getpid(),
+            user=request.user,
+            path=request.get_full_path(),
+            view=view_name(request),
+            size_diff=size_diff,
+            traced=traced,
+            sites=json.dumps(sites),
+        )
+        response['X-Memory-Diagnostic-Id'] = str(record.pk)
+        return response
+
+
+def by_view(records, limit):
+    """Сводка записей по представлениям: снятые запросы, их прирост и
+    главные места выделения, плюс прирост из периодических снимков."""
+    report = {}
+
+    def entry(view):
+        return report.setdefault(view, {
+            'requests': 0, 'size_diff': 0, 'periodic': 0, 'sites': {}})
+
+    for record in records:
+        if record.kind == MemoryDiagnostic.PERIODIC:
+            for view, size_diff in json.loads(record.views or '{}').items():
+                entry(view)['periodic'] += size_diff
+            continue
+        item = entry(record.view)
+        item['requests'] += 1
+        item['size_diff'] += record.size_diff
+        for site, size_diff, count_diff in json.loads(record.sites):
+            total = item['sites'].setdefault(site, [0, 0])
+            total[0] += size_diff
+            total[1] += count_diff
+    for item in report.values():
+        item['sites'] = sorted(item['sites'].items(),
+                               key=lambda site: -site[1][0])[:limit]
+    return dict(sorted(report.items(),
+                       key=lambda item: -max(item[1]['size_diff'],
+                                             item[1]['periodic'])))
@@ -0,0 +1,228 @@
+import atexit
+import bisect
+import glob
+import json
+import os
+import threading
+import time
+
+from django.conf import settings
+
+# Границы корзин гистограмм в секундах, как принято в Prometheus.
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+           1.0, 2.5, 5.0, 10.0)
+# Метрика -> (тип, описание, имена меток).
+METRICS = {
+    'yatube_requests_total': (
+        'counter', 'Запросы по представлениям и кодам ответа.',
+        ('view', 'method', 'status')),
+    'yatube_request_errors_total': (
+        'counter', 'Ответы 5xx по представлениям.', ('view',)),
+    'yatube_request_duration_seconds': (
+        'histogram', 'Время обработки запроса.', ('view',)),
+    'yatube_db_duration_seconds': (
+        'histogram', 'Время SQL-запросов за один запрос.', ('view',)),
+    'yatube_db_queries_total': (
+        'counter', 'SQL-запросы по представлениям.', ('view',)),
+    'yatube_cache_requests_total': (
+        'counter', 'Чтения кеша: result="hit" или "miss".',
+        ('view', 'result')),
+}
+# Метка view для запросов, не дошедших до представления (404 и т. п.),
+# чтобы адреса не плодили новые ряды.
+UNRESOLVED = '<unresolved>'
+
+
+class Registry:
+    """Счетчики и гистограммы процесса; обновления под одной блокировкой.
+
+    Значения: {метрика: {кортеж меток: число}} для счетчиков и
+    {метрика: {кортеж меток: [корзины..., сумма, количество]}} для
+    гистограмм, корзины не накопительные.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.values = {name: {} for name in METRICS}
+        self.flushed = 0.0
+
+    def inc(self, name, labels, amount=1):
+        values = self.values[name]
+        with self._lock:
+            values[labels] = values.get(labels, 0) + amount
+
+    def observe(self, name, labels, value):
+        values = self.values[name]
+        with self._lock:
+            series = values.get(labels)
+            if series is None:
+                series = values[labels] = [0] * (len(BUCKETS) + 3)
+            series[bisect.bisect_left(BUCKETS, value)] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def snapshot(self):
+        """Копия значений в виде, пригодном для JSON."""
+        with self._lock:
+            return {name: [[list(labels), list(value)
+                            if isinstance(value, list) else value]
+                           for labels, value in values.items()]
+                    for name, values in self.values.items()}
+
+
+REGISTRY = Registry()
+_remove_registered = False
+
+
+def record_request(request, response, timing, total):
+    """Учитывает запрос, замеренный ServerTimingMiddleware (total в мс)."""
+    match = request.resolver_match
+    view = (match.view_name if match else '') or UNRESOLVED
+    status = response.status_code
+    REGISTRY.inc('yatube_requests_total', (view, request.method, str(status)))
+    if status >= 500:
+        REGISTRY.inc('yatube_request_errors_total', (view,))
+    REGISTRY.observe('yatube_request_duration_seconds', (view,), total / 1000)
+    REGISTRY.observe('yatube_db_duration_seconds', (view,),
+                     timing.sql_time / 1000)
+    if timing.sql_count:
+        REGISTRY.inc('yatube_db_queries_total', (view,), timing.sql_count)
+    if timing.cache_hits:
+        REGISTRY.inc('yatube_cache_requests_total', (view, 'hit'),
+                     timing.cache_hits)
+    if timing.cache_misses:
+        REGISTRY.inc('yatube_cache_requests_total', (view, 'miss'),
+                     timing.cache_misses)
+    if settings.METRICS_MULTIPROCESS_DIR:
+        now = time.monotonic()
+        if now - REGISTRY.flushed >= settings.METRICS_FLUSH_INTERVAL:
+            REGISTRY.flushed = now
+            flush()
+
+
+def process_file(directory, pid):
+    return os.path.join(directory, f'{pid}.json')
+
+
+def flush():
+    """Пишет значения процесса в METRICS_MULTIPROCESS_DIR/<pid>.json.
+
+    Файл заменяется целиком, поэтому читатель не видит его половину.
+    При выходе процесса файл удаляется (см. remove).
+    """
+    global _remove_registered
+    directory = settings.METRICS_MULTIPROCESS_DIR
+    os.makedirs(directory, exist_ok=True)
+    path = process_file(directory, os.getpid())
+    temporary = f'{path}.tmp'
+    with open(temporary, 'w', encoding='utf-8') as file:
+        json.dump(REGISTRY.snapshot(), file)
+    os.replace(temporary, path)
+    if not _remove_registered:
+        # Процессы, созданные fork, наследуют регистрацию: remove
+        # берет pid в момент выхода.
+        _remove_registered = True
+        atexit.register(remove, directory)
+
+
+def remove(directory):
+    """Убирает файл процесса: его значения больше не входят в сумму."""
+    try:
+        os.remove(process_file(directory, os.getpid()))
+    except FileNotFoundError:
+        pass
+
+
+def alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # Процесс есть, но принадлежит другому пользователю.
+        return True
+    return True
+
+
+def merge(snapshots):
+    """Сумма снимков нескольких процессов в формате Registry.values."""
+    merged = {name: {} for name in METRICS}
+    for snapshot in snapshots:
+        for name, series in snapshot.items():
+            if name not in merged:
+                continue
+            values = merged[name]
+            for labels, value in series:
+                labels = tuple(labels)
+                if isinstance(value, list):
+                    current = values.setdefault(labels, [0] * len(value))
+                    values[labels] = [a + b for a, b in zip(current, value)]
+                else:
+                    values[labels] = values.get(labels, 0) + value
+    return merged
+
+
+def collect():
+    """Значения этого процесса или, с METRICS_MULTIPROCESS_DIR, всех
+    живых процессов хоста по их последним файлам.
+
+    Файлы процессов, которые завершились, не удалив их (SIGKILL,
+    падение), удаляются здесь.
+    """
+    if not settings.METRICS_MULTIPROCESS_DIR:
+        return merge([REGISTRY.snapshot()])
+    flush()
+    snapshots = []
+    pattern = os.path.join(settings.METRICS_MULTIPROCESS_DIR, '*.json')
+    for path in glob.glob(pattern):
+        pid = os.path.basename(path)[:-len('.json')]
+        if not pid.isdigit():
+            continue
+        if not alive(int(pid)):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            continue
+        try:
+            with open(path, encoding='utf-8') as file:
+                snapshots.append(json.load(file))
+        except (OSError, ValueError):
+            continue
+    return merge(snapshots)
+
+
+def escape(value):
+    return (str(value).replace('\\', '\\\\').replace('"', '\\"')
+            .replace('\n', '\\n'))
+
+
+def format_labels(names, values, extra=()):
+    pairs = [*zip(names, values), *extra]
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{escape(value)}"'
+                          for name, value in pairs) + '}'
+
+
+def render(values):
+    """Текстовый формат Prometheus 0.0.4."""
+    lines = []
+    for name, (kind, documentation, label_names) in METRICS.items():
+        lines.append(f'# HELP {name} {documentation}')
+        lines.append(f'# TYPE {name} {kind}')
+        for labels, value in sorted(values[name].items()):
+            if kind == 'counter':
+                lines.append(
+                    f'{name}{format_labels(label_names, labels)} {value}')
+                continue
+            cumulative = 0
+            for bound, count in zip((*BUCKETS, '+Inf'), value):
+                cumulative += count
+                bucket_labels = format_labels(
+                    label_names, labels, [('le', bound)])
+                lines.append(f'{name}_bucket{bucket_labels} {cumulative}')
+            series = format_labels(label_names, labels)
+            lines.append(f'{name}_sum{series} {value[-2]}')
+            lines.append(f'{name}_count{series} {value[-1]}')
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,37 @@
+# Generated by Django 2.2.28 on 2026-10-18 04:02
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('core', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MemoryDiagnostic',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='Дата')),
+                ('kind', models.CharField(choices=[('request', 'Запрос'), ('periodic', 'Периодический')], max_length=10, verbose_name='Вид')),
+                ('pid', models.PositiveIntegerField(verbose_name='Процесс')),
+                ('path', models.TextField(blank=True, verbose_name='Адрес')),
+                ('view', models.CharField(blank=True, max_length=200, verbose_name='Представление')),
+                ('size_diff', models.BigIntegerField(verbose_name='Прирост, байт')),
+                ('traced', models.BigIntegerField(verbose_name='Отслежено всего, байт')),
+                ('sites', models.TextField(help_text='JSON: [место, прирост в байтах, прирост числа блоков]', verbose_name='Места выделения')),
+                ('views', models.TextField(blank=True, help_text='JSON: {представление: байт} за период', verbose_name='Прирост по представлениям')),
+                ('user', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='memory_diagnostics', to=settings.AUTH_USER_MODEL, verbose_name='Запросил')),
+            ],
+            options={
+                'verbose_name': 'Снимок памяти',
+                'verbose_name_plural': 'Снимки памяти',
+                'ordering': ('-created',),
+            },
+        ),
+    ]
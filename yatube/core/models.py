@@ -0,0 +1,128 @@
+import os
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+from django.db import models
+
+
+class ProfileStorage(FileSystemStorage):
+    """Файлы профилей в PROFILING_DIR, вне MEDIA_ROOT: отдаются только
+    через админку."""
+
+    @property
+    def base_location(self):
+        return settings.PROFILING_DIR
+
+    @property
+    def location(self):
+        return os.path.abspath(self.base_location)
+
+
+class RequestProfile(models.Model):
+    created = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='Дата',
+    )
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        null=True,
+        on_delete=models.SET_NULL,
+        related_name='request_profiles',
+        verbose_name='Запросил',
+    )
+    method = models.CharField(
+        max_length=10,
+        verbose_name='Метод',
+    )
+    path = models.TextField(
+        verbose_name='Адрес',
+    )
+    view = models.CharField(
+        max_length=200,
+        blank=True,
+        verbose_name='Представление',
+    )
+    status = models.PositiveSmallIntegerField(
+        verbose_name='Код ответа',
+    )
+    duration_ms = models.FloatField(
+        verbose_name='Время, мс',
+    )
+    stats = models.FileField(
+        storage=ProfileStorage(),
+        upload_to='%Y/%m/%d/',
+        verbose_name='Файл .pstats',
+    )
+    summary = models.TextField(
+        verbose_name='Сводка',
+        help_text='Функции с наибольшим накопленным временем',
+    )
+
+    class Meta:
+        ordering = ('-created',)
+        verbose_name = 'Профиль запроса'
+        verbose_name_plural = 'Профили запросов'
+
+    def __str__(self):
+        return f'{self.method} {self.path}'
+
+
+class MemoryDiagnostic(models.Model):
+    REQUEST = 'request'
+    PERIODIC = 'periodic'
+    KINDS = (
+        (REQUEST, 'Запрос'),
+        (PERIODIC, 'Периодический'),
+    )
+
+    created = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='Дата',
+    )
+    kind = models.CharField(
+        max_length=10,
+        choices=KINDS,
+        verbose_name='Вид',
+    )
+    pid = models.PositiveIntegerField(
+        verbose_name='Процесс',
+    )
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        null=True,
+        on_delete=models.SET_NULL,
+        related_name='memory_diagnostics',
+        verbose_name='Запросил',
+    )
+    path = models.TextField(
+        blank=True,
+        verbose_name='Адрес',
+    )
+    view = models.CharField(
+        max_length=200,
+        blank=True,
+        verbose_name='Представление',
+    )
+    size_diff = models.BigIntegerField(
+        verbose_name='Прирост, байт',
+    )
+    traced = models.BigIntegerField(
+        verbose_name='Отслежено всего, байт',
+    )
+    sites = models.TextField(
+        verbose_name='Места выделения',
+        help_text='JSON: [место, прирост в байтах, прирост числа блоков]',
+    )
+    views = models.TextField(
+        blank=True,
+        verbose_name='Прирост по представлениям',
+        help_text='JSON: {представление: байт} за период',
+    )
+
+    class Meta:
+        ordering = ('-created',)
+        verbose_name = 'Снимок памяти'
+        verbose_name_plural = 'Снимки памяти'
+
+    def __str__(self):
+        return f'{self.get_kind_display()} {self.view or self.pid}'
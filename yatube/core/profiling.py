@@ -0,0 +1,94 @@
+import cProfile
+import io
+import marshal
+import pstats
+import time
+
+from django.conf import settings
+from django.core import signing
+from django.core.files.base import ContentFile
+
+from .models import RequestProfile
+
+SALT = 'core.profiling'
+
+
+def token(user):
+    """Подписанный ключ запуска диагностики для сотрудника user.
+
+    Ключ действует PROFILING_TOKEN_MAX_AGE секунд и только вместе с
+    сессией того же пользователя.
+    """
+    return signing.TimestampSigner(salt=SALT).sign(str(user.pk))
+
+
+def requested(request, parameter, header):
+    """Есть ли в запросе ключ из token: в параметре parameter или
+    заголовке header (ключ META), и выдан ли он вошедшему сотруднику.
+    Тем же ключом включается и core.memory."""
+    value = request.GET.get(parameter) or request.META.get(header)
+    if not value:
+        return False
+    user = request.user
+    if not (user.is_authenticated and user.is_staff):
+        return False
+    try:
+        owner = signing.TimestampSigner(salt=SALT).unsign(
+            value, max_age=settings.PROFILING_TOKEN_MAX_AGE)
+    except signing.BadSignature:
+        return False
+    return owner == str(user.pk)
+
+
+def summary(profiler, limit):
+    """Текст pstats: limit функций по накопленному времени."""
+    stream = io.StringIO()
+    stats = pstats.Stats(profiler, stream=stream)
+    stats.strip_dirs().sort_stats('cumulative').print_stats(limit)
+    return stream.getvalue()
+
+
+def save(request, response, profiler, duration):
+    profiler.create_stats()
+    match = request.resolver_match
+    record = RequestProfile(
+        user=request.user,
+        method=request.method,
+        path=request.get_full_path(),
+        view=match.view_name if match else '',
+        status=response.status_code,
+        duration_ms=round(duration, 3),
+        summary=summary(profiler, settings.PROFILING_TOP),
+    )
+    # Формат dump_stats: pstats.Stats и snakeviz читают файл как есть.
+    record.stats.save(f'{int(time.time())}.pstats',
+                      ContentFile(marshal.dumps(profiler.stats)), save=False)
+    record.save()
+    return record
+
+
+class ProfilingMiddleware:
+    """Выполняет запрос под cProfile, если сотрудник передал ключ из
+    core.profiling.token в параметре PROFILING_PARAMETER или заголовке
+    X-Profile-Token. Профиль сохраняется в RequestProfile, его номер -
+    в заголовке X-Profile-Id.
+
+    Стоит после AuthenticationMiddleware. Потоковый ответ профилируется
+    до начала передачи. Остальные запросы платят только за проверку
+    параметра и заголовка.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not requested(request, settings.PROFILING_PARAMETER,
+                         settings.PROFILING_HEADER):
+            return self.get_response(request)
+        profiler = cProfile.Profile()
+        start = time.perf_counter()
+        response = profiler.runcall(self.get_response, request)
+        duration = (time.perf_counter() - start) * 1000
+        record = save(request, response, profiler, duration)
+        response['X-Profile-Id'] = str(record.pk)
+        return response
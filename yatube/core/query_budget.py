@@ -0,0 +1,58 @@
+from contextlib import contextmanager
+
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test.utils import CaptureQueriesContext
+
+
+class QueryBudgetExceeded(AssertionError):
+    """Запросов к БД больше, чем разрешено бюджетом."""
+
+
+def format_queries(queries):
+    """Пронумерованный список SQL из CaptureQueriesContext."""
+    return '\n'.join(f'{number}. {query["sql"]}'
+                     for number, query in enumerate(queries, 1))
+
+
+@contextmanager
+def query_budget(budget, label='Блок', using=DEFAULT_DB_ALIAS):
+    """Не больше budget запросов к БД в блоке with или в вызове
+    декорированной функции.
+
+    При превышении бросает QueryBudgetExceeded со списком выполненных
+    SQL: в тестах это обычный провал проверки.
+    """
+    with CaptureQueriesContext(connections[using]) as queries:
+        yield queries
+    if len(queries) > budget:
+        raise QueryBudgetExceeded(
+            f'{label}: {len(queries)} запросов к БД при бюджете {budget}\n'
+            f'{format_queries(queries.captured_queries)}')
+
+
+def captured(func, using=DEFAULT_DB_ALIAS):
+    with CaptureQueriesContext(connections[using]) as queries:
+        func()
+    return queries.captured_queries
+
+
+def assert_constant_queries(calls, grow, using=DEFAULT_DB_ALIAS):
+    """Вызовы calls ({метка: функция}) выполняют столько же запросов
+    после grow(), что и до.
+
+    grow добавляет данные, например заполняет страницы постами: если
+    число запросов выросло, это N+1, и в сообщении оба списка SQL.
+    """
+    before = {label: captured(func, using) for label, func in calls.items()}
+    grow()
+    failures = []
+    for label, func in calls.items():
+        after = captured(func, using)
+        if len(after) != len(before[label]):
+            failures.append(
+                f'{label}: {len(before[label])} запросов к БД до роста '
+                f'данных и {len(after)} после\nДо:\n'
+                f'{format_queries(before[label])}\nПосле:\n'
+                f'{format_queries(after)}')
+    if failures:
+        raise QueryBudgetExceeded('\n\n'.join(failures))
@@ -0,0 +1,181 @@
+import atexit
+import glob
+import os
+import sys
+import threading
+import time
+
+from django.conf import settings
+from django.core.handlers.base import BaseHandler
+
+# Стеки глубже обрезаются снизу, чтобы не тратить время на рекурсию.
+MAX_DEPTH = 200
+# Кадр обработки запроса: с requests_only берутся только стеки с ним,
+# простаивающие потоки сервера в выборку не попадают.
+REQUEST_CODE = BaseHandler.get_response.__code__
+
+_lock = threading.Lock()
+_sampler = None
+
+
+def label(code, frame):
+    """«модуль:Класс.функция» для кода кадра."""
+    module = frame.f_globals.get('__name__', '?')
+    # co_qualname с именем класса есть с Python 3.11.
+    return f'{module}:{getattr(code, "co_qualname", code.co_name)}'
+
+
+class Sampler:
+    """Поток, который раз в interval секунд снимает стеки остальных
+    потоков процесса и считает одинаковые стеки.
+
+    Стек записывается в свернутом виде «корень;...;лист» - формат
+    flamegraph.pl, speedscope и inferno. Счетчики копятся с запуска,
+    поэтому каждая запись в файл заменяет прежнюю.
+    """
+
+    def __init__(self, interval, path=None, flush_interval=60,
+                 requests_only=True):
+        self.interval = interval
+        self.path = path
+        self.flush_interval = flush_interval
+        self.requests_only = requests_only
+        self.counts = {}
+        self.samples = 0
+        self.sampling_time = 0.0
+        self.labels = {}
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(
+            target=self.run, name='core.sampling', daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+        if self.thread is not None:
+            self.thread.join()
+        if self.path:
+            self.flush()
+
+    def run(self):
+        own = threading.get_ident()
+        flushed = time.monotonic()
+        while not self.stopped.wait(self.interval):
+            self.sample(own)
+            if self.path and (time.monotonic() - flushed
+                              >= self.flush_interval):
+                flushed = time.monotonic()
+                self.flush()
+
+    def sample(self, own):
+        start = time.perf_counter()
+        labels = self.labels
+        stacks = []
+        for ident, frame in sys._current_frames().items():
+            if ident == own:
+                continue
+            codes = []
+            while frame is not None and len(codes) < MAX_DEPTH:
+                code = frame.f_code
+                if code not in labels:
+                    labels[code] = label(code, frame)
+                codes.append(code)
+                frame = frame.f_back
+            if self.requests_only and REQUEST_CODE not in codes:
+                continue
+            stacks.append(tuple(codes))
+        counts = self.counts
+        with self.lock:
+            for key in stacks:
+                counts[key] = counts.get(key, 0) + 1
+            self.samples += 1
+            self.sampling_time += time.perf_counter() - start
+
+    def folded(self):
+        # Стеки копятся кортежами кода от листа к корню, в строки
+        # переводятся только здесь: так выборка дешевле.
+        labels = self.labels
+        with self.lock:
+            counts = {';'.join(labels[code] for code in reversed(codes)):
+                      count for codes, count in self.counts.items()}
+        return folded(counts)
+
+    def flush(self):
+        """Пишет стеки в path целиком, читатель не видит половину."""
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temporary = f'{self.path}.tmp'
+        with open(temporary, 'w', encoding='utf-8') as file:
+            file.write(self.folded())
+        os.replace(temporary, self.path)
+
+
+def folded(counts):
+    """Строки «стек число» по убыванию числа."""
+    items = sorted(counts.items(), key=lambda item: -item[1])
+    return ''.join(f'{stack} {count}\n' for stack, count in items)
+
+
+def merge(paths):
+    """Сумма свернутых стеков из нескольких файлов."""
+    counts = {}
+    for path in paths:
+        with open(path, encoding='utf-8') as file:
+            for line in file:
+                stack, _, count = line.rstrip('\n').rpartition(' ')
+                if stack:
+                    counts[stack] = counts.get(stack, 0) + int(count)
+    return counts
+
+
+def process_files(directory):
+    return sorted(glob.glob(os.path.join(directory, '*.folded')))
+
+
+def start():
+    """Запускает выборку в этом процессе по настройкам SAMPLING_*.
+
+    Стеки пишутся в SAMPLING_DIR/<pid>.folded. После fork (gunicorn
+    с --preload) поток в дочернем процессе запускается заново.
+    """
+    global _sampler
+    if not settings.SAMPLING_DIR:
+        return None
+    with _lock:
+        if _sampler is not None:
+            return _sampler
+        _sampler = Sampler(
+            1 / settings.SAMPLING_RATE,
+            os.path.join(settings.SAMPLING_DIR, f'{os.getpid()}.folded'),
+            settings.SAMPLING_FLUSH_INTERVAL,
+            settings.SAMPLING_REQUESTS_ONLY,
+        )
+        _sampler.start()
+    return _sampler
+
+
+def stop():
+    """Останавливает выборку и пишет стеки в последний раз."""
+    global _sampler
+    with _lock:
+        sampler, _sampler = _sampler, None
+    if sampler is not None:
+        sampler.stop()
+
+
+def _restart_after_fork():
+    global _lock, _sampler
+    # Поток родителя и его блокировки в дочерний процесс не переходят,
+    # стеки родителя ребенку не нужны.
+    _lock = threading.Lock()
+    if _sampler is not None:
+        _sampler = None
+        start()
+
+
+atexit.register(stop)
+os.register_at_fork(after_in_child=_restart_after_fork)
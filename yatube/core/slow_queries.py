@@ -0,0 +1,221 @@
+import json
+import logging
+import random
+import re
+import sqlite3
+import sys
+import threading
+import time
+from logging.handlers import RotatingFileHandler
+
+from django.conf import settings
+
+STRING = re.compile(r"'(?:[^']|'')*'")
+NUMBER = re.compile(r'(?<![\w"])-?\d+(?:\.\d+)?(?![\w"])')
+PLACEHOLDER_LIST = re.compile(r'\((?:\s*(?:%s|\?)\s*,)+\s*(?:%s|\?)\s*\)')
+SPACES = re.compile(r'\s+')
+# Модули проекта, в которых ищется место вызова; сами обертки - нет.
+PROJECT_MODULES = ('about.', 'api.', 'core.', 'posts.', 'users.')
+SKIPPED_MODULES = ('core.timing', 'core.slow_queries')
+COLUMNS = ('created', 'sql', 'params', 'duration_ms', 'view', 'call_site',
+           'sampled')
+CREATE_SQL = ('CREATE TABLE IF NOT EXISTS slow_query (created REAL, '
+              'sql TEXT, params TEXT, duration_ms REAL, view TEXT, '
+              'call_site TEXT, sampled INTEGER)')
+
+logger = logging.getLogger(__name__)
+_lock = threading.Lock()
+_stores = {}
+
+
+def normalize(sql):
+    """SQL без значений: строки и числа - ?, списки параметров IN -
+    (...), пробелы схлопнуты. Одинаковые запросы с разными данными
+    дают одну строку."""
+    sql = STRING.sub('?', sql)
+    sql = NUMBER.sub('?', sql)
+    sql = PLACEHOLDER_LIST.sub('(...)', sql)
+    return SPACES.sub(' ', sql).strip()
+
+
+def _types(params):
+    if params is None:
+        return ''
+    if isinstance(params, dict):
+        return ', '.join(f'{key}: {type(value).__name__}'
+                         for key, value in sorted(params.items()))
+    names = [type(value).__name__ for value in params]
+    parts = []
+    for name in names:
+        if parts and parts[-1][0] == name:
+            parts[-1][1] += 1
+        else:
+            parts.append([name, 1])
+    return ', '.join(name if count == 1 else f'{name} x{count}'
+                     for name, count in parts)
+
+
+def params_shape(params, many):
+    """Типы параметров без значений, например «int, str x3»."""
+    if not many:
+        return _types(params)
+    params = list(params)
+    first = _types(params[0]) if params else ''
+    return f'{len(params)} x ({first})'
+
+
+def call_site(modules):
+    """Ближайший кадр из modules (например, posts.views), иначе
+    ближайший кадр кода проекта: «модуль:Класс.функция:строка»."""
+    frame = sys._getframe(1)
+    fallback = ''
+    while frame is not None:
+        module = frame.f_globals.get('__name__', '')
+        code = frame.f_code
+        # co_qualname с именем класса есть с Python 3.11.
+        site = (f'{module}:{getattr(code, "co_qualname", code.co_name)}:'
+                f'{frame.f_lineno}')
+        if module in modules:
+            return site
+        if (not fallback and module.startswith(PROJECT_MODULES)
+                and not module.startswith(SKIPPED_MODULES)):
+            fallback = site
+        frame = frame.f_back
+    return fallback
+
+
+class SQLiteStore:
+    """Записи в таблице slow_query отдельного файла SQLite.
+
+    Соединение свое у каждого потока; WAL не мешает читать отчет,
+    пока воркеры пишут. Хранятся последние SLOW_QUERY_MAX_RECORDS
+    записей: rowid растет, старые удаляются по его диапазону.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.local = threading.local()
+
+    def connection(self):
+        connection = getattr(self.local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=5)
+            connection.execute('PRAGMA journal_mode = WAL')
+            connection.execute('PRAGMA synchronous = NORMAL')
+            connection.execute(CREATE_SQL)
+            self.local.connection = connection
+        return connection
+
+    def write(self, record):
+        connection = self.connection()
+        with connection:
+            rowid = connection.execute(
+                f'INSERT INTO slow_query ({", ".join(COLUMNS)}) '
+                f'VALUES ({", ".join("?" * len(COLUMNS))})',
+                [record[column] for column in COLUMNS]).lastrowid
+            connection.execute(
+                'DELETE FROM slow_query WHERE rowid <= ?',
+                [rowid - settings.SLOW_QUERY_MAX_RECORDS])
+
+    def read(self):
+        connection = sqlite3.connect(self.path)
+        try:
+            connection.execute(CREATE_SQL)
+            rows = connection.execute(
+                f'SELECT {", ".join(COLUMNS)} FROM slow_query')
+            for row in rows:
+                yield dict(zip(COLUMNS, row))
+        finally:
+            connection.close()
+
+
+class FileStore:
+    """JSON-строки в файле с ротацией по размеру, как у журналов."""
+
+    def __init__(self, path):
+        self.path = path
+        self.handler = RotatingFileHandler(
+            path, maxBytes=settings.SLOW_QUERY_MAX_BYTES,
+            backupCount=settings.SLOW_QUERY_BACKUP_COUNT, encoding='utf-8')
+        self.handler.setFormatter(logging.Formatter('%(message)s'))
+
+    def write(self, record):
+        self.handler.handle(logging.makeLogRecord(
+            {'msg': json.dumps(record, ensure_ascii=False)}))
+
+    def read(self):
+        paths = [f'{self.path}.{number}' for number in range(
+            settings.SLOW_QUERY_BACKUP_COUNT, 0, -1)] + [self.path]
+        for path in paths:
+            try:
+                with open(path, encoding='utf-8') as file:
+                    for line in file:
+                        if line.strip():
+                            yield json.loads(line)
+            except FileNotFoundError:
+                continue
+
+
+STORES = {'sqlite': SQLiteStore, 'file': FileStore}
+
+
+def store():
+    """Хранилище журнала из настроек или None, если журнал выключен."""
+    path = settings.SLOW_QUERY_PATH
+    if not path:
+        return None
+    key = (settings.SLOW_QUERY_STORE, path)
+    with _lock:
+        if key not in _stores:
+            _stores[key] = STORES[settings.SLOW_QUERY_STORE](path)
+        return _stores[key]
+
+
+def consider(sql, params, many, duration, request):
+    """Записывает запрос дольше SLOW_QUERY_THRESHOLD_MS или попавший в
+    долю SLOW_QUERY_SAMPLE_RATE. Вызывается из обертки запросов."""
+    if not settings.SLOW_QUERY_PATH:
+        return
+    sampled = duration < settings.SLOW_QUERY_THRESHOLD_MS
+    if sampled and random.random() >= settings.SLOW_QUERY_SAMPLE_RATE:
+        return
+    match = request.resolver_match if request is not None else None
+    record = {
+        'created': time.time(),
+        'sql': normalize(sql),
+        'params': params_shape(params, many),
+        'duration_ms': round(duration, 3),
+        'view': match.view_name if match else '',
+        'call_site': call_site(settings.SLOW_QUERY_CALL_SITE_MODULES),
+        'sampled': int(sampled),
+    }
+    try:
+        store().write(record)
+    except (OSError, sqlite3.Error):
+        # Журнал не должен ронять запрос пользователя.
+        logger.warning('Не удалось записать медленный запрос',
+                       exc_info=True)
+
+
+def top(records, limit=20):
+    """Запросы по убыванию суммарного времени: число записей, из них
+    медленных, сумма, среднее и максимум в мс, представления и места
+    вызова."""
+    groups = {}
+    for record in records:
+        group = groups.setdefault(record['sql'], {
+            'sql': record['sql'], 'count': 0, 'slow': 0, 'total_ms': 0.0,
+            'max_ms': 0.0, 'views': set(), 'call_sites': set(),
+        })
+        group['count'] += 1
+        group['slow'] += not record['sampled']
+        group['total_ms'] += record['duration_ms']
+        group['max_ms'] = max(group['max_ms'], record['duration_ms'])
+        if record['view']:
+            group['views'].add(record['view'])
+        if record['call_site']:
+            group['call_sites'].add(record['call_site'])
+    result = sorted(groups.values(), key=lambda group: -group['total_ms'])
+    for group in result:
+        group['mean_ms'] = group['total_ms'] / group['count']
+    return result[:limit]
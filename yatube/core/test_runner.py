@@ -0,0 +1,16 @@
+from django.test.runner import DiscoverRunner as BaseDiscoverRunner
+
+from .benchmark import private_cache
+
+
+class DiscoverRunner(BaseDiscoverRunner):
+    """Тесты с собственным кешем вместо общего файла хоста."""
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.private_cache = private_cache()
+        self.private_cache.__enter__()
+
+    def teardown_test_environment(self, **kwargs):
+        self.private_cache.__exit__(None, None, None)
+        super().teardown_test_environment(**kwargs)
@@ -1,6 +1,26 @@
+import json
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+import tracemalloc
 from http import HTTPStatus
+from io import StringIO
+from unittest import mock
 
-from django.test import TestCase, Client
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, Client, override_settings
+from django.urls import reverse
+
+from core import memory, metrics, profiling, sampling, slow_queries
+from core.cache import SQLiteCache
+from core.models import MemoryDiagnostic, RequestProfile
+from core.query_budget import QueryBudgetExceeded, query_budget
+from posts.views import Index
 
 
 class ViewTestClass(TestCase):
@@ -9,3 +29,426 @@ class ViewTestClass(TestCase):
         response = client.get('/nonexist-page/')
         self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
         self.assertTemplateUsed(response, 'core/404.html')
+
+
+class QueryBudgetTest(TestCase):
+    def test_budget_exceeded_lists_sql(self):
+        """Превышение бюджета роняет проверку со списком SQL."""
+        users = get_user_model().objects
+        with self.assertRaises(QueryBudgetExceeded) as raised:
+            with query_budget(1):
+                users.count()
+                users.filter(username='auth').exists()
+        message = str(raised.exception)
+        self.assertIn('2 запросов к БД при бюджете 1', message)
+        self.assertIn('1. SELECT COUNT(*)', message)
+        self.assertIn('2. SELECT (1)', message)
+
+    def test_decorator(self):
+        """query_budget работает и как декоратор."""
+        @query_budget(0, label='без запросов')
+        def count_users():
+            return get_user_model().objects.count()
+
+        with self.assertRaisesMessage(QueryBudgetExceeded, 'без запросов'):
+            count_users()
+
+
+class ServerTimingTest(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_server_timing_header(self):
+        """Заголовок Server-Timing и строка журнала с замером запроса."""
+        url = reverse('posts:index')
+        with self.assertLogs('core.timing', 'INFO') as logs:
+            response = self.client.get(url)
+        header = response['Server-Timing']
+        self.assertRegex(header, r'^total;dur=[\d.]+, sql;dur=[\d.]+;'
+                                 r'desc="\d+ q", tpl;dur=[\d.]+, cache;')
+        self.assertIn('view=posts:index', logs.output[0])
+        self.assertIn('status=200', logs.output[0])
+        record = logs.records[0].timing
+        self.assertGreater(record['sql_count'], 0)
+        self.assertGreater(record['template_ms'], 0)
+        self.assertGreater(record['cache_misses'], 0)
+        # Второй раз страница берется из кеша без шаблонов.
+        with self.assertLogs('core.timing', 'INFO') as logs:
+            self.client.get(url)
+        record = logs.records[0].timing
+        self.assertGreater(record['cache_hits'], 0)
+        self.assertEqual(record['template_ms'], 0)
+
+
+class MetricsTest(TestCase):
+    def test_metrics_endpoint(self):
+        """Запросы видны в /metrics с меткой представления."""
+        self.client.get(reverse('posts:index'))
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+        text = response.content.decode()
+        self.assertIn('# TYPE yatube_request_duration_seconds histogram',
+                      text)
+        self.assertRegex(text, r'yatube_requests_total\{view="posts:index",'
+                               r'method="GET",status="200"\} \d+')
+        self.assertRegex(text, r'yatube_request_duration_seconds_bucket'
+                               r'\{view="posts:index",le="\+Inf"\} \d+')
+
+    def test_metrics_hidden_from_other_addresses(self):
+        response = self.client.get('/metrics', REMOTE_ADDR='10.0.0.1')
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+    def test_registry_is_thread_safe(self):
+        """Счетчики не теряют обновления из разных потоков."""
+        registry = metrics.Registry()
+
+        def work():
+            for _ in range(1000):
+                registry.inc('yatube_db_queries_total', ('view',))
+                registry.observe('yatube_db_duration_seconds', ('view',),
+                                 0.003)
+
+        threads = [threading.Thread(target=work) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        values = registry.values
+        self.assertEqual(values['yatube_db_queries_total'][('view',)], 8000)
+        self.assertEqual(values['yatube_db_duration_seconds'][('view',)][-1],
+                         8000)
+
+    def test_multiprocess_sum(self):
+        """С METRICS_MULTIPROCESS_DIR складываются файлы всех процессов."""
+        with tempfile.TemporaryDirectory() as directory, \
+                override_settings(METRICS_MULTIPROCESS_DIR=directory):
+            other = {'yatube_db_queries_total': [[['posts:index'], 5]]}
+            with open(os.path.join(directory, f'{os.getppid()}.json'),
+                      'w') as file:
+                json.dump(other, file)
+            own = metrics.REGISTRY.values['yatube_db_queries_total'].get(
+                ('posts:index',), 0)
+            values = metrics.collect()
+        self.assertEqual(
+            values['yatube_db_queries_total'][('posts:index',)], own + 5)
+
+    def test_multiprocess_skips_exited_processes(self):
+        """Файл завершившегося процесса не входит в сумму и удаляется."""
+        process = multiprocessing.Process(target=int)
+        process.start()
+        process.join()
+        with tempfile.TemporaryDirectory() as directory, \
+                override_settings(METRICS_MULTIPROCESS_DIR=directory):
+            path = os.path.join(directory, f'{process.pid}.json')
+            with open(path, 'w') as file:
+                json.dump({'yatube_db_queries_total': [[['dead'], 5]]}, file)
+            values = metrics.collect()
+            self.assertNotIn(('dead',), values['yatube_db_queries_total'])
+            self.assertFalse(os.path.exists(path))
+            metrics.remove(directory)
+            self.assertEqual(os.listdir(directory), [])
+
+
+class SlowQueryLogTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        user = get_user_model().objects.create_user(username='auth')
+        cls.post = user.posts.create(text='Пост')
+
+    def setUp(self):
+        cache.clear()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def test_normalize(self):
+        """Значения и списки параметров не различают запросы."""
+        self.assertEqual(
+            slow_queries.normalize(
+                "SELECT *  FROM t WHERE id IN (%s, %s, %s) "
+                "AND name = 'it''s' LIMIT 21"),
+            'SELECT * FROM t WHERE id IN (...) AND name = ? LIMIT ?')
+        self.assertEqual(slow_queries.params_shape((1, 2, 'a', None), False),
+                         'int x2, str, NoneType')
+
+    def request_post(self, store):
+        path = os.path.join(self.directory, f'slow.{store}')
+        with override_settings(SLOW_QUERY_PATH=path, SLOW_QUERY_STORE=store,
+                               SLOW_QUERY_THRESHOLD_MS=0):
+            self.client.get(reverse('posts:post_detail',
+                                    args=[self.post.id]))
+            records = list(slow_queries.store().read())
+            out = StringIO()
+            call_command('slow_queries_report', limit=3, stdout=out)
+        return records, out.getvalue()
+
+    def test_records_carry_view_and_call_site(self):
+        """Записи знают представление и место вызова в posts.views."""
+        for store in slow_queries.STORES:
+            with self.subTest(store=store):
+                records, report = self.request_post(store)
+                self.assertTrue(records)
+                self.assertEqual({record['view'] for record in records},
+                                 {'posts:post_detail'})
+                self.assertTrue(any(
+                    record['call_site'].startswith('posts.views:')
+                    for record in records))
+                self.assertNotIn(str(self.post.id), records[-1]['sql'])
+                self.assertIn('1. ', report)
+                self.assertIn('posts:post_detail', report)
+
+    def test_stores_are_bounded(self):
+        """Журнал не растет без предела: старые записи удаляются."""
+        record = {'created': 0, 'sql': 'SELECT ?', 'params': 'int',
+                  'duration_ms': 1.0, 'view': '', 'call_site': '',
+                  'sampled': False}
+        for store, limit in (('sqlite', 5), ('file', 20)):
+            with self.subTest(store=store), override_settings(
+                    SLOW_QUERY_MAX_RECORDS=5, SLOW_QUERY_MAX_BYTES=1000,
+                    SLOW_QUERY_BACKUP_COUNT=1):
+                log = slow_queries.STORES[store](
+                    os.path.join(self.directory, f'bounded.{store}'))
+                for number in range(30):
+                    log.write({**record, 'created': number})
+                records = list(log.read())
+                self.assertLessEqual(len(records), limit)
+                self.assertEqual(records[-1]['created'], 29)
+
+    def test_fast_queries_are_sampled(self):
+        path = os.path.join(self.directory, 'slow.sqlite')
+        with override_settings(SLOW_QUERY_PATH=path,
+                               SLOW_QUERY_THRESHOLD_MS=10 ** 6,
+                               SLOW_QUERY_SAMPLE_RATE=0):
+            self.client.get(reverse('posts:post_detail',
+                                    args=[self.post.id]))
+            self.assertEqual(list(slow_queries.store().read()), [])
+
+
+class ProfilingTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        users = get_user_model().objects
+        cls.staff = users.create_user(username='staff', is_staff=True,
+                                      is_superuser=True)
+        cls.user = users.create_user(username='auth')
+
+    def setUp(self):
+        cache.clear()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        overridden = override_settings(PROFILING_DIR=directory.name)
+        overridden.enable()
+        self.addCleanup(overridden.disable)
+
+    def test_staff_request_is_profiled(self):
+        """Ключ сотрудника в параметре или заголовке сохраняет профиль,
+        который скачивается из админки."""
+        self.client.force_login(self.staff)
+        token = profiling.token(self.staff)
+        url = reverse('posts:profile', args=[self.user.username])
+        for extra, data in (({}, {'_profile': token}),
+                            ({'HTTP_X_PROFILE_TOKEN': token}, {})):
+            with self.subTest(extra=extra):
+                response = self.client.get(url, data, **extra)
+                record = RequestProfile.objects.get(
+                    pk=response['X-Profile-Id'])
+                self.assertEqual(record.view, 'posts:profile')
+                self.assertEqual(record.user, self.staff)
+                self.assertIn('cumulative', record.summary)
+        response = self.client.get(reverse(
+            'admin:core_requestprofile_download', args=[record.pk]))
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertGreater(len(b''.join(response.streaming_content)), 0)
+        response = self.client.get(
+            reverse('admin:core_requestprofile_changelist'))
+        self.assertContains(response, f'?_profile={self.staff.pk}:')
+
+    def test_trigger_requires_staff_and_own_token(self):
+        url = reverse('posts:index')
+        token = profiling.token(self.staff)
+        self.client.get(url, {'_profile': token})
+        self.client.force_login(self.user)
+        self.client.get(url, {'_profile': token})
+        self.client.get(url, {'_profile': profiling.token(self.user)})
+        self.client.force_login(self.staff)
+        self.client.get(url, {'_profile': 'forged'})
+        self.assertFalse(RequestProfile.objects.exists())
+
+
+class SamplingTest(TestCase):
+    def test_folded_stacks_of_requests(self):
+        """Стеки запросов попадают в файл процесса, collapse_stacks
+        сводит файлы в один."""
+        with tempfile.TemporaryDirectory() as directory, \
+                override_settings(SAMPLING_DIR=directory):
+            path = os.path.join(directory, '1.folded')
+            sampler = sampling.Sampler(0.001, path)
+            get_context_data = Index.get_context_data
+
+            def sampled(view, **kwargs):
+                # Выборка прямо внутри представления, без гонки с
+                # фоновым потоком.
+                sampler.sample(own=None)
+                return get_context_data(view, **kwargs)
+
+            cache.clear()
+            with mock.patch.object(Index, 'get_context_data', sampled):
+                self.client.get(reverse('posts:index'))
+            sampler.stop()
+            with open(os.path.join(directory, '2.folded'), 'w') as file:
+                file.write('a;b 3\n')
+            out = StringIO()
+            call_command('collapse_stacks', stdout=out, stderr=StringIO())
+        lines = out.getvalue().splitlines()
+        self.assertIn('a;b 3', lines)
+        stacks = [line for line in lines if 'core.sampling' in line]
+        self.assertEqual(len(stacks), 1)
+        self.assertRegex(stacks[0], r'^[^ ]+;django\.core\.handlers\.'
+                                    r'base:BaseHandler\.get_response;.*;'
+                                    r'posts\.views:\w+\.get;.*<locals>\.'
+                                    r'sampled;core\.sampling:Sampler\.'
+                                    r'sample 1$')
+
+
+class MemoryDiagnosticsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        users = get_user_model().objects
+        cls.staff = users.create_user(username='staff', is_staff=True,
+                                      is_superuser=True)
+        cls.post = cls.staff.posts.create(text='Пост')
+
+    def setUp(self):
+        cache.clear()
+
+    def test_staff_request_snapshot(self):
+        """Снимки вокруг запроса сотрудника сохраняются с
+        представлением и попадают в memory_report."""
+        self.client.force_login(self.staff)
+        token = profiling.token(self.staff)
+        response = self.client.get(
+            reverse('posts:post_detail', args=[self.post.id]),
+            {'_memory': token})
+        record = MemoryDiagnostic.objects.get(
+            pk=response['X-Memory-Diagnostic-Id'])
+        self.assertEqual(record.kind, MemoryDiagnostic.REQUEST)
+        self.assertEqual(record.view, 'posts:post_detail')
+        self.assertTrue(json.loads(record.sites))
+        self.assertFalse(tracemalloc.is_tracing())
+        out = StringIO()
+        call_command('memory_report', stdout=out)
+        self.assertIn('posts:post_detail: запросов 1', out.getvalue())
+        response = self.client.get(
+            reverse('admin:core_memorydiagnostic_change', args=[record.pk]))
+        self.assertContains(response, 'блоков')
+        response = self.client.get(
+            reverse('admin:core_memorydiagnostic_changelist'))
+        self.assertContains(response, f'?_memory={self.staff.pk}:')
+
+    def test_tracing_is_shared(self):
+        """Трассировку выключает только последний из пользователей: запрос,
+        закончившийся раньше соседнего, не отнимает ее у соседа."""
+        memory.start_tracing()
+        memory.start_tracing()
+        memory.stop_tracing()
+        self.assertTrue(tracemalloc.is_tracing())
+        memory.snapshot()
+        memory.stop_tracing()
+        self.assertFalse(tracemalloc.is_tracing())
+
+    def test_periodic_snapshot_by_view(self):
+        self.addCleanup(memory.stop_tracing)
+        with override_settings(MEMORY_SNAPSHOT_INTERVAL=0.001):
+            client = Client()
+            client.get(reverse('posts:index'))
+            client.get(reverse('posts:index'))
+        records = MemoryDiagnostic.objects.filter(
+            kind=MemoryDiagnostic.PERIODIC)
+        self.assertEqual(len(records), 2)
+        self.assertEqual({view for record in records
+                          for view in json.loads(record.views)},
+                         {'posts:index'})
+
+
+def increment_shared(path, times):
+    cache = SQLiteCache(path, {})
+    for _ in range(times):
+        cache.incr('counter')
+
+
+class SQLiteCacheTest(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'cache.sqlite3')
+
+    def cache(self, **options):
+        return SQLiteCache(self.path, {'OPTIONS': options})
+
+    def test_operations(self):
+        cache = self.cache()
+        cache.set_many({'a': 1, 'b': [2]})
+        self.assertEqual(cache.get_many(['a', 'b', 'c']), {'a': 1, 'b': [2]})
+        self.assertFalse(cache.add('a', 10))
+        self.assertTrue(cache.add('c', 3, timeout=0))
+        self.assertIsNone(cache.get('c'))
+        self.assertTrue(cache.add('c', 3))
+        self.assertEqual(cache.incr('a', 5), 6)
+        with self.assertRaises(ValueError):
+            cache.incr('missing')
+        cache.delete_many(['a', 'b'])
+        self.assertFalse(cache.has_key('a'))
+        self.assertTrue(cache.touch('c', None))
+        cache.clear()
+        self.assertEqual(cache.get('c', 'default'), 'default')
+
+    def test_shared_between_instances(self):
+        """Запись одного экземпляра, как другого процесса, видна
+        остальным."""
+        first, second = self.cache(), self.cache()
+        first.set('version', 1, None)
+        self.assertEqual(second.get('version'), 1)
+        second.incr('version')
+        self.assertEqual(first.get('version'), 2)
+
+    def test_lru_eviction(self):
+        """Сверх MAX_ENTRIES вытесняются давно не читанные записи."""
+        cache = self.cache(MAX_ENTRIES=4, CULL_FREQUENCY=2)
+        for number in range(4):
+            cache.set(number, number)
+            time.sleep(0.001)
+        cache.get(0)
+        cache.set(4, 4)
+        self.assertEqual(sorted(cache.get_many(range(5))), [0, 3, 4])
+
+    def test_size_limit(self):
+        cache = self.cache(MAX_SIZE=10000)
+        for number in range(10):
+            cache.set(number, 'x' * 2000)
+        entries, size = cache.connection().execute(
+            'SELECT entries, size FROM cache_stats').fetchone()
+        self.assertLessEqual(size, 10000)
+        self.assertEqual(entries, len(cache.get_many(range(10))))
+        self.assertIn(9, cache.get_many(range(10)))
+
+    def test_tests_use_private_cache(self):
+        """Тесты не работают с общим кешем хоста."""
+        location = settings.CACHES['default']['LOCATION']
+        self.assertTrue(location.startswith(tempfile.gettempdir()))
+        self.assertEqual(cache.path, location)
+
+    def test_incr_across_processes(self):
+        """incr из нескольких процессов не теряет увеличений."""
+        self.cache().set('counter', 0, None)
+        context = multiprocessing.get_context('fork')
+        workers = [context.Process(target=increment_shared,
+                                   args=(self.path, 50)) for _ in range(4)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        self.assertEqual(self.cache().get('counter'), 200)
@@ -0,0 +1,168 @@
+import logging
+import threading
+import time
+from contextlib import ExitStack
+
+from django.db import connections
+from django.template.base import Template
+
+from . import metrics, slow_queries
+
+logger = logging.getLogger(__name__)
+_state = threading.local()
+_templates_lock = threading.Lock()
+_templates_instrumented = False
+
+
+class RequestTiming:
+    """Замер одного запроса: SQL, шаблоны и кеш, время в мс.
+
+    Экземпляр сам служит оберткой connection.execute_wrapper и
+    передает долгие запросы в журнал core.slow_queries.
+    """
+
+    __slots__ = ('request', 'sql_count', 'sql_time', 'template_time',
+                 'template_depth', 'cache_hits', 'cache_misses',
+                 'cache_depth')
+
+    def __init__(self, request=None):
+        self.request = request
+        self.sql_count = 0
+        self.sql_time = 0.0
+        self.template_time = 0.0
+        self.template_depth = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.cache_depth = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = (time.perf_counter() - start) * 1000
+            self.sql_time += duration
+            self.sql_count += 1
+            slow_queries.consider(sql, params, many, duration, self.request)
+
+    def count_cache(self, hits, misses):
+        self.cache_hits += hits
+        self.cache_misses += misses
+
+    def header(self, total):
+        """Значение заголовка Server-Timing."""
+        return (f'total;dur={total:.1f}, '
+                f'sql;dur={self.sql_time:.1f};desc="{self.sql_count} q", '
+                f'tpl;dur={self.template_time:.1f}, '
+                f'cache;desc="hit={self.cache_hits} '
+                f'miss={self.cache_misses}"')
+
+
+def current():
+    """Замер запроса, который обрабатывает этот поток, или None."""
+    return getattr(_state, 'timing', None)
+
+
+def instrument_templates():
+    """Один раз подменяет Template.render: время внешних вызовов идет
+    в замер текущего запроса. Вне запроса остается лишняя проверка."""
+    global _templates_instrumented
+    with _templates_lock:
+        if _templates_instrumented:
+            return
+        render = Template.render
+
+        def timed_render(template, context):
+            timing = current()
+            if timing is None:
+                return render(template, context)
+            timing.template_depth += 1
+            start = time.perf_counter()
+            try:
+                return render(template, context)
+            finally:
+                timing.template_depth -= 1
+                if not timing.template_depth:
+                    timing.template_time += (
+                        (time.perf_counter() - start) * 1000)
+
+        Template.render = timed_render
+        _templates_instrumented = True
+
+
+class CacheStatsMixin:
+    """Для бэкенда кеша: попадания и промахи get и get_many в замер
+    текущего запроса. get внутри get_many базового класса не считается
+    второй раз."""
+
+    _missing = object()
+
+    def get(self, key, default=None, version=None):
+        value = super().get(key, self._missing, version)
+        timing = current()
+        if timing is not None and not timing.cache_depth:
+            hit = value is not self._missing
+            timing.count_cache(hit, not hit)
+        return default if value is self._missing else value
+
+    def get_many(self, keys, version=None):
+        timing = current()
+        if timing is None:
+            return super().get_many(keys, version)
+        keys = list(keys)
+        timing.cache_depth += 1
+        try:
+            values = super().get_many(keys, version)
+        finally:
+            timing.cache_depth -= 1
+        timing.count_cache(len(values), len(keys) - len(values))
+        return values
+
+
+class ServerTimingMiddleware:
+    """Время запроса, SQL, шаблонов и попадания в кеш в заголовке
+    Server-Timing, строке журнала core.timing и метриках core.metrics.
+
+    Стоит первым в MIDDLEWARE, чтобы замер охватывал остальные. Время
+    потоковых ответов учитывается до начала передачи.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        instrument_templates()
+
+    def __call__(self, request):
+        timing = _state.timing = RequestTiming(request)
+        start = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(timing))
+                response = self.get_response(request)
+        finally:
+            _state.timing = None
+        total = (time.perf_counter() - start) * 1000
+        response['Server-Timing'] = timing.header(total)
+        metrics.record_request(request, response, timing, total)
+        self.log(request, response, timing, total)
+        return response
+
+    def log(self, request, response, timing, total):
+        if not logger.isEnabledFor(logging.INFO):
+            return
+        match = request.resolver_match
+        record = {
+            'method': request.method,
+            'path': request.path,
+            'view': match.view_name if match else '',
+            'status': response.status_code,
+            'total_ms': round(total, 2),
+            'sql_count': timing.sql_count,
+            'sql_ms': round(timing.sql_time, 2),
+            'template_ms': round(timing.template_time, 2),
+            'cache_hits': timing.cache_hits,
+            'cache_misses': timing.cache_misses,
+        }
+        logger.info(' '.join(f'{key}={value}'
+                             for key, value in record.items()),
+                    extra={'timing': record})
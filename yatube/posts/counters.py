@@ -0,0 +1,69 @@
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Count, F
+
+from .models import Comment, Follow, Post, User, UserCounters
+
+FIELDS = ('posts', 'comments', 'followers', 'following')
+BATCH_SIZE = 500
+
+
+def for_user(user):
+    """Счетчики пользователя; нулевые, если строки еще нет."""
+    try:
+        return user.counters
+    except UserCounters.DoesNotExist:
+        return UserCounters(user=user)
+
+
+def change(user_id, field, delta):
+    """Сдвигает счетчик одним UPDATE, не читая текущее значение."""
+    counters = UserCounters.objects.filter(user_id=user_id)
+    if delta < 0:
+        counters = counters.filter(**{f'{field}__gte': -delta})
+    with transaction.atomic():
+        if counters.update(**{field: F(field) + delta}) or delta < 0:
+            return
+        _, created = UserCounters.objects.get_or_create(
+            user_id=user_id, defaults={field: delta})
+        if not created:
+            counters.update(**{field: F(field) + delta})
+
+
+def actual_counts():
+    """Точные значения счетчиков по агрегатам: {user_id: {поле: число}}."""
+    sources = (
+        ('posts', Post.objects.values_list('author')),
+        ('comments', Comment.objects.values_list('author')),
+        ('followers', Follow.objects.values_list('author')),
+        ('following', Follow.objects.values_list('user')),
+    )
+    counts = defaultdict(dict)
+    for field, rows in sources:
+        for user_id, total in rows.annotate(total=Count('pk')).order_by():
+            counts[user_id][field] = total
+    return counts
+
+
+def reconcile():
+    """Исправляет расхождения счетчиков, возвращает число строк."""
+    counts = actual_counts()
+    with transaction.atomic():
+        existing = UserCounters.objects.in_bulk()
+        created, changed = [], []
+        for user_id in User.objects.values_list('id', flat=True).iterator():
+            values = {field: counts[user_id].get(field, 0)
+                      for field in FIELDS}
+            counters = existing.get(user_id)
+            if counters is None:
+                created.append(UserCounters(user_id=user_id, **values))
+            elif any(getattr(counters, field) != value
+                     for field, value in values.items()):
+                for field, value in values.items():
+                    setattr(counters, field, value)
+                changed.append(counters)
+        UserCounters.objects.bulk_create(created, batch_size=BATCH_SIZE)
+        UserCounters.objects.bulk_update(changed, FIELDS,
+                                         batch_size=BATCH_SIZE)
+    return len(created) + len(changed)
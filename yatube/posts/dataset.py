@@ -0,0 +1,360 @@
+import bisect
+import math
+import random
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from io import BytesIO
+from itertools import accumulate
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+from faker import Faker
+from PIL import Image, ImageDraw, ImageOps
+
+from . import images
+from .importer import change_indexes, rebuild_derived
+from .models import Comment, Follow, Group, Post, User
+
+KINDS = ('users', 'groups', 'posts', 'comments', 'follows')
+BATCH_SIZE = 10000
+# Показатели степенного закона: чем больше, тем сильнее отрыв лидеров.
+FOLLOWERS_EXPONENT = 1.1
+POSTS_EXPONENT = 0.9
+COMMENTERS_EXPONENT = 0.7
+GROUPS_EXPONENT = 1.0
+GROUP_SHARE = 0.6
+# Посты и комментарии по часам суток (UTC): ночью тихо, пик вечером.
+HOUR_WEIGHTS = (3, 2, 1, 1, 1, 1, 2, 4, 6, 7, 7, 7,
+                8, 8, 7, 7, 7, 8, 9, 10, 11, 10, 8, 5)
+COMMENT_DELAY = timedelta(hours=6).total_seconds()
+IMAGE_SIZES = ((1280, 720), (1024, 768), (800, 800), (720, 1280))
+# Кеш страниц SQLite на время генерации, в КиБ (отрицательное число).
+FAST_CACHE_SIZE = -256 * 1024
+TEXT_POOL_SIZE = 5000
+NAME_POOL_SIZE = 1000
+# Конец периода данных по умолчанию: не текущее время, чтобы один seed
+# давал те же даты при любом запуске.
+DEFAULT_NOW = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+
+def zipf_weights(count, exponent):
+    """Накопленные веса рангов 1..count по закону Ципфа для choices."""
+    return list(accumulate(1 / rank ** exponent
+                           for rank in range(1, count + 1)))
+
+
+class Timeline:
+    """Время публикации i-го из count постов за последние days дней.
+
+    Активность растет линейно, поэтому к концу периода постов больше;
+    внутри суток время распределено по HOUR_WEIGHTS. Отображение
+    монотонно: чем больше id, тем позже пост, как в живой базе.
+    """
+
+    def __init__(self, now, days, count):
+        self.end = now.timestamp()
+        self.start = self.end - days * 86400
+        self.days = days
+        self.count = max(count, 1)
+        total = sum(HOUR_WEIGHTS)
+        self.hours = [0] + [weight / total for weight in
+                            accumulate(HOUR_WEIGHTS)]
+
+    def day_seconds(self, fraction):
+        """Доля суток по числу событий -> секунда суток."""
+        hour = bisect.bisect_right(self.hours, fraction) - 1
+        hour = min(hour, len(HOUR_WEIGHTS) - 1)
+        within = ((fraction - self.hours[hour])
+                  / (self.hours[hour + 1] - self.hours[hour]))
+        return (hour + within) * 3600
+
+    def __call__(self, index):
+        position = self.days * math.sqrt((index + 0.5) / self.count)
+        day = math.floor(position)
+        return (self.start + day * 86400
+                + self.day_seconds(position - day))
+
+
+class DatasetGenerator:
+    """Синтетические пользователи, группы, посты, комментарии и подписки.
+
+    Строки вставляются executemany пачками мимо моделей и сигналов,
+    производные данные пересчитываются один раз в конце, как после
+    import_dump. Одинаковые seed и now на пустой базе дают те же данные,
+    даты отсчитываются от now (по умолчанию DEFAULT_NOW).
+    """
+
+    def __init__(self, users=1000, groups=20, posts=10000, comments=20000,
+                 follows=20, images=0, image_share=0.1, days=365, seed=1,
+                 now=None, drop_indexes=True, feeds=True, log=None):
+        self.counts = {'users': users, 'groups': groups, 'posts': posts,
+                       'comments': comments}
+        self.follows = follows
+        self.images = images
+        self.image_share = image_share
+        self.days = days
+        self.seed = seed
+        self.drop_indexes = drop_indexes
+        self.feeds = feeds
+        self.log = log or (lambda message, verbosity=1: None)
+        self.rng = random.Random(seed)
+        self.faker = Faker('ru_RU')
+        self.faker.seed_instance(seed)
+        now = now or DEFAULT_NOW
+        if timezone.is_naive(now):
+            now = timezone.make_aware(now, timezone.utc)
+        self.now = now.replace(microsecond=0)
+        self.stats = {}
+
+    def run(self):
+        if not self.counts['users']:
+            raise ValueError('Нужен хотя бы один пользователь.')
+        self.prepare()
+        if self.drop_indexes:
+            change_indexes('remove_index')
+        try:
+            with fast_writes():
+                for kind in KINDS:
+                    started = time.monotonic()
+                    with transaction.atomic():
+                        rows = getattr(self, f'insert_{kind}')()
+                    self.stats[kind] = (rows, time.monotonic() - started)
+                    self.log(f'{kind}: {rows}', verbosity=2)
+        finally:
+            if self.drop_indexes:
+                change_indexes('add_index')
+        started = time.monotonic()
+        rebuild_derived(feeds=self.feeds)
+        self.stats['maintenance'] = (None, time.monotonic() - started)
+        return self.stats
+
+    def prepare(self):
+        offsets = {
+            kind: model.objects.aggregate(value=Max('id'))['value'] or 0
+            for kind, model in (('users', User), ('groups', Group),
+                                ('posts', Post), ('comments', Comment))
+        }
+        self.ids = {
+            kind: range(offsets[kind] + 1, offsets[kind] + count + 1)
+            for kind, count in self.counts.items()
+        }
+        # Ранг популярности не совпадает с id: лидеры разбросаны по базе.
+        self.ranked_users = list(self.ids['users'])
+        self.rng.shuffle(self.ranked_users)
+        # Самые читаемые и самые пишущие авторы - разные люди, иначе
+        # лидеры дают основную часть записей лент и ленты растут как
+        # произведение двух степенных законов.
+        self.ranked_authors = list(self.ids['users'])
+        self.rng.shuffle(self.ranked_authors)
+        users = len(self.ranked_users)
+        self.weights = {
+            'followers': zipf_weights(users, FOLLOWERS_EXPONENT),
+            'posts': zipf_weights(users, POSTS_EXPONENT),
+            'commenters': zipf_weights(users, COMMENTERS_EXPONENT),
+            # Без групп choices выбирает из [None].
+            'groups': zipf_weights(max(len(self.ids['groups']), 1),
+                                   GROUPS_EXPONENT),
+        }
+        self.sentences = [self.faker.sentence(nb_words=10)
+                          for _ in range(TEXT_POOL_SIZE)]
+        self.first_names = [self.faker.first_name()
+                            for _ in range(NAME_POOL_SIZE)]
+        self.last_names = [self.faker.last_name()
+                           for _ in range(NAME_POOL_SIZE)]
+        self.timeline = Timeline(self.now, self.days, self.counts['posts'])
+        self.epoch = datetime(1970, 1, 1, tzinfo=timezone.utc)
+        if not settings.USE_TZ:
+            self.epoch = timezone.make_naive(self.epoch)
+        self.adapt_date = connection.ops.adapt_datetimefield_value
+
+    def date(self, timestamp):
+        value = self.epoch + timedelta(
+            seconds=min(timestamp, self.timeline.end))
+        return self.adapt_date(value)
+
+    def text(self, low, high):
+        return ' '.join(self.rng.choices(
+            self.sentences, k=self.rng.randint(low, high)))
+
+    def chunks(self, ids):
+        for start in range(0, len(ids), BATCH_SIZE):
+            yield ids[start:start + BATCH_SIZE]
+
+    def insert(self, model, fields, rows):
+        """Вставляет строки пачками по BATCH_SIZE, возвращает их число."""
+        opts = model._meta
+        columns = ', '.join(opts.get_field(name).column for name in fields)
+        placeholders = ', '.join(['%s'] * len(fields))
+        sql = (f'INSERT INTO {opts.db_table} ({columns}) '
+               f'VALUES ({placeholders})')
+        total = 0
+        batch = []
+        with connection.cursor() as cursor:
+            for row in rows:
+                batch.append(row)
+                if len(batch) == BATCH_SIZE:
+                    cursor.executemany(sql, batch)
+                    total += len(batch)
+                    batch = []
+            if batch:
+                cursor.executemany(sql, batch)
+                total += len(batch)
+        return total
+
+    def insert_users(self):
+        rng = self.rng
+        start = self.timeline.start
+        span = self.days * 86400
+
+        def rows():
+            for user_id in self.ids['users']:
+                yield (user_id, f'user{user_id}',
+                       rng.choice(self.first_names),
+                       rng.choice(self.last_names),
+                       f'user{user_id}@example.com',
+                       '!', False, False, True,
+                       self.date(start - rng.random() * span))
+
+        return self.insert(User, (
+            'id', 'username', 'first_name', 'last_name', 'email', 'password',
+            'is_superuser', 'is_staff', 'is_active', 'date_joined'), rows())
+
+    def insert_groups(self):
+        def rows():
+            for group_id in self.ids['groups']:
+                title = self.faker.catch_phrase()[:200]
+                yield (group_id, f'group-{group_id}', title, self.text(1, 3))
+
+        return self.insert(
+            Group, ('id', 'slug', 'title', 'description'), rows())
+
+    def generate_images(self):
+        """Картинки в MEDIA_ROOT/posts: имя и поля метаданных для постов."""
+        field = Post._meta.get_field('image')
+        generated = []
+        for number in range(self.images):
+            content = ContentFile(self.picture(), f'dataset-{self.seed}-'
+                                                  f'{number}.jpg')
+            width, height, size, digest = images.metadata(content)
+            name = default_storage.save(
+                field.generate_filename(None, content.name), content)
+            generated.append((name, width, height, size, digest))
+        return generated
+
+    def picture(self):
+        rng = self.rng
+        width, height = rng.choice(IMAGE_SIZES)
+
+        def color():
+            return tuple(rng.randrange(256) for _ in range(3))
+
+        gradient = Image.linear_gradient('L').rotate(
+            rng.randrange(360)).resize((width, height))
+        image = ImageOps.colorize(gradient, color(), color())
+        draw = ImageDraw.Draw(image)
+        for _ in range(rng.randint(3, 12)):
+            x, y = rng.randrange(width), rng.randrange(height)
+            radius = rng.randint(20, min(width, height) // 3)
+            draw.ellipse((x - radius, y - radius, x + radius, y + radius),
+                         fill=color())
+        buffer = BytesIO()
+        image.save(buffer, 'JPEG', quality=85)
+        return buffer.getvalue()
+
+    def insert_posts(self):
+        rng = self.rng
+        pictures = self.generate_images()
+        groups = list(self.ids['groups'])
+        first = self.ids['posts'].start
+
+        def rows():
+            for chunk in self.chunks(self.ids['posts']):
+                authors = rng.choices(self.ranked_authors,
+                                      cum_weights=self.weights['posts'],
+                                      k=len(chunk))
+                chosen = rng.choices(groups or [None],
+                                     cum_weights=self.weights['groups'],
+                                     k=len(chunk))
+                for post_id, author, group in zip(chunk, authors, chosen):
+                    if rng.random() >= GROUP_SHARE:
+                        group = None
+                    image = ('', None, None, None, '')
+                    if pictures and rng.random() < self.image_share:
+                        image = rng.choice(pictures)
+                    yield (post_id, self.text(1, 8),
+                           self.date(self.timeline(post_id - first)),
+                           author, group, *image)
+
+        return self.insert(Post, (
+            'id', 'text', 'pub_date', 'author', 'group', 'image',
+            'image_width', 'image_height', 'image_size', 'image_hash'),
+            rows())
+
+    def insert_comments(self):
+        rng = self.rng
+        posts = self.ids['posts']
+        if not posts:
+            return 0
+
+        def rows():
+            for chunk in self.chunks(self.ids['comments']):
+                authors = rng.choices(self.ranked_users,
+                                      cum_weights=self.weights['commenters'],
+                                      k=len(chunk))
+                for comment_id, author in zip(chunk, authors):
+                    index = rng.randrange(len(posts))
+                    created = (self.timeline(index)
+                               + rng.expovariate(1 / COMMENT_DELAY))
+                    yield (comment_id, posts[index], author,
+                           self.text(1, 2), self.date(created))
+
+        return self.insert(Comment, (
+            'id', 'post', 'author', 'text', 'created'), rows())
+
+    def insert_follows(self):
+        """Каждый подписан в среднем почти на follows авторов: авторов
+        выбирают по закону Ципфа, повторы и подписка на себя
+        отбрасываются, поэтому у лидеров подписчиков на порядки больше."""
+        rng = self.rng
+
+        def rows():
+            for user_id in self.ids['users']:
+                authors = set(rng.choices(
+                    self.ranked_users, cum_weights=self.weights['followers'],
+                    k=rng.randint(0, 2 * self.follows)))
+                authors.discard(user_id)
+                for author in sorted(authors):
+                    yield user_id, author
+
+        return self.insert(Follow, ('user', 'author'), rows())
+
+
+@contextmanager
+def fast_writes():
+    """На время генерации SQLite держит в памяти больше страниц индексов
+    и не ждет сброса каждой транзакции на диск: при сбое питания
+    потеряются только сгенерированные строки. Внутри транзакции SQLite
+    не меняет режим синхронизации."""
+    if connection.vendor != 'sqlite':
+        yield
+        return
+    pragmas = {'cache_size': FAST_CACHE_SIZE}
+    if not connection.in_atomic_block:
+        pragmas['synchronous'] = 'OFF'
+    previous = {}
+    with connection.cursor() as cursor:
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name}')
+            previous[name] = cursor.fetchone()[0]
+            cursor.execute(f'PRAGMA {name} = {value}')
+    try:
+        yield
+    finally:
+        with connection.cursor() as cursor:
+            for name, value in previous.items():
+                cursor.execute(f'PRAGMA {name} = {int(value)}')
@@ -0,0 +1,159 @@
+import csv
+import json
+import zipfile
+from io import RawIOBase
+
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.storage import default_storage
+
+from .models import Comment, Post
+
+CHUNK_SIZE = 2000
+FILE_CHUNK_SIZE = 64 * 1024
+FORMATS = ('jsonl', 'csv')
+KINDS = ('posts', 'comments')
+# Поле выгрузки -> колонка values().
+POST_FIELDS = {
+    'id': 'id',
+    'pub_date': 'pub_date',
+    'author': 'author__username',
+    'group': 'group__slug',
+    'text': 'text',
+    'image': 'image',
+    'image_width': 'image_width',
+    'image_height': 'image_height',
+    'image_size': 'image_size',
+    'image_hash': 'image_hash',
+}
+COMMENT_FIELDS = {
+    'id': 'id',
+    'post': 'post_id',
+    'created': 'created',
+    'author': 'author__username',
+    'text': 'text',
+}
+
+
+def selection(author=None, group=None):
+    """Посты автора и (или) группы и комментарии к ним."""
+    posts = Post.objects.all()
+    comments = Comment.objects.all()
+    if author is not None:
+        posts = posts.filter(author=author)
+        comments = comments.filter(post__author=author)
+    if group is not None:
+        posts = posts.filter(group=group)
+        comments = comments.filter(post__group=group)
+    return posts, comments
+
+
+def rows(queryset, fields):
+    """Строки выгрузки по мере чтения: в памяти не больше CHUNK_SIZE."""
+    columns = list(fields.values())
+    for values in queryset.order_by('id').values_list(*columns).iterator(
+            chunk_size=CHUNK_SIZE):
+        row = dict(zip(fields, values))
+        for name, value in row.items():
+            if hasattr(value, 'isoformat'):
+                row[name] = value.isoformat()
+        yield row
+
+
+def records(kind, author=None, group=None):
+    posts, comments = selection(author, group)
+    if kind == 'posts':
+        return POST_FIELDS, rows(posts, POST_FIELDS)
+    return COMMENT_FIELDS, rows(comments, COMMENT_FIELDS)
+
+
+class _Echo:
+    """Файл для csv.writer, который возвращает строку вместо записи."""
+
+    def write(self, value):
+        return value
+
+
+def lines(fmt, fields, records):
+    if fmt == 'jsonl':
+        for record in records:
+            yield json.dumps(record, ensure_ascii=False) + '\n'
+        return
+    writer = csv.writer(_Echo())
+    yield writer.writerow(list(fields))
+    for record in records:
+        yield writer.writerow(list(record.values()))
+
+
+class _ZipBuffer(RawIOBase):
+    """Поток без seek для ZipFile: записанное забирается частями."""
+
+    def __init__(self):
+        self.chunks = []
+        self.size = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.size += len(data)
+        return len(data)
+
+    def take(self):
+        data = b''.join(self.chunks)
+        self.chunks.clear()
+        self.size = 0
+        return data
+
+
+def zip_stream(name, lines, images):
+    """Zip с файлом записей и картинками, отдаваемый по частям.
+
+    ZipFile пишет в поток без seek с дескрипторами данных после файлов,
+    поэтому архив целиком в памяти не собирается.
+    """
+    buffer = _ZipBuffer()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+        with archive.open(name, 'w', force_zip64=True) as entry:
+            for line in lines:
+                entry.write(line.encode())
+                if buffer.size >= FILE_CHUNK_SIZE:
+                    yield buffer.take()
+        yield buffer.take()
+        for image in images:
+            if not stored(image):
+                continue
+            info = zipfile.ZipInfo(image)
+            # JPEG и PNG уже сжаты.
+            info.compress_type = zipfile.ZIP_STORED
+            with default_storage.open(image) as source, \
+                    archive.open(info, 'w', force_zip64=True) as entry:
+                for chunk in source.chunks(FILE_CHUNK_SIZE):
+                    entry.write(chunk)
+                    yield buffer.take()
+            yield buffer.take()
+    yield buffer.take()
+
+
+def stored(name):
+    try:
+        return default_storage.exists(name)
+    except SuspiciousFileOperation:
+        # Путь вне MEDIA_ROOT.
+        return False
+
+
+def image_names(author=None, group=None):
+    posts, _ = selection(author, group)
+    return posts.exclude(image='').order_by('id').values_list(
+        'image', flat=True).iterator(chunk_size=CHUNK_SIZE)
+
+
+def export(fmt, kind, author=None, group=None, images=False):
+    """Выгрузка частями: str для jsonl/csv, bytes для zip с картинками."""
+    fields, data = records(kind, author, group)
+    output = lines(fmt, fields, data)
+    if not images:
+        return output
+    archive = zip_stream(f'{kind}.{fmt}', output, image_names(author, group))
+    return (chunk for chunk in archive if chunk)
@@ -0,0 +1,38 @@
+import hashlib
+
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.images import get_image_dimensions
+
+FIELDS = ('image_width', 'image_height', 'image_size', 'image_hash')
+
+
+def metadata(file):
+    """Ширина, высота, размер в байтах и sha256 открытого файла картинки.
+
+    Файл читается один раз по частям; размеры берутся из заголовка.
+    """
+    digest = hashlib.sha256()
+    size = 0
+    for chunk in file.chunks():
+        digest.update(chunk)
+        size += len(chunk)
+    file.seek(0)
+    width, height = get_image_dimensions(file)
+    return width, height, size, digest.hexdigest()
+
+
+def fill(post):
+    """Заполняет поля картинки поста; если файл не читается, очищает их."""
+    values = (None, None, None, '')
+    image = post.image
+    try:
+        if image and not image._committed:
+            # Загруженный файл еще не в хранилище, его сохранит модель.
+            values = metadata(image.file)
+        elif image:
+            with image.storage.open(image.name) as file:
+                values = metadata(file)
+    except (OSError, ValueError, SuspiciousFileOperation):
+        pass
+    for field, value in zip(FIELDS, values):
+        setattr(post, field, value)
@@ -0,0 +1,347 @@
+import csv
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+import django
+from django.contrib.auth.hashers import make_password
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import counters, feed, images, page_cache, search
+from .models import Comment, Follow, Group, Post, User
+
+MODELS = {
+    'users': User,
+    'groups': Group,
+    'posts': Post,
+    'comments': Comment,
+    'follows': Follow,
+}
+KINDS = tuple(MODELS)
+# Предел SQLite на число строк в одном INSERT.
+INSERT_BATCH_SIZE = 500
+# Индексы, которые при --drop-indexes создаются заново после загрузки.
+DEFERRED_INDEX_MODELS = (Post, Comment)
+# Модели с датами из дампа: bulk_create заменил бы их текущим временем
+# (auto_now_add), поэтому строки вставляются как есть, см. insert_rows.
+RAW_INSERT_MODELS = (Post, Comment)
+
+
+def dump_file(directory, kind):
+    """Файл вида в каталоге дампа: kind.jsonl или kind.csv, иначе None."""
+    for extension in ('jsonl', 'csv'):
+        path = os.path.join(directory, f'{kind}.{extension}')
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def read_rows(path):
+    with open(path, encoding='utf-8', newline='') as file:
+        if path.endswith('.csv'):
+            yield from csv.DictReader(file)
+            return
+        for line in file:
+            if line.strip():
+                yield json.loads(line)
+
+
+def batches(rows, size):
+    rows = iter(rows)
+    while True:
+        batch = list(islice(rows, size))
+        if not batch:
+            return
+        yield batch
+
+
+def as_int(value):
+    if value in (None, ''):
+        return None
+    return int(value)
+
+
+def as_date(value, default):
+    if not value:
+        return default
+    return parse_datetime(value) or default
+
+
+def attach_image(source_dir, name):
+    """Копирует картинку поста в хранилище, возвращает ее поля.
+
+    Файл называется по sha256 содержимого: повтор пачки после сбоя
+    берет уже скопированный файл, а не создает копию с новым именем.
+    Выполняется в процессе пула и не обращается к БД.
+    """
+    source_dir = os.path.realpath(source_dir)
+    path = os.path.realpath(os.path.join(source_dir, name))
+    if not path.startswith(source_dir + os.sep) or not os.path.isfile(path):
+        return None
+    field = Post._meta.get_field('image')
+    with open(path, 'rb') as source:
+        file = File(source, name=os.path.basename(path))
+        width, height, size, digest = images.metadata(file)
+        extension = os.path.splitext(file.name)[1].lower()
+        stored = field.generate_filename(None, f'{digest}{extension}')
+        if not default_storage.exists(stored):
+            file.seek(0)
+            stored = default_storage.save(stored, file)
+    return stored, width, height, size, digest
+
+
+def insert_rows(model, objects):
+    """Вставляет объекты пачками по INSERT_BATCH_SIZE, пропуская
+    конфликтующие строки. Значения полей, в том числе с auto_now_add,
+    пишутся как есть, общие объекты полей модели не меняются."""
+    opts = model._meta
+    fields = opts.concrete_fields
+    columns = ', '.join(connection.ops.quote_name(field.column)
+                        for field in fields)
+    placeholders = ', '.join(['%s'] * len(fields))
+    sql = (f'{connection.ops.insert_statement(ignore_conflicts=True)} '
+           f'{opts.db_table} ({columns}) VALUES ({placeholders})'
+           f'{connection.ops.ignore_conflicts_suffix_sql(True)}')
+    with connection.cursor() as cursor:
+        for batch in batches(objects, INSERT_BATCH_SIZE):
+            cursor.executemany(sql, [
+                [field.get_db_prep_save(getattr(obj, field.attname),
+                                        connection) for field in fields]
+                for obj in batch
+            ])
+
+
+def change_indexes(operation):
+    """Снимает (remove_index) или создает (add_index) индексы из Meta
+    моделей DEFERRED_INDEX_MODELS."""
+    with connection.schema_editor() as editor:
+        for model in DEFERRED_INDEX_MODELS:
+            for index in model._meta.indexes:
+                getattr(editor, operation)(model, index)
+
+
+def rebuild_derived(feeds=True):
+    """Данные, которые ведут сигналы, после вставки мимо них.
+
+    Сбрасывает последовательности id, пересчитывает счетчики, ленты и
+    полнотекстовый индекс и поднимает версии всех страниц в кеше.
+    """
+    with connection.cursor() as cursor:
+        for sql in connection.ops.sequence_reset_sql(
+                no_style(), [User, Group, Post, Comment, Follow]):
+            cursor.execute(sql)
+    counters.reconcile()
+    if feeds:
+        feed.rebuild()
+    if search.available():
+        search.rebuild()
+    page_cache.bump(page_cache.INDEX, page_cache.GROUPS)
+
+
+class Checkpoint:
+    """Прогресс загрузки в JSON-файле: сколько строк каждого вида
+    прочитано и закоммичено, смещения id и снятые индексы."""
+
+    def __init__(self, path):
+        self.path = path
+        self.state = {'done': {kind: 0 for kind in KINDS}}
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as file:
+                self.state = json.load(file)
+
+    def __getitem__(self, key):
+        return self.state.get(key)
+
+    def __setitem__(self, key, value):
+        self.state[key] = value
+
+    def save(self):
+        temporary = f'{self.path}.tmp'
+        with open(temporary, 'w', encoding='utf-8') as file:
+            json.dump(self.state, file)
+        os.replace(temporary, self.path)
+
+    def remove(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class Importer:
+    """Загрузка дампа пачками через bulk_create, посты и комментарии -
+    через insert_rows.
+
+    Сигналы при такой вставке не срабатывают, поэтому ленты, счетчики,
+    полнотекстовый индекс и кеш страниц обновляются один раз в конце.
+    Id постов и комментариев равны смещению плюс id из дампа: повтор
+    пачки после сбоя не создает дублей, ссылки комментариев на посты
+    не требуют таблицы соответствия.
+    """
+
+    def __init__(self, directory, checkpoint, batch_size=5000, workers=0,
+                 images_dir=None, drop_indexes=False, log=None):
+        self.directory = directory
+        self.checkpoint = checkpoint
+        self.batch_size = batch_size
+        self.workers = workers
+        self.images_dir = images_dir or directory
+        self.drop_indexes = drop_indexes
+        self.log = log or (lambda message, verbosity=1: None)
+        self.pool = None
+        self.now = timezone.now()
+        self.stats = {}
+
+    def run(self):
+        if self.checkpoint['post_offset'] is None:
+            self.checkpoint['post_offset'] = (
+                Post.objects.aggregate(value=Max('id'))['value'] or 0)
+            self.checkpoint['comment_offset'] = (
+                Comment.objects.aggregate(value=Max('id'))['value'] or 0)
+            self.checkpoint.save()
+        if self.drop_indexes and not self.checkpoint['indexes_dropped']:
+            change_indexes('remove_index')
+            self.checkpoint['indexes_dropped'] = True
+            self.checkpoint.save()
+        if self.workers:
+            # Процессы не должны унаследовать открытое соединение SQLite.
+            connection.close()
+            # spawn: процесс импортирует этот модуль с моделями, поэтому
+            # Django настраивается до распаковки задач.
+            self.pool = ProcessPoolExecutor(
+                self.workers, multiprocessing.get_context('spawn'),
+                initializer=django.setup)
+        try:
+            for kind in KINDS:
+                path = dump_file(self.directory, kind)
+                if path is not None:
+                    self.load(kind, path)
+        finally:
+            if self.pool is not None:
+                self.pool.shutdown()
+        self.finish()
+        self.checkpoint.remove()
+        return self.stats
+
+    def load(self, kind, path):
+        done = self.checkpoint['done'][kind]
+        started = time.monotonic()
+        rows = islice(read_rows(path), done, None)
+        imported = 0
+        for batch in batches(rows, self.batch_size):
+            objects = getattr(self, f'build_{kind}')(batch)
+            model = MODELS[kind]
+            with transaction.atomic():
+                if model in RAW_INSERT_MODELS:
+                    insert_rows(model, objects)
+                else:
+                    model.objects.bulk_create(
+                        objects, batch_size=INSERT_BATCH_SIZE,
+                        ignore_conflicts=True)
+            done += len(batch)
+            imported += len(objects)
+            self.checkpoint['done'][kind] = done
+            self.checkpoint.save()
+            self.log(f'{kind}: прочитано {done}', verbosity=2)
+        self.stats[kind] = (imported, time.monotonic() - started)
+
+    def ids(self, model, field, values):
+        values = {value for value in values if value}
+        return dict(model.objects.filter(
+            **{f'{field}__in': values}).values_list(field, 'id'))
+
+    def build_users(self, rows):
+        return [
+            User(username=row['username'],
+                 first_name=row.get('first_name') or '',
+                 last_name=row.get('last_name') or '',
+                 email=row.get('email') or '',
+                 password=make_password(None))
+            for row in rows
+        ]
+
+    def build_groups(self, rows):
+        return [
+            Group(slug=row['slug'], title=row.get('title') or row['slug'],
+                  description=row.get('description') or '')
+            for row in rows
+        ]
+
+    def attach_images(self, names):
+        if self.pool is None:
+            return [attach_image(self.images_dir, name) for name in names]
+        return list(self.pool.map(
+            attach_image, [self.images_dir] * len(names), names,
+            chunksize=max(1, len(names) // (self.workers * 4))))
+
+    def build_posts(self, rows):
+        authors = self.ids(User, 'username', (row['author'] for row in rows))
+        groups = self.ids(Group, 'slug', (row.get('group') for row in rows))
+        rows = [row for row in rows if row['author'] in authors]
+        with_images = [row for row in rows if row.get('image')]
+        attached = dict(zip(
+            (id(row) for row in with_images),
+            self.attach_images([row['image'] for row in with_images]),
+        ))
+        offset = self.checkpoint['post_offset']
+        posts = []
+        for row in rows:
+            post = Post(
+                id=offset + as_int(row['id']),
+                author_id=authors[row['author']],
+                group_id=groups.get(row.get('group')),
+                text=row['text'],
+                pub_date=as_date(row.get('pub_date'), self.now),
+            )
+            image = attached.get(id(row))
+            if image is not None:
+                (post.image, post.image_width, post.image_height,
+                 post.image_size, post.image_hash) = image
+            posts.append(post)
+        return posts
+
+    def build_comments(self, rows):
+        authors = self.ids(User, 'username', (row['author'] for row in rows))
+        offset = self.checkpoint['post_offset']
+        post_ids = {id(row): offset + as_int(row['post']) for row in rows}
+        # Комментарии к постам, которых нет в БД, пропускаются.
+        posts = set(Post.objects.filter(
+            id__in=post_ids.values()).values_list('id', flat=True))
+        comment_offset = self.checkpoint['comment_offset']
+        return [
+            Comment(
+                id=comment_offset + as_int(row['id']),
+                post_id=post_ids[id(row)],
+                author_id=authors[row['author']],
+                text=row['text'],
+                created=as_date(row.get('created'), self.now),
+            )
+            for row in rows
+            if row['author'] in authors and post_ids[id(row)] in posts
+        ]
+
+    def build_follows(self, rows):
+        users = self.ids(User, 'username', (
+            name for row in rows for name in (row['user'], row['author'])))
+        return [
+            Follow(user_id=users[row['user']], author_id=users[row['author']])
+            for row in rows
+            if row['user'] in users and row['author'] in users
+            and row['user'] != row['author']
+        ]
+
+    def finish(self):
+        started = time.monotonic()
+        if self.checkpoint['indexes_dropped']:
+            change_indexes('add_index')
+            self.checkpoint['indexes_dropped'] = False
+            self.checkpoint.save()
+        rebuild_derived()
+        self.stats['maintenance'] = (None, time.monotonic() - started)
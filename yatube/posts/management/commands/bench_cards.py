@@ -0,0 +1,60 @@
+import tempfile
+from io import BytesIO
+
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+from PIL import Image
+
+from core.benchmark import measure, scratch_database
+from posts.models import Group, Post, User
+from posts.templatetags.post_cards import post_cards
+from posts.views import POSTS_LIM
+
+
+def sample_image(name):
+    buffer = BytesIO()
+    Image.new('RGB', (1920, 1080), 'skyblue').save(buffer, 'JPEG')
+    return SimpleUploadedFile(name, buffer.getvalue(), 'image/jpeg')
+
+
+class Command(BaseCommand):
+    help = ('Время отрисовки карточек одной страницы с холодным и теплым '
+            'кешем фрагментов. Данные создаются во временной БД.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--no-images', action='store_true',
+                            help='Посты без картинок.')
+
+    def seed(self, with_images):
+        for i in range(POSTS_LIM):
+            Post.objects.create(
+                author=User.objects.create_user(username=f'bench_{i}'),
+                group=Group.objects.create(title=f'Группа {i}',
+                                           slug=f'bench-{i}'),
+                text=f'Пост {i}',
+                image=sample_image(f'bench_{i}.jpg') if with_images else '',
+            )
+
+    def handle(self, *args, **options):
+        repeat = options['repeat']
+        with tempfile.TemporaryDirectory() as media_root, \
+                override_settings(MEDIA_ROOT=media_root), \
+                scratch_database():
+            self.seed(not options['no_images'])
+            posts = list(Post.objects.for_cards())
+            post_cards(posts)
+
+            def cold():
+                cache.clear()
+                post_cards(posts)
+
+            cold_time = measure(cold, repeat)
+            warm_time = measure(lambda: post_cards(posts), repeat)
+            for name, timing in (('холодный', cold_time),
+                                 ('теплый', warm_time)):
+                self.stdout.write(
+                    f'{name} кеш: {timing["median"]:.2f} мс '
+                    f'(p95 {timing["p95"]:.2f}) на {len(posts)} карточек')
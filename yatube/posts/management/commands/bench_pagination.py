@@ -0,0 +1,53 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.core.paginator import Paginator
+from django.utils import timezone
+
+from core.benchmark import measure, scratch_database
+from posts.models import Post, User
+from posts.paginators import CursorPaginator, encode_cursor
+from posts.utils import explicit_auto_now
+from posts.views import POSTS_LIM
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает OFFSET- и keyset-пагинацию на первой и глубокой '
+            'странице. Данные создаются во временной БД.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--page', type=int, default=10000)
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def seed(self, count):
+        author = User.objects.create_user(username='bench')
+        now = timezone.now()
+        batch = [Post(author=author, text=f'Пост {i}',
+                      pub_date=now - timedelta(minutes=i))
+                 for i in range(count)]
+        with explicit_auto_now(Post, 'pub_date'):
+            Post.objects.bulk_create(batch, batch_size=500)
+
+    def handle(self, *args, **options):
+        deep_page = options['page']
+        repeat = options['repeat']
+        with scratch_database():
+            self.seed(deep_page * POSTS_LIM)
+            posts = Post.objects.all()
+            before_deep = posts.order_by('-pub_date', '-id')[
+                (deep_page - 1) * POSTS_LIM - 1]
+            cursors = {1: None, deep_page: encode_cursor(before_deep)}
+            for number in (1, deep_page):
+                # Как и в запросе, пагинатор каждый раз новый: count
+                # у Paginator кешируется на экземпляре.
+                offset = measure(lambda: list(Paginator(
+                    posts, POSTS_LIM).get_page(number).object_list), repeat)
+                cursor = measure(lambda: list(CursorPaginator(
+                    posts, POSTS_LIM).get_page(cursors[number]).object_list),
+                    repeat)
+                self.stdout.write(
+                    f'страница {number}: '
+                    f'page {offset["median"]:.2f} мс '
+                    f'(p95 {offset["p95"]:.2f}), '
+                    f'cursor {cursor["median"]:.2f} мс '
+                    f'(p95 {cursor["p95"]:.2f})')
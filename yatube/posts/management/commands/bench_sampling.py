@@ -0,0 +1,83 @@
+import statistics
+import time
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from core.benchmark import scratch_database
+from core.sampling import Sampler
+from posts import dataset
+from posts.models import Post
+
+# Частоты выборки в Гц; 0 - без выборки, от него считается прирост.
+RATES = (0, 10, 100, 1000)
+
+
+class Command(BaseCommand):
+    help = ('Накладные расходы фоновой выборки стеков (core.sampling): '
+            'время пачки запросов к главной, профилю и посту без выборки '
+            'и с выборкой на разных частотах, плюс цена одной выборки. '
+            'Кеш очищается перед каждым запросом, чтобы работали шаблоны '
+            'и ORM. Данные создаются во временной БД.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rounds', type=int, default=15)
+        parser.add_argument('--requests', type=int, default=20,
+                            help='Запросов каждого адреса в пачке.')
+        parser.add_argument('--rates', type=int, nargs='+', default=RATES)
+
+    def seed(self):
+        dataset.DatasetGenerator(
+            users=200, groups=10, posts=3000, comments=6000, seed=1).run()
+        post = Post.objects.annotate(total=Count('comments')).order_by(
+            '-total', 'id').first()
+        return [reverse('posts:index'),
+                reverse('posts:profile', args=[post.author.username]),
+                reverse('posts:post_detail', args=[post.id])]
+
+    def batch(self, client, urls, count):
+        start = time.perf_counter()
+        for _ in range(count):
+            for url in urls:
+                cache.clear()
+                client.get(url)
+        return (time.perf_counter() - start) * 1000
+
+    def handle(self, *args, **options):
+        rates = options['rates']
+        if 0 not in rates:
+            rates = [0, *rates]
+        if options['rounds'] < 1:
+            raise CommandError('--rounds должен быть больше нуля.')
+        timings = {rate: [] for rate in rates}
+        costs = {rate: [] for rate in rates if rate}
+        with scratch_database(), override_settings(DEBUG=False):
+            urls = self.seed()
+            client = Client()
+            self.batch(client, urls, 1)
+            # Частоты чередуются в каждом круге, чтобы дрейф машины
+            # не приписался одной из них.
+            for _ in range(options['rounds']):
+                for rate in rates:
+                    sampler = Sampler(1 / rate) if rate else None
+                    if sampler is not None:
+                        sampler.start()
+                    timings[rate].append(
+                        self.batch(client, urls, options['requests']))
+                    if sampler is not None:
+                        sampler.stop()
+                        costs[rate].append(
+                            sampler.sampling_time * 10 ** 6
+                            / max(sampler.samples, 1))
+        base = statistics.median(timings[0])
+        self.stdout.write(f'{"Гц":>6}{"пачка, мс":>12}{"прирост":>10}'
+                          f'{"выборка, мкс":>15}')
+        for rate in rates:
+            median = statistics.median(timings[rate])
+            cost = (f'{statistics.median(costs[rate]):>15.1f}' if rate
+                    else f'{"-":>15}')
+            self.stdout.write(f'{rate:>6}{median:>12.1f}'
+                              f'{(median / base - 1) * 100:>9.1f}%{cost}')
@@ -0,0 +1,77 @@
+import random
+
+from django.core.management.base import BaseCommand, CommandError
+from django.core.paginator import Paginator
+from django.db import connection
+from django.utils import timezone
+
+from core.benchmark import measure, scratch_database
+from posts import search
+from posts.models import Post, User
+from posts.views import POSTS_LIM
+
+SYLLABLES = ('ка', 'ро', 'ми', 'ту', 'ле', 'ва', 'но', 'си', 'да', 'пе',
+             'гу', 'ры', 'жо', 'ха', 'зе', 'бо', 'лу', 'ще', 'фа', 'ти')
+BATCH_SIZE = 10000
+
+
+def vocabulary(rng, size):
+    words = set()
+    while len(words) < size:
+        words.add(''.join(rng.choices(SYLLABLES, k=rng.randint(2, 4))))
+    return sorted(words)
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает поиск FTS5 с LIKE по первой странице выдачи. '
+            'Данные создаются во временной БД.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=1000000)
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--seed', type=int, default=1)
+
+    def seed(self, count, rng):
+        words = vocabulary(rng, 5000)
+        # Частоты слов по закону Ципфа, как в живом тексте.
+        weights = [1 / rank for rank in range(1, len(words) + 1)]
+        author = User.objects.create_user(username='bench')
+        now = timezone.now()
+        sql = (f'INSERT INTO {Post._meta.db_table} '
+               f'(text, pub_date, author_id, image, image_hash) '
+               f'VALUES (%s, %s, %s, %s, %s)')
+        with connection.cursor() as cursor:
+            for start in range(0, count, BATCH_SIZE):
+                size = min(BATCH_SIZE, count - start)
+                cursor.executemany(sql, [
+                    (' '.join(rng.choices(words, weights, k=30)),
+                     now, author.id, '', '')
+                    for _ in range(size)
+                ])
+        search.rebuild()
+        return words
+
+    def first_page(self, posts):
+        page = Paginator(posts, POSTS_LIM).get_page(1)
+        return page.paginator.count, list(page)
+
+    def handle(self, *args, **options):
+        if not search.available():
+            raise CommandError('Нужна база SQLite с поддержкой FTS5.')
+        rng = random.Random(options['seed'])
+        with scratch_database():
+            words = self.seed(options['posts'], rng)
+            queries = {'частое слово': words[0], 'редкое слово': words[-1]}
+            for name, word in queries.items():
+                like = Post.objects.for_cards().filter(text__icontains=word)
+                results = (
+                    ('LIKE', lambda: self.first_page(like)),
+                    ('FTS5', lambda: self.first_page(
+                        search.SearchResults(word))),
+                )
+                for method, run in results:
+                    timing = measure(run, options['repeat'])
+                    self.stdout.write(
+                        f'{name} «{word}», {method}: '
+                        f'{timing["median"]:.1f} мс '
+                        f'(p95 {timing["p95"]:.1f})')
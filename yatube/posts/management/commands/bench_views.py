@@ -0,0 +1,198 @@
+import json
+import statistics
+import time
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from core.benchmark import (QueryTimer, TemplateTimer, percentile,
+                            scratch_database)
+from posts import dataset, urls
+from posts.models import Follow, Post, User
+
+# Имя URL -> (кто запрашивает, метод, данные запроса). Новый URL в
+# posts/urls.py без сценария здесь остановит замер. Строку поиска
+# подставляет seed: первое слово поста из сгенерированных данных.
+SCENARIOS = {
+    'search': ('anonymous', 'get', None),
+    'follow_index': ('reader', 'get', None),
+    'profile_follow': ('reader', 'get', None),
+    'profile_unfollow': ('reader', 'get', None),
+    'add_comment': ('reader', 'post', {'text': 'Комментарий из замера'}),
+    'post_comments': ('anonymous', 'get', None),
+    'post_edit': ('author', 'get', None),
+    'post_create': ('author', 'get', None),
+    'group_export': ('reader', 'get', None),
+    'group_posts': ('anonymous', 'get', None),
+    'profile_export': ('reader', 'get', None),
+    'profile': ('anonymous', 'get', None),
+    'post_detail': ('anonymous', 'get', None),
+    'index': ('anonymous', 'get', None),
+}
+# Метрики времени, по которым сравнение с базой может провалить замер.
+GUARDED_TIMINGS = ('p50', 'p95')
+
+
+def regressions(results, baseline, slowdown, min_delta, extra_queries):
+    """Строки о том, что стало хуже базы больше допустимого."""
+    for name, current in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        for metric in GUARDED_TIMINGS:
+            limit = max(base[metric] * (1 + slowdown),
+                        base[metric] + min_delta)
+            if current[metric] > limit:
+                yield (f'{name}: {metric} {base[metric]:.1f} -> '
+                       f'{current[metric]:.1f} мс')
+        if current['queries'] > base['queries'] + extra_queries:
+            yield (f'{name}: запросов {base["queries"]} -> '
+                   f'{current["queries"]}')
+
+
+class Command(BaseCommand):
+    help = ('Задержка каждого URL из posts/urls.py через тестовый клиент '
+            'на синтетических данных во временной БД: p50/p95/p99, число '
+            'запросов, время SQL и шаблонов. С --baseline сравнивает с '
+            'сохраненным замером и завершается ошибкой при регрессии.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=50)
+        parser.add_argument('--warmup', type=int, default=3)
+        parser.add_argument('--users', type=int, default=300)
+        parser.add_argument('--posts', type=int, default=5000)
+        parser.add_argument('--comments', type=int, default=10000)
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--views', nargs='+', metavar='NAME',
+                            help='Только эти имена URL.')
+        parser.add_argument('--clear-cache', action='store_true',
+                            help='Очищать кеш перед каждым запросом.')
+        parser.add_argument('--baseline',
+                            help='JSON прошлого замера для сравнения.')
+        parser.add_argument('--save', help='Куда записать замер в JSON.')
+        parser.add_argument('--max-slowdown', type=float, default=0.2,
+                            help='Допустимый рост p50 и p95, доля.')
+        parser.add_argument('--min-delta', type=float, default=1.0,
+                            help='Рост меньше стольких мс не считается '
+                                 'регрессией.')
+        parser.add_argument('--max-extra-queries', type=int, default=0)
+
+    def seed(self, options):
+        dataset.DatasetGenerator(
+            users=options['users'], groups=10, posts=options['posts'],
+            comments=options['comments'], seed=options['seed'],
+        ).run()
+        post = Post.objects.exclude(group=None).annotate(
+            total=Count('comments')).order_by('-total', 'id').first()
+        reader_id = Follow.objects.values('user').annotate(
+            total=Count('id')).order_by('-total', 'user')[0]['user']
+        clients = {'anonymous': Client(), 'reader': Client(),
+                   'author': Client()}
+        clients['reader'].force_login(User.objects.get(pk=reader_id))
+        clients['author'].force_login(post.author)
+        kwargs = {'username': post.author.username,
+                  'slug': post.group.slug, 'post_id': post.id}
+        return clients, kwargs, post.text.split()[0]
+
+    def scenarios(self, selected, kwargs, word):
+        for pattern in urls.urlpatterns:
+            name = pattern.name
+            if selected and name not in selected:
+                continue
+            if name not in SCENARIOS:
+                raise CommandError(f'Нет сценария замера для {name}.')
+            client, method, data = SCENARIOS[name]
+            if name == 'search':
+                data = {'q': word}
+            url = reverse(f'{urls.app_name}:{name}', kwargs={
+                key: value for key, value in kwargs.items()
+                if key in pattern.pattern.converters
+            })
+            yield name, client, method, url, data
+
+    def request(self, client, method, url, data):
+        response = getattr(client, method)(url, data)
+        if response.streaming:
+            b''.join(response.streaming_content)
+        return response
+
+    def measure(self, client, method, url, data, options):
+        for _ in range(options['warmup']):
+            response = self.request(client, method, url, data)
+            if response.status_code >= 400:
+                raise CommandError(f'{url}: ответ {response.status_code}')
+        samples = {'queries': [], 'sql': [], 'template': []}
+        timings = []
+        templates = TemplateTimer()
+        with templates.installed():
+            for _ in range(options['repeat']):
+                if options['clear_cache']:
+                    cache.clear()
+                queries = QueryTimer()
+                templates.duration = 0.0
+                start = time.perf_counter()
+                with connection.execute_wrapper(queries):
+                    self.request(client, method, url, data)
+                timings.append((time.perf_counter() - start) * 1000)
+                samples['queries'].append(queries.count)
+                samples['sql'].append(queries.duration)
+                samples['template'].append(templates.duration)
+        timings.sort()
+        result = {
+            'p50': statistics.median(timings),
+            'p95': percentile(timings, 0.95),
+            'p99': percentile(timings, 0.99),
+        }
+        for metric, values in samples.items():
+            result[metric] = statistics.median(values)
+        result['queries'] = round(result['queries'])
+        return result
+
+    def report(self, results):
+        self.stdout.write(
+            f'{"URL":<18}{"p50":>9}{"p95":>9}{"p99":>9}'
+            f'{"запросов":>10}{"SQL":>9}{"шаблоны":>9}  (мс)')
+        for name, result in results.items():
+            self.stdout.write(
+                f'{name:<18}{result["p50"]:>9.2f}{result["p95"]:>9.2f}'
+                f'{result["p99"]:>9.2f}{result["queries"]:>10}'
+                f'{result["sql"]:>9.2f}{result["template"]:>9.2f}')
+
+    def handle(self, *args, **options):
+        if options['repeat'] < 1:
+            raise CommandError('--repeat должен быть больше нуля.')
+        baseline = None
+        if options['baseline']:
+            with open(options['baseline'], encoding='utf-8') as file:
+                baseline = json.load(file)
+        parameters = {key: options[key] for key in (
+            'users', 'posts', 'comments', 'seed', 'repeat', 'clear_cache')}
+        results = {}
+        # Без DEBUG: панель отладки и журнал запросов искажают замер.
+        with scratch_database(), override_settings(DEBUG=False):
+            clients, kwargs, word = self.seed(options)
+            for name, client, method, url, data in self.scenarios(
+                    options['views'], kwargs, word):
+                results[name] = self.measure(
+                    clients[client], method, url, data, options)
+        self.report(results)
+        if options['save']:
+            with open(options['save'], 'w', encoding='utf-8') as file:
+                json.dump({'parameters': parameters, 'views': results},
+                          file, ensure_ascii=False, indent=2)
+        if baseline is None:
+            return
+        if baseline['parameters'] != parameters:
+            self.stderr.write('Параметры замера отличаются от базы: '
+                              f'{baseline["parameters"]}')
+        found = list(regressions(
+            results, baseline['views'], options['max_slowdown'],
+            options['min_delta'], options['max_extra_queries']))
+        if found:
+            raise CommandError('Регрессии относительно базы:\n'
+                               + '\n'.join(found))
+        self.stdout.write('Регрессий относительно базы нет.')
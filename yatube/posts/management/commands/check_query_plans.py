@@ -0,0 +1,95 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import F
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from core.benchmark import scratch_database
+from posts.models import Comment, Follow, Group, Post, User
+from posts.paginators import encode_cursor
+
+NO_CACHE = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.dummy.DummyCache',
+    }
+}
+
+
+def plan_problems(sql, params):
+    """Строки плана SQLite с сортировкой во временном B-дереве или
+    полным просмотром таблицы без индекса."""
+    with connection.cursor() as cursor:
+        cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+        details = [row[-1] for row in cursor.fetchall()]
+    return [
+        detail for detail in details
+        if 'TEMP B-TREE' in detail
+        or (detail.startswith('SCAN') and 'INDEX' not in detail)
+    ]
+
+
+class Command(BaseCommand):
+    help = ('Проверяет EXPLAIN QUERY PLAN запросов страниц постов и API: '
+            'ошибка, если есть сортировка во временном B-дереве '
+            'или полный просмотр таблицы.')
+
+    def seed(self):
+        reader = User.objects.create_user(username='reader')
+        author = User.objects.create_user(username='author')
+        group = Group.objects.create(title='Группа', slug='group')
+        post = Post.objects.create(author=author, group=group, text='Пост')
+        Comment.objects.create(author=reader, post=post, text='Текст')
+        Follow.objects.create(user=reader, author=author)
+        return reader, post
+
+    def urls(self, post):
+        cursor = {'cursor': encode_cursor(post)}
+        comment = Comment.objects.annotate(
+            _cursor_date=F('created'), _cursor_id=F('id')).get(post=post)
+        comments_url = reverse('posts:post_comments', args=[post.id])
+        api_lists = (
+            reverse('api:post_list'),
+            reverse('api:group_posts', args=[post.group.slug]),
+            reverse('api:profile_posts', args=[post.author.username]),
+            reverse('api:follow_feed'),
+        )
+        lists = (
+            reverse('posts:index'),
+            reverse('posts:group_posts', args=[post.group.slug]),
+            reverse('posts:profile', args=[post.author.username]),
+        )
+        return [
+            *((url, {}) for url in lists),
+            *((url, cursor) for url in lists),
+            (reverse('posts:post_detail', args=[post.id]), {}),
+            (comments_url, {'cursor': encode_cursor(comment)}),
+            (reverse('posts:follow_index'), {}),
+            (reverse('posts:follow_index'), cursor),
+            *((url, params) for url in api_lists for params in ({}, cursor)),
+        ]
+
+    def handle(self, *args, **options):
+        failures = []
+        with scratch_database(), override_settings(CACHES=NO_CACHE):
+            reader, post = self.seed()
+            client = Client()
+            client.force_login(reader)
+            for url, params in self.urls(post):
+                with CaptureQueriesContext(connection) as queries:
+                    client.get(url, params)
+                for query in queries.captured_queries:
+                    sql = query['sql']
+                    if not sql.startswith('SELECT'):
+                        continue
+                    # Параметры уже подставлены в sql при логировании.
+                    problems = plan_problems(sql, ())
+                    if problems:
+                        failures.append((url, sql, problems))
+                    elif options['verbosity'] > 1:
+                        self.stdout.write(f'OK {url}: {sql}')
+        for url, sql, problems in failures:
+            self.stderr.write(f'{url}: {sql}\n  ' + '\n  '.join(problems))
+        if failures:
+            raise CommandError(f'Неудачных планов запросов: {len(failures)}')
+        self.stdout.write('Все планы запросов используют индексы.')
@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import export
+from posts.models import Group, User
+
+
+class Command(BaseCommand):
+    help = ('Выгружает посты или комментарии автора и (или) группы в '
+            'JSONL или CSV, с --images - в zip вместе с картинками. '
+            'Строки читаются из БД частями, память не растет.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--author', help='Имя пользователя автора.')
+        parser.add_argument('--group', help='Адрес (slug) группы.')
+        parser.add_argument('--format', choices=export.FORMATS,
+                            default='jsonl')
+        parser.add_argument('--kind', choices=export.KINDS, default='posts')
+        parser.add_argument('--images', action='store_true',
+                            help='Zip-архив с картинками постов.')
+        parser.add_argument('-o', '--output',
+                            help='Файл; без него - стандартный вывод.')
+
+    def handle(self, *args, **options):
+        try:
+            author = options['author'] and User.objects.get(
+                username=options['author'])
+            group = options['group'] and Group.objects.get(
+                slug=options['group'])
+        except (User.DoesNotExist, Group.DoesNotExist) as exc:
+            raise CommandError(exc)
+        if options['images'] and not options['output']:
+            raise CommandError('Для zip-архива укажите --output.')
+        chunks = export.export(options['format'], options['kind'],
+                               author or None, group or None,
+                               options['images'])
+        if not options['output']:
+            for line in chunks:
+                self.stdout.write(line, ending='')
+            return
+        mode = 'wb' if options['images'] else 'w'
+        encoding = None if options['images'] else 'utf-8'
+        with open(options['output'], mode, encoding=encoding,
+                  newline='' if encoding else None) as file:
+            for chunk in chunks:
+                file.write(chunk)
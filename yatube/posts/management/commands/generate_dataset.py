@@ -0,0 +1,94 @@
+from argparse import ArgumentTypeError
+from datetime import datetime, time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date, parse_datetime
+
+from posts import dataset
+
+
+def moment(value):
+    """Дата или дата и время ISO 8601 для --now."""
+    parsed = parse_datetime(value)
+    if parsed is None:
+        date = parse_date(value)
+        if date is None:
+            raise ArgumentTypeError(f'Не дата: {value}')
+        parsed = datetime.combine(date, time())
+    return parsed
+
+
+class Command(BaseCommand):
+    help = ('Заполняет базу синтетическими данными: пользователи, группы, '
+            'посты, комментарии и подписки. Число подписчиков и постов '
+            'авторов подчиняется степенному закону, время публикации '
+            'растет к концу периода и следует суточному ритму. Строки '
+            'вставляются пачками, одни и те же --seed и --now дают те же '
+            'данные. Миниатюры для картинок создает '
+            'pregenerate_thumbnails.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--groups', type=int, default=20)
+        parser.add_argument('--posts', type=int, default=10000)
+        parser.add_argument('--comments', type=int, default=20000)
+        parser.add_argument('--follows', type=int, default=20,
+                            help='Подписок на пользователя в среднем.')
+        parser.add_argument('--images', type=int, default=0,
+                            help='Сколько разных картинок создать в '
+                                 'MEDIA_ROOT.')
+        parser.add_argument('--image-share', type=float, default=0.1,
+                            help='Доля постов с картинкой.')
+        parser.add_argument('--days', type=int, default=365,
+                            help='За сколько последних дней посты.')
+        parser.add_argument('--now', type=moment,
+                            default=dataset.DEFAULT_NOW,
+                            help='Конец периода, от которого считаются '
+                                 'все даты, например 2025-01-01 (UTC, '
+                                 'если без пояса). По умолчанию '
+                                 f'{dataset.DEFAULT_NOW.date()}.')
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--keep-indexes', action='store_true',
+                            help='Не снимать индексы постов и комментариев '
+                                 'на время вставки.')
+        parser.add_argument('--no-feeds', action='store_true',
+                            help='Не собирать ленты подписок: на больших '
+                                 'объемах это самая долгая часть. Собрать '
+                                 'их можно позже командой rebuild_feed.')
+
+    def log(self, message, verbosity=1):
+        if self.verbosity >= verbosity:
+            self.stdout.write(message)
+
+    def handle(self, *args, **options):
+        self.verbosity = options['verbosity']
+        if min(options['users'], options['groups'], options['posts'],
+               options['comments'], options['follows'],
+               options['images'], options['days']) < 0:
+            raise CommandError('Количества не могут быть отрицательными.')
+        generator = dataset.DatasetGenerator(
+            users=options['users'],
+            groups=options['groups'],
+            posts=options['posts'],
+            comments=options['comments'],
+            follows=options['follows'],
+            images=options['images'],
+            image_share=options['image_share'],
+            days=options['days'],
+            seed=options['seed'],
+            now=options['now'],
+            drop_indexes=not options['keep_indexes'],
+            feeds=not options['no_feeds'],
+            log=self.log,
+        )
+        try:
+            stats = generator.run()
+        except ValueError as error:
+            raise CommandError(error)
+        for kind, (rows, seconds) in stats.items():
+            if rows is None:
+                self.log(f'{kind}: {seconds:.1f} с')
+                continue
+            rate = rows / seconds if seconds else 0
+            self.log(f'{kind}: {rows} строк за {seconds:.1f} с, '
+                     f'{rate:.0f} строк/с')
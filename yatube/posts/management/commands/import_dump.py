@@ -0,0 +1,57 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import importer
+
+
+class Command(BaseCommand):
+    help = ('Загружает дамп из каталога: users, groups, posts, comments и '
+            'follows в файлах .jsonl или .csv (формат export_posts). '
+            'Пачки вставляются через bulk_create, картинки копируются '
+            'пулом процессов, прогресс сохраняется в файл, и повторный '
+            'запуск продолжает с места остановки.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('directory')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--workers', type=int, default=os.cpu_count(),
+                            help='Процессов для картинок; 0 - без пула.')
+        parser.add_argument('--images-dir',
+                            help='Откуда брать картинки; по умолчанию '
+                                 'каталог дампа.')
+        parser.add_argument('--checkpoint',
+                            help='Файл прогресса; по умолчанию '
+                                 '.import-checkpoint.json в каталоге дампа.')
+        parser.add_argument('--drop-indexes', action='store_true',
+                            help='Снять индексы постов и комментариев на '
+                                 'время загрузки.')
+
+    def log(self, message, verbosity=1):
+        if self.verbosity >= verbosity:
+            self.stdout.write(message)
+
+    def handle(self, *args, **options):
+        directory = options['directory']
+        if not os.path.isdir(directory):
+            raise CommandError(f'Нет каталога {directory}')
+        self.verbosity = options['verbosity']
+        checkpoint = importer.Checkpoint(options['checkpoint'] or os.path.join(
+            directory, '.import-checkpoint.json'))
+        if checkpoint['post_offset'] is not None:
+            self.log('Продолжаем загрузку с сохраненного места.')
+        stats = importer.Importer(
+            directory, checkpoint,
+            batch_size=options['batch_size'],
+            workers=options['workers'],
+            images_dir=options['images_dir'],
+            drop_indexes=options['drop_indexes'],
+            log=self.log,
+        ).run()
+        for kind, (rows, seconds) in stats.items():
+            if rows is None:
+                self.log(f'{kind}: {seconds:.1f} с')
+                continue
+            rate = rows / seconds if seconds else 0
+            self.log(f'{kind}: {rows} строк за {seconds:.1f} с, '
+                     f'{rate:.0f} строк/с')
@@ -0,0 +1,39 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from posts import thumbnails
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = ('Создает недостающие миниатюры для уже загруженных '
+            'картинок постов.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int,
+                            default=settings.POSTS_THUMBNAIL_WORKERS,
+                            help='Потоков; 0 - без пула.')
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        images = Post.objects.exclude(image_hash='').values_list('id', 'image')
+        missing = [
+            post_id for post_id, image in images.iterator()
+            if thumbnails.ready(image) is None
+        ]
+        if options['workers']:
+            with ThreadPoolExecutor(options['workers']) as pool:
+                results = list(pool.map(
+                    thumbnails.generate_in_worker, missing))
+        else:
+            results = [thumbnails.generate(post_id) for post_id in missing]
+        done = sum(results)
+        self.stdout.write(
+            f'Создано миниатюр: {done} из {len(missing)} недостающих '
+            f'за {time.monotonic() - started:.1f} с')
+        if done < len(missing):
+            self.stderr.write(f'Не удалось: {len(missing) - done}, '
+                              f'подробности в логе.')
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import search
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает полнотекстовый индекс FTS5 по текстам постов.'
+
+    def handle(self, *args, **options):
+        if not search.available():
+            raise CommandError(
+                'Полнотекстовый поиск работает только на SQLite.')
+        count = search.rebuild()
+        self.stdout.write(f'Проиндексировано постов: {count}')
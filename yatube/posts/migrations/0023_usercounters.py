@@ -0,0 +1,53 @@
+# Generated by Django 2.2.28 on 2026-10-18 02:44
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_counters(apps, schema_editor):
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split('.'))
+    UserCounters = apps.get_model('posts', 'UserCounters')
+    counts = {}
+    sources = (
+        ('posts', apps.get_model('posts', 'Post'), 'author'),
+        ('comments', apps.get_model('posts', 'Comment'), 'author'),
+        ('followers', apps.get_model('posts', 'Follow'), 'author'),
+        ('following', apps.get_model('posts', 'Follow'), 'user'),
+    )
+    for field, model, key in sources:
+        rows = model.objects.values_list(key).annotate(
+            total=models.Count('pk')).order_by()
+        for user_id, total in rows:
+            counts.setdefault(user_id, {})[field] = total
+    UserCounters.objects.bulk_create(
+        (UserCounters(user_id=user_id, **counts.get(user_id, {}))
+         for user_id in User.objects.values_list('id', flat=True)),
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0011_update_proxy_permissions'),
+        ('posts', '0022_auto_20261018_0240'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserCounters',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='counters', serialize=False, to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+                ('posts', models.PositiveIntegerField(default=0, verbose_name='Постов')),
+                ('comments', models.PositiveIntegerField(default=0, verbose_name='Комментариев')),
+                ('followers', models.PositiveIntegerField(default=0, verbose_name='Подписчиков')),
+                ('following', models.PositiveIntegerField(default=0, verbose_name='Подписок')),
+            ],
+            options={
+                'verbose_name': 'Счетчики пользователя',
+                'verbose_name_plural': 'Счетчики пользователей',
+            },
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,75 @@
+# Generated by Django 2.2.28 on 2026-10-18 03:08
+
+import hashlib
+
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.images import get_image_dimensions
+from django.db import migrations, models
+
+BATCH_SIZE = 500
+FIELDS = ('image_width', 'image_height', 'image_size', 'image_hash')
+
+
+def read_metadata(image):
+    digest = hashlib.sha256()
+    size = 0
+    with image.storage.open(image.name) as file:
+        for chunk in file.chunks():
+            digest.update(chunk)
+            size += len(chunk)
+        file.seek(0)
+        width, height = get_image_dimensions(file)
+    return width, height, size, digest.hexdigest()
+
+
+def fill_image_metadata(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    posts = Post.objects.exclude(image='').only('id', 'image').order_by('id')
+    last_id = 0
+    # Пачки по id, а не iterator(): в SQLite запись в таблицу во время
+    # чтения курсора по ней же не изолирована.
+    while True:
+        batch = list(posts.filter(id__gt=last_id)[:BATCH_SIZE])
+        if not batch:
+            break
+        last_id = batch[-1].id
+        updated = []
+        for post in batch:
+            try:
+                values = read_metadata(post.image)
+            except (OSError, ValueError, SuspiciousFileOperation):
+                continue
+            for field, value in zip(FIELDS, values):
+                setattr(post, field, value)
+            updated.append(post)
+        Post.objects.bulk_update(updated, FIELDS)
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0025_auto_20261018_0250'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='image_hash',
+            field=models.CharField(blank=True, editable=False, max_length=64, verbose_name='SHA-256 картинки'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='image_height',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True, verbose_name='Высота картинки'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='image_size',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True, verbose_name='Размер картинки, байт'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='image_width',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True, verbose_name='Ширина картинки'),
+        ),
+        migrations.RunPython(fill_image_metadata, migrations.RunPython.noop),
+    ]
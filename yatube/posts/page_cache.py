@@ -0,0 +1,111 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.middleware.csrf import get_token
+
+VERSION_KEY = 'posts:version:{}'
+PAGE_KEY = 'posts:page:{}'
+CARD_KEY = 'posts:card:{}:{}:{}:{}'
+CARD_TIMEOUT = 60 * 60 * 24
+INDEX = 'index'
+# Названия и адреса групп, имена авторов есть в карточках на любой
+# странице, поэтому эта версия входит в ключ каждой страницы; меняется
+# она редко.
+GROUPS = 'groups'
+
+
+def group_scope(group_id):
+    return f'group:{group_id}'
+
+
+def author_scope(author_id):
+    return f'author:{author_id}'
+
+
+def feed_scope(user_id):
+    return f'feed:{user_id}'
+
+
+def comments_scope(post_id):
+    return f'comments:{post_id}'
+
+
+def post_card_scope(post_id):
+    return f'card:post:{post_id}'
+
+
+def author_card_scope(author_id):
+    return f'card:author:{author_id}'
+
+
+def _new_version():
+    # Не начинаем с 1: после вытеснения ключа версии из кеша номер
+    # не должен совпасть со старым и поднять устаревшие страницы.
+    return time.time_ns()
+
+
+def versions(scopes):
+    keys = [VERSION_KEY.format(scope) for scope in scopes]
+    found = cache.get_many(keys)
+    missing = {key: _new_version() for key in keys if key not in found}
+    if missing:
+        cache.set_many(missing, timeout=None)
+        found.update(missing)
+    return [found[key] for key in keys]
+
+
+def bump(*scopes):
+    """Сбрасывает закешированные страницы указанных областей."""
+    for scope in set(scopes):
+        key = VERSION_KEY.format(scope)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, _new_version(), timeout=None)
+
+
+def page_digest(request, scopes, csrf=False):
+    """Хеш страницы: адрес, страница или курсор, вариант и версии.
+
+    Служит и ключом кеша, и ETag: сменится только со сменой версий.
+    С csrf=True (на странице форма с {% csrf_token %}) вариант включает
+    секрет CSRF: после нового входа он другой, и браузер не получит 304
+    на страницу со старым токеном.
+    """
+    user = request.user
+    # В шапке выводится имя пользователя, поэтому вариант персональный.
+    variant = f'user:{user.pk}' if user.is_authenticated else 'anon'
+    if csrf:
+        # get_token выдает каждый раз новую маску, сам секрет - в META.
+        get_token(request)
+        variant += f':csrf:{request.META["CSRF_COOKIE"]}'
+    parts = [
+        request.path,
+        variant,
+        request.GET.get('page', ''),
+        request.GET.get('cursor', ''),
+        str(settings.POSTS_CURSOR_PAGINATION),
+        *map(str, versions(scopes)),
+    ]
+    return hashlib.md5('|'.join(parts).encode()).hexdigest()
+
+
+def card_keys(posts):
+    """Ключи карточек {post.id: ключ} одним запросом версий к кешу."""
+    scopes = [GROUPS]
+    for post in posts:
+        scopes.append(post_card_scope(post.id))
+        scopes.append(author_card_scope(post.author_id))
+    scopes = list(dict.fromkeys(scopes))
+    current = dict(zip(scopes, versions(scopes)))
+    return {
+        post.id: CARD_KEY.format(
+            post.id,
+            current[post_card_scope(post.id)],
+            current[author_card_scope(post.author_id)],
+            current[GROUPS],
+        )
+        for post in posts
+    }
@@ -0,0 +1,129 @@
+import base64
+from collections.abc import Sequence
+
+from django.db.models import F, Q
+from django.utils.dateparse import parse_datetime
+
+NEXT = 'n'
+PREVIOUS = 'p'
+
+
+def encode_cursor(item, direction=NEXT):
+    """Непрозрачный курсор на позицию объекта в ленте.
+
+    Берет ключи, подключенные CursorPaginator (в том числе у строк
+    values()), а у объекта не из пагинатора - pub_date и id поста.
+    """
+    if isinstance(item, dict):
+        # Строка из values(): аннотации пагинатора входят в нее.
+        date, item_id = item['_cursor_date'], item['_cursor_id']
+    else:
+        date = getattr(item, '_cursor_date', None) or item.pub_date
+        item_id = getattr(item, '_cursor_id', None) or item.id
+    raw = f'{direction}|{date.isoformat()}|{item_id}'
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Возвращает (direction, pub_date, id) или None для битого курсора."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        direction, pub_date, post_id = raw.decode().split('|')
+        pub_date = parse_datetime(pub_date)
+        post_id = int(post_id)
+    except (TypeError, ValueError):
+        return None
+    if direction not in (NEXT, PREVIOUS) or pub_date is None:
+        return None
+    return direction, pub_date, post_id
+
+
+class CursorPage(Sequence):
+    keyset = True
+
+    def __init__(self, object_list, paginator, has_next, has_previous):
+        self.object_list = object_list
+        self.paginator = paginator
+        self._has_next = has_next
+        self._has_previous = has_previous
+
+    def __repr__(self):
+        return f'<CursorPage of {len(self.object_list)} objects>'
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_other_pages(self):
+        return self._has_next or self._has_previous
+
+    @property
+    def next_cursor(self):
+        if self._has_next and self.object_list:
+            return encode_cursor(self.object_list[-1], NEXT)
+        return None
+
+    @property
+    def previous_cursor(self):
+        if self._has_previous and self.object_list:
+            return encode_cursor(self.object_list[0], PREVIOUS)
+        return None
+
+
+class CursorPaginator:
+    """Keyset-пагинация по (pub_date, id) без OFFSET и COUNT(*).
+
+    Порядок совпадает с Post.Meta.ordering, id разрешает совпадения дат.
+    keys задает поля сортировки с теми же значениями, например поля
+    записи ленты, чтобы запрос шел по ее индексу, или (created, id)
+    для комментариев. Ключи подключаются
+    аннотациями: так они используют соединение из уже сделанного
+    filter(), а не добавляют новое.
+    """
+
+    def __init__(self, object_list, per_page, keys=('pub_date', 'id')):
+        self.object_list = object_list
+        self.per_page = int(per_page)
+        self.keys = keys
+
+    def get_page(self, cursor=None):
+        position = decode_cursor(cursor) if cursor else None
+        date_key, id_key = '_cursor_date', '_cursor_id'
+        posts = self.object_list.annotate(**{
+            date_key: F(self.keys[0]),
+            id_key: F(self.keys[1]),
+        })
+        if position is None:
+            direction = NEXT
+            posts = posts.order_by(f'-{date_key}', f'-{id_key}')
+        else:
+            direction, pub_date, post_id = position
+            lookup = 'lt' if direction == NEXT else 'gt'
+            # Нестрогая граница по дате дает индексу диапазон: одно
+            # условие OR SQLite проверяет построчно с начала индекса.
+            posts = posts.filter(
+                Q(**{f'{date_key}__{lookup}e': pub_date}),
+                Q(**{f'{date_key}__{lookup}': pub_date})
+                | Q(**{date_key: pub_date, f'{id_key}__{lookup}': post_id}),
+            )
+            if direction == NEXT:
+                posts = posts.order_by(f'-{date_key}', f'-{id_key}')
+            else:
+                posts = posts.order_by(date_key, id_key)
+        rows = list(posts[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if direction == PREVIOUS:
+            rows.reverse()
+            return CursorPage(rows, self, has_next=True,
+                              has_previous=has_more)
+        return CursorPage(rows, self, has_next=has_more,
+                          has_previous=position is not None)
@@ -0,0 +1,22 @@
+# Наибольшее число запросов к БД для URL из urls.py при пустом кеше
+# страниц, вместе с запросами сессии и пользователя; в тестах
+# транзакции представлений считаются точками сохранения (SAVEPOINT и
+# RELEASE - по запросу). Проверяется в
+# posts/tests/test_views.py (QueryCountTest): URL без бюджета или
+# превысивший его роняет тесты со списком SQL.
+QUERY_BUDGETS = {
+    'search': 5,
+    'follow_index': 4,
+    'profile_follow': 6,
+    'profile_unfollow': 14,
+    'add_comment': 9,
+    'post_comments': 2,
+    'post_edit': 4,
+    'post_create': 3,
+    'group_export': 4,
+    'group_posts': 5,
+    'profile_export': 4,
+    'profile': 6,
+    'post_detail': 5,
+    'index': 4,
+}
@@ -0,0 +1,124 @@
+import re
+
+from django.db import connection
+from django.db.models.expressions import RawSQL
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from .models import Post
+
+FTS_TABLE = 'posts_post_fts'
+CREATE_SQL = (f'CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} '
+              f'USING fts5(text, tokenize="unicode61", prefix="2 3")')
+DROP_SQL = f'DROP TABLE IF EXISTS {FTS_TABLE}'
+# Маркеры подсветки: управляющие символы не встречаются в тексте постов
+# и переживают экранирование HTML.
+MARK_START, MARK_END = '\x02', '\x03'
+SNIPPET_TOKENS = 24
+# bm25 считается для каждого совпадения: если их больше, выдача идет
+# от новых постов к старым без сортировки по релевантности.
+RANK_LIMIT = 5000
+WORD = re.compile(r'\w+')
+
+
+def available():
+    return connection.vendor == 'sqlite'
+
+
+def match_query(text):
+    """Безопасный запрос FTS5: все слова, последнее как префикс.
+
+    Префикс раскрывается во все подходящие термины, поэтому только для
+    последнего, возможно недописанного слова.
+    """
+    words = [f'"{word}"' for word in WORD.findall(text)]
+    if words:
+        words[-1] += '*'
+    return ' '.join(words)
+
+
+def index_post(post):
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s',
+                       [post.pk])
+        cursor.execute(f'INSERT INTO {FTS_TABLE}(rowid, text) '
+                       f'VALUES (%s, %s)', [post.pk, post.text])
+
+
+def remove_post(post_id):
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s',
+                       [post_id])
+
+
+def rebuild():
+    """Заново заполняет индекс из таблицы постов, возвращает их число."""
+    with connection.cursor() as cursor:
+        cursor.execute(DROP_SQL)
+        cursor.execute(CREATE_SQL)
+        cursor.execute(f'INSERT INTO {FTS_TABLE}(rowid, text) '
+                       f'SELECT id, text FROM {Post._meta.db_table}')
+        cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) "
+                       f"VALUES ('optimize')")
+        cursor.execute(f'SELECT count(*) FROM {FTS_TABLE}')
+        return cursor.fetchone()[0]
+
+
+def matching_ids(text):
+    """Подзапрос id постов для фильтра queryset (используется в админке)."""
+    return RawSQL(f'SELECT rowid FROM {FTS_TABLE} '
+                  f'WHERE {FTS_TABLE} MATCH %s', [match_query(text)])
+
+
+def highlight(snippet):
+    html = escape(snippet)
+    return mark_safe(html.replace(MARK_START, '<mark>')
+                     .replace(MARK_END, '</mark>'))
+
+
+class SearchResults:
+    """Найденные посты по релевантности для Paginator.
+
+    Срез выполняет один запрос к FTS5 и один за постами страницы.
+    """
+
+    def __init__(self, text):
+        self.query = match_query(text)
+        self._count = None
+
+    def count(self):
+        if not self.query:
+            return 0
+        if self._count is None:
+            with connection.cursor() as cursor:
+                cursor.execute(f'SELECT count(*) FROM {FTS_TABLE} '
+                               f'WHERE {FTS_TABLE} MATCH %s', [self.query])
+                self._count = cursor.fetchone()[0]
+        return self._count
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        if not self.query:
+            return []
+        start = index.start or 0
+        order = 'rank' if self.count() <= RANK_LIMIT else 'rowid DESC'
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT rowid, snippet({FTS_TABLE}, 0, %s, %s, %s, %s) '
+                f'FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s '
+                f'ORDER BY {order} LIMIT %s OFFSET %s',
+                [MARK_START, MARK_END, '…', SNIPPET_TOKENS, self.query,
+                 index.stop - start, start])
+            rows = cursor.fetchall()
+        posts = Post.objects.for_cards().in_bulk([row[0] for row in rows])
+        results = []
+        for post_id, snippet in rows:
+            post = posts.get(post_id)
+            if post is not None:
+                post.snippet = highlight(snippet)
+                results.append(post)
+        return results
@@ -0,0 +1,111 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import counters, feed, images, page_cache, search
+from .models import Comment, Follow, Group, Post, User
+
+NAME_FIELDS = {'username', 'first_name', 'last_name'}
+
+
+def bump_post_pages(post, *group_ids):
+    # Области по id: обработчик не загружает автора и группу, удаление
+    # пользователя или группы со многими постами не дает запроса на пост.
+    page_cache.bump(
+        page_cache.INDEX,
+        page_cache.author_scope(post.author_id),
+        *(page_cache.group_scope(group_id)
+          for group_id in group_ids if group_id),
+    )
+
+
+@receiver(pre_save, sender=Post)
+def post_remember_group(sender, instance, raw=False, **kwargs):
+    instance._saved_group_id = None
+    saved_image = None
+    if instance.pk and not raw:
+        instance._saved_group_id, saved_image = Post.objects.filter(
+            pk=instance.pk).values_list('group_id', 'image').first() or (
+            None, None)
+    if raw:
+        return
+    image = instance.image
+    if (not image._committed or image.name != saved_image
+            or (image and not instance.image_hash)):
+        images.fill(instance)
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, **kwargs):
+    if created:
+        feed.fan_out_post(instance)
+        counters.change(instance.author_id, 'posts', 1)
+    else:
+        page_cache.bump(page_cache.post_card_scope(instance.pk))
+    if search.available():
+        search.index_post(instance)
+    bump_post_pages(instance, instance.group_id,
+                    getattr(instance, '_saved_group_id', None))
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    counters.change(instance.author_id, 'posts', -1)
+    if search.available():
+        search.remove_post(instance.pk)
+    bump_post_pages(instance, instance.group_id)
+
+
+@receiver(post_save, sender=Group)
+def group_saved(sender, instance, **kwargs):
+    page_cache.bump(page_cache.GROUPS, page_cache.group_scope(instance.pk))
+
+
+@receiver(post_delete, sender=Group)
+def group_deleted(sender, instance, **kwargs):
+    page_cache.bump(page_cache.GROUPS, page_cache.group_scope(instance.pk))
+
+
+@receiver(post_save, sender=Comment)
+def comment_created(sender, instance, created, **kwargs):
+    if created:
+        counters.change(instance.author_id, 'comments', 1)
+        page_cache.bump(page_cache.comments_scope(instance.post_id))
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    counters.change(instance.author_id, 'comments', -1)
+    page_cache.bump(page_cache.comments_scope(instance.post_id))
+
+
+@receiver(post_save, sender=Follow)
+def follow_created(sender, instance, created, **kwargs):
+    if created:
+        feed.backfill(instance.user, instance.author)
+        counters.change(instance.author_id, 'followers', 1)
+        counters.change(instance.user_id, 'following', 1)
+    # В профиле подписчика выводится число его подписок.
+    page_cache.bump(page_cache.author_scope(instance.author_id),
+                    page_cache.author_scope(instance.user_id),
+                    page_cache.feed_scope(instance.user_id))
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    feed.prune(instance.user_id, instance.author_id)
+    counters.change(instance.author_id, 'followers', -1)
+    counters.change(instance.user_id, 'following', -1)
+    # В профиле подписчика выводится число его подписок.
+    page_cache.bump(page_cache.author_scope(instance.author_id),
+                    page_cache.author_scope(instance.user_id),
+                    page_cache.feed_scope(instance.user_id))
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, update_fields=None, **kwargs):
+    # Вход обновляет только last_login: карточки автора не меняются.
+    if created or (update_fields and not NAME_FIELDS & set(update_fields)):
+        return
+    # Имя автора и комментатора выводится на страницах всех видов.
+    page_cache.bump(page_cache.author_card_scope(instance.pk),
+                    page_cache.GROUPS)
@@ -0,0 +1,27 @@
+from django import template
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from posts import page_cache
+
+register = template.Library()
+
+
+@register.simple_tag
+def post_cards(posts):
+    """HTML карточек постов; готовые берутся из кеша одним get_many."""
+    posts = list(posts)
+    keys = page_cache.card_keys(posts)
+    cached = cache.get_many(list(keys.values()))
+    cards, rendered = [], {}
+    for post in posts:
+        key = keys[post.id]
+        card = cached.get(key)
+        if card is None:
+            card = render_to_string('includes/postcard.html', {'post': post})
+            rendered[key] = card
+        cards.append(mark_safe(card))
+    if rendered:
+        cache.set_many(rendered, page_cache.CARD_TIMEOUT)
+    return cards
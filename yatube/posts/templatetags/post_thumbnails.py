@@ -0,0 +1,11 @@
+from django import template
+
+from posts import thumbnails
+
+register = template.Library()
+
+
+@register.simple_tag
+def post_thumbnail(image):
+    """Миниатюра, созданная заранее, или None, пока она не готова."""
+    return thumbnails.ready(image)
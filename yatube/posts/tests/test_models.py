@@ -1,6 +1,30 @@
-from django.test import TestCase
+import json
+import os
+import shutil
+import tempfile
+from datetime import datetime
+from io import StringIO
+from unittest import mock
 
-from ..models import Comment, Group, Post, User
+from django.conf import settings
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from .. import importer
+from ..models import (Comment, FeedEntry, Follow, Group, Post, User,
+                      UserCounters)
+
+IMPORT_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
 
 
 class PostModelTest(TestCase):
@@ -136,3 +160,223 @@ class CommentModelTest(TestCase):
                 self.assertEqual(
                     self.comment._meta.get_field(field).help_text,
                     expected_value)
+
+
+class UserCountersTest(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='author')
+        self.reader = User.objects.create_user(username='reader')
+
+    def counters(self, user):
+        return UserCounters.objects.get(user=user)
+
+    def test_counters_follow_create_and_delete(self):
+        """Счетчики меняются при создании и удалении записей."""
+        post = Post.objects.create(author=self.author, text='Пост')
+        Comment.objects.create(author=self.reader, post=post, text='Текст')
+        follow = Follow.objects.create(author=self.author, user=self.reader)
+        self.assertEqual(self.counters(self.author).posts, 1)
+        self.assertEqual(self.counters(self.author).followers, 1)
+        self.assertEqual(self.counters(self.reader).following, 1)
+        self.assertEqual(self.counters(self.reader).comments, 1)
+        follow.delete()
+        post.delete()
+        self.assertEqual(self.counters(self.author).posts, 0)
+        self.assertEqual(self.counters(self.author).followers, 0)
+        self.assertEqual(self.counters(self.reader).following, 0)
+        self.assertEqual(self.counters(self.reader).comments, 0)
+
+    def test_cascade_delete_of_user(self):
+        """Удаление пользователя уменьшает счетчики связанных с ним."""
+        post = Post.objects.create(author=self.reader, text='Пост')
+        Comment.objects.create(author=self.author, post=post, text='Текст')
+        Follow.objects.create(author=self.author, user=self.reader)
+        self.reader.delete()
+        counters = self.counters(self.author)
+        self.assertEqual((counters.comments, counters.followers), (0, 0))
+
+    def test_cascade_delete_does_not_load_authors_and_groups(self):
+        """Сброс страниц при удалении постов не читает авторов и группы."""
+        group = Group.objects.create(title='Группа', slug='group')
+        for i in range(3):
+            Post.objects.create(author=self.reader, group=group, text=str(i))
+        with CaptureQueriesContext(connection) as queries:
+            self.reader.delete()
+        self.assertFalse([
+            query['sql'] for query in queries.captured_queries
+            if query['sql'].startswith('SELECT') and (
+                'FROM "auth_user"' in query['sql']
+                or 'FROM "posts_group"' in query['sql'])
+        ])
+
+    def test_reconcile_counters_command(self):
+        """reconcile_counters исправляет рассинхронизацию."""
+        Post.objects.bulk_create(
+            [Post(author=self.author, text=str(i)) for i in range(3)])
+        call_command('reconcile_counters', stdout=StringIO())
+        self.assertEqual(self.counters(self.author).posts, 3)
+        self.assertEqual(self.counters(self.reader).posts, 0)
+
+
+@override_settings(MEDIA_ROOT=IMPORT_MEDIA_ROOT)
+class ImportDumpTest(TestCase):
+
+    def setUp(self):
+        self.existing = Post.objects.create(
+            author=User.objects.create_user(username='old'), text='Старый')
+        self.dump = tempfile.mkdtemp(dir=settings.BASE_DIR)
+        self.addCleanup(shutil.rmtree, self.dump, ignore_errors=True)
+        self.write('users.csv', 'username,first_name\nauth,Лев\nreader,\n')
+        self.write('groups.jsonl', json.dumps(
+            {'slug': 'group', 'title': 'Группа'}) + '\n')
+        self.write('posts.jsonl', '\n'.join(json.dumps(row) for row in (
+            {'id': 1, 'author': 'auth', 'group': 'group', 'text': 'Первый',
+             'pub_date': '2020-01-01T00:00:00+00:00',
+             'image': 'posts/small.gif'},
+            {'id': 2, 'author': 'auth', 'group': None, 'text': 'Второй'},
+            {'id': 3, 'author': 'nobody', 'text': 'Без автора'},
+        )))
+        self.write('comments.jsonl', json.dumps(
+            {'id': 1, 'post': 1, 'author': 'reader', 'text': 'Ого'}))
+        self.write('follows.csv', 'user,author\nreader,auth\n')
+        os.mkdir(os.path.join(self.dump, 'posts'))
+        self.write('posts/small.gif', SMALL_GIF, 'wb')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(IMPORT_MEDIA_ROOT, ignore_errors=True)
+
+    def write(self, name, content, mode='w'):
+        encoding = None if 'b' in mode else 'utf-8'
+        with open(os.path.join(self.dump, name), mode,
+                  encoding=encoding) as file:
+            file.write(content)
+
+    def import_dump(self):
+        out = StringIO()
+        call_command('import_dump', self.dump, workers=0, batch_size=2,
+                     stdout=out)
+        return out.getvalue()
+
+    def test_import_dump(self):
+        """Дамп загружается целиком, ленты и счетчики пересчитываются."""
+        out = self.import_dump()
+        self.assertIn('posts: 2 строк', out)
+        first = Post.objects.get(text='Первый')
+        self.assertEqual(first.id, self.existing.id + 1)
+        self.assertEqual(first.group.slug, 'group')
+        self.assertEqual(first.pub_date.year, 2020)
+        self.assertEqual(first.image_size, len(SMALL_GIF))
+        self.assertTrue(first.image.storage.exists(first.image.name))
+        self.assertEqual(first.comments.get().author.username, 'reader')
+        author = User.objects.get(username='auth')
+        self.assertFalse(author.has_usable_password())
+        self.assertEqual(author.counters.posts, 2)
+        reader = User.objects.get(username='reader')
+        self.assertEqual(FeedEntry.objects.filter(user=reader).count(), 2)
+        self.assertFalse(os.path.exists(
+            os.path.join(self.dump, '.import-checkpoint.json')))
+
+    def test_resume_from_checkpoint(self):
+        """Повтор с контрольной точки не создает дублей."""
+        self.import_dump()
+        checkpoint = {
+            'done': {'users': 2, 'groups': 1, 'posts': 0, 'comments': 0,
+                     'follows': 0},
+            'post_offset': self.existing.id,
+            'comment_offset': 0,
+        }
+        self.write('.import-checkpoint.json', json.dumps(checkpoint))
+        out = self.import_dump()
+        self.assertIn('Продолжаем загрузку', out)
+        self.assertEqual(Post.objects.filter(text='Второй').count(), 1)
+        self.assertEqual(Comment.objects.count(), 1)
+        self.assertEqual(Follow.objects.count(), 1)
+
+    def test_resume_reuses_copied_images(self):
+        """Повтор пачки с картинкой не оставляет ее лишних копий."""
+        self.import_dump()
+        self.write('.import-checkpoint.json', json.dumps({
+            'done': {'users': 2, 'groups': 1, 'posts': 0, 'comments': 0,
+                     'follows': 0},
+            'post_offset': self.existing.id,
+            'comment_offset': 0,
+        }))
+        self.import_dump()
+        self.assertEqual(
+            len(os.listdir(os.path.join(IMPORT_MEDIA_ROOT, 'posts'))), 1)
+
+    def test_import_keeps_auto_now_add(self):
+        """Загрузка не отключает auto_now_add у полей моделей."""
+        flags = []
+        insert_rows = importer.insert_rows
+
+        def check(model, objects):
+            flags.append(Post._meta.get_field('pub_date').auto_now_add)
+            flags.append(Comment._meta.get_field('created').auto_now_add)
+            insert_rows(model, objects)
+
+        with mock.patch('posts.importer.insert_rows', check):
+            self.import_dump()
+        self.assertTrue(flags)
+        self.assertTrue(all(flags))
+
+
+@override_settings(MEDIA_ROOT=IMPORT_MEDIA_ROOT)
+class GenerateDatasetTest(TestCase):
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(IMPORT_MEDIA_ROOT, ignore_errors=True)
+
+    def generate(self, **options):
+        options = {'users': 30, 'groups': 3, 'posts': 200, 'comments': 300,
+                   'follows': 5, 'images': 1, 'image_share': 0.5,
+                   'seed': 7, **options}
+        # Внутри транзакции теста SQLite не дает менять схему.
+        call_command('generate_dataset', keep_indexes=True, stdout=StringIO(),
+                     **options)
+
+    def snapshot(self):
+        posts = Post.objects.order_by('id').values_list('text', 'pub_date')
+        comments = Comment.objects.order_by('id').values_list(
+            'text', 'created')
+        return list(posts), list(comments)
+
+    def test_generate_dataset(self):
+        """Данные согласованы: комментарии позже постов, счетчики и ленты
+        пересчитаны, картинки лежат в MEDIA_ROOT."""
+        self.generate()
+        self.assertEqual(User.objects.count(), 30)
+        self.assertEqual(Post.objects.count(), 200)
+        self.assertEqual(Comment.objects.count(), 300)
+        for post_date, created in Comment.objects.values_list(
+                'post__pub_date', 'created'):
+            self.assertLessEqual(post_date, created)
+        follows = Follow.objects.count()
+        self.assertGreater(follows, 0)
+        self.assertEqual(
+            sum(UserCounters.objects.values_list('followers', flat=True)),
+            follows)
+        self.assertTrue(FeedEntry.objects.exists())
+        post = Post.objects.exclude(image='').first()
+        self.assertTrue(post.image.storage.exists(post.image.name))
+        self.assertEqual(post.image.size, post.image_size)
+
+    def test_same_seed_same_data(self):
+        """Один и тот же seed дает те же посты и комментарии с теми же
+        датами."""
+        self.generate(images=0)
+        first = self.snapshot()
+        User.objects.all().delete()
+        Group.objects.all().delete()
+        self.generate(images=0)
+        self.assertEqual(self.snapshot(), first)
+
+    def test_now_sets_end_of_period(self):
+        """Даты отсчитываются от --now, а не от текущего времени."""
+        self.generate(images=0, now=datetime(2020, 6, 1))
+        latest = Post.objects.latest('pub_date').pub_date
+        self.assertEqual((latest.year, latest.month), (2020, 5))
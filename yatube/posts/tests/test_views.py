@@ -1,9 +1,31 @@
+import csv
+import hashlib
+import json
+import shutil
+import tempfile
+import zipfile
+from functools import partial
+from io import BytesIO, StringIO
+
 from django import forms
+from django.conf import settings
 from django.core.cache import cache
-from django.test import Client, TestCase
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import (Client, RequestFactory, TestCase,
+                         TransactionTestCase, override_settings)
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.views.generic import TemplateView
 
-from posts.models import Comment, Follow, Group, Post, User
+from core.query_budget import assert_constant_queries, query_budget
+from posts import feed, thumbnails, urls
+from posts.models import Comment, FeedEntry, Follow, Group, Post, User
+from posts.query_budgets import QUERY_BUDGETS
+from posts.templatetags.post_cards import post_cards
+from posts.views import COMMENTS_LIM, ConditionalGetMixin
 
 POST_CREATE_LIM = 13
 POST_LIM_1 = 10
@@ -116,21 +138,41 @@ class PostPagesTests(TestCase):
         self.assertNotIn(self.post, group_2, 'Пост попал в другую группу')
 
     def test_view_cache_index(self):
-        """Проверка работы кеша для view-функции index."""
+        """Главная кешируется, новый пост сбрасывает кеш."""
 
+        cache.clear()
         response = self.authorized_client.get(reverse('posts:index'))
         posts = response.content
+        # update() не шлет сигналов: кеш не сбрасывается.
+        Post.objects.filter(pk=self.post.pk).update(text='Измененный текст')
+        response_1 = self.authorized_client.get(reverse('posts:index'))
+        posts_1 = response_1.content
+        self.assertEqual(posts_1, posts)
         Post.objects.create(
             text='Текст поста',
             author=self.user,
         )
-        response_1 = self.authorized_client.get(reverse('posts:index'))
-        posts_1 = response_1.content
-        self.assertEqual(posts_1, posts)
-        cache.clear()
         response_2 = self.authorized_client.get(reverse('posts:index'))
         posts_2 = response_2.content
         self.assertNotEqual(posts_1, posts_2)
+        self.assertContains(response_2, 'Текст поста')
+
+    def test_view_cache_invalidates_only_affected_pages(self):
+        """Пост в группе сбрасывает кеш этой группы, но не соседней."""
+
+        cache.clear()
+        urls = {
+            group: reverse('posts:group_posts', kwargs={'slug': group.slug})
+            for group in (self.group, self.group_2)
+        }
+        before = {group: self.authorized_client.get(url).content
+                  for group, url in urls.items()}
+        Post.objects.create(text='Пост в группе', author=self.user,
+                            group=self.group)
+        after = {group: self.authorized_client.get(url).content
+                 for group, url in urls.items()}
+        self.assertNotEqual(before[self.group], after[self.group])
+        self.assertEqual(before[self.group_2], after[self.group_2])
 
 
 class PaginatorViewsTest(TestCase):
@@ -188,6 +230,26 @@ class PaginatorViewsTest(TestCase):
                     self.assertEqual(len(context_page_obj_2),
                                      POST_LIM_2, error_2)
 
+    @override_settings(POSTS_CURSOR_PAGINATION=True)
+    def test_cursor_pagination(self):
+        """Курсоры ведут по ленте без пропусков, ?page= продолжает работать."""
+        url = reverse('posts:group_posts', kwargs={'slug': self.group.slug})
+        cache.clear()
+        page_1 = self.guest_client.get(url).context['page_obj']
+        self.assertEqual(len(page_1), POST_LIM_1)
+        self.assertFalse(page_1.has_previous())
+        page_2 = self.guest_client.get(
+            url, {'cursor': page_1.next_cursor}).context['page_obj']
+        self.assertEqual(len(page_2), POST_LIM_2)
+        self.assertFalse(page_2.has_next())
+        seen = {post.id for post in page_1} | {post.id for post in page_2}
+        self.assertEqual(len(seen), POST_CREATE_LIM)
+        back = self.guest_client.get(
+            url, {'cursor': page_2.previous_cursor}).context['page_obj']
+        self.assertEqual(list(back), list(page_1))
+        legacy = self.guest_client.get(url, {'page': 2}).context['page_obj']
+        self.assertEqual(len(legacy), POST_LIM_2)
+
 
 class CommentViewsTest(TestCase):
 
@@ -223,6 +285,32 @@ class CommentViewsTest(TestCase):
         comment = response_post_detail.context['comments']
         self.assertIn(self.comment, comment, 'Пост не попал в нужный пост')
 
+    def test_comments_paginated(self):
+        """На странице поста не больше COMMENTS_LIM комментариев,
+        остальные отдает фрагмент «Показать еще» в HTML и JSON."""
+        Comment.objects.bulk_create(
+            Comment(author=self.user_1, post=self.post_2, text=f'Текст {i}')
+            for i in range(COMMENTS_LIM + 3)
+        )
+        response = self.authorized_client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post_2.id}))
+        first = response.context['comments']
+        self.assertEqual(len(first), COMMENTS_LIM)
+        self.assertContains(response, 'data-comments-more')
+        url = reverse('posts:post_comments',
+                      kwargs={'post_id': self.post_2.id})
+        params = {'cursor': first.next_cursor}
+        rest = self.client.get(url, params)
+        self.assertEqual(len(rest.context['comments']), 3)
+        self.assertNotContains(rest, 'data-comments-more')
+        data = self.client.get(url, {**params, 'format': 'json'}).json()
+        self.assertEqual(len(data['comments']), 3)
+        self.assertIsNone(data['next_cursor'])
+        shown = [comment.id for comment in first] + [
+            comment['id'] for comment in data['comments']]
+        self.assertEqual(shown, list(self.post_2.comments.order_by(
+            '-created', '-id').values_list('id', flat=True)))
+
 
 class FollowViewsTest(TestCase):
 
@@ -287,3 +375,485 @@ class FollowViewsTest(TestCase):
         follow_result = Follow.objects.filter(author=1,
                                               user=1).exists()
         self.assertEqual(result_1, follow_result)
+
+
+class FeedViewsTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.old_post = Post.objects.create(
+            author=cls.author,
+            text='Пост до подписки',
+        )
+
+    def setUp(self):
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def feed_page(self):
+        return self.reader_client.get(
+            reverse('posts:follow_index')).context['page_obj']
+
+    def test_follow_backfills_and_unfollow_prunes_feed(self):
+        """Подписка заполняет ленту старыми постами, отписка очищает."""
+        self.reader_client.get(reverse('posts:profile_follow',
+                               kwargs={'username': self.author.username}))
+        self.assertIn(self.old_post, self.feed_page())
+        self.reader_client.get(reverse('posts:profile_unfollow',
+                               kwargs={'username': self.author.username}))
+        self.assertFalse(FeedEntry.objects.filter(user=self.reader).exists())
+        self.assertNotIn(self.old_post, self.feed_page())
+
+    def test_follow_refreshes_follower_profile(self):
+        """Число подписок в профиле подписчика меняется сразу."""
+        url = reverse('posts:profile',
+                      kwargs={'username': self.reader.username})
+        self.assertContains(self.reader_client.get(url), 'подписок: 0')
+        self.reader_client.get(reverse('posts:profile_follow',
+                               kwargs={'username': self.author.username}))
+        self.assertContains(self.reader_client.get(url), 'подписок: 1')
+        self.reader_client.get(reverse('posts:profile_unfollow',
+                               kwargs={'username': self.author.username}))
+        self.assertContains(self.reader_client.get(url), 'подписок: 0')
+
+    def test_new_post_fans_out_to_followers(self):
+        """Новый пост сразу попадает в ленту подписчика первым."""
+        Follow.objects.create(author=self.author, user=self.reader)
+        new_post = Post.objects.create(author=self.author, text='Новый пост')
+        self.assertEqual(self.feed_page()[0], new_post)
+
+    def test_feed_pages_with_equal_dates(self):
+        """Посты с одной датой не повторяются и не теряются на страницах."""
+        Follow.objects.create(author=self.author, user=self.reader)
+        Post.objects.bulk_create(
+            Post(author=self.author, text=f'Пост {number}')
+            for number in range(POST_LIM_1 + POST_LIM_2))
+        feed.rebuild([self.reader])
+        FeedEntry.objects.update(pub_date=self.old_post.pub_date)
+        url = reverse('posts:follow_index')
+        seen = []
+        for page in (1, 2):
+            response = self.reader_client.get(url, {'page': page})
+            seen += [post.id for post in response.context['page_obj']]
+        self.assertEqual(seen, list(Post.objects.order_by(
+            '-id').values_list('id', flat=True)))
+
+    def test_rebuild_feed_command(self):
+        """Команда rebuild_feed восстанавливает ленту из подписок."""
+        Follow.objects.create(author=self.author, user=self.reader)
+        FeedEntry.objects.all().delete()
+        call_command('rebuild_feed', stdout=StringIO())
+        self.assertIn(self.old_post, self.feed_page())
+
+
+class QueryCountTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(title='Группа', slug='group')
+        cls.post = Post.objects.create(author=cls.author, group=cls.group,
+                                       text='Пост')
+        Comment.objects.create(author=cls.reader, post=cls.post,
+                               text='Комментарий')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        self.client.force_login(self.reader)
+        cache.clear()
+
+    def add_posts_and_comments(self):
+        """Новые посты и комментарии от разных авторов и в разных группах."""
+        for i in range(POST_LIM_1):
+            author = User.objects.create_user(username=f'author_{i}')
+            group = Group.objects.create(title=f'Группа {i}',
+                                         slug=f'group_{i}')
+            Post.objects.create(author=author, group=self.group,
+                                text=f'Пост {i}')
+            Post.objects.create(author=self.author, group=group,
+                                text=f'Пост в группе {i}')
+            Comment.objects.create(author=author, post=self.post,
+                                   text=f'Комментарий {i}')
+            Follow.objects.create(user=self.reader, author=author)
+
+    def url(self, name):
+        """URL из posts/urls.py с аргументами из данных теста."""
+        pattern = next(pattern for pattern in urls.urlpatterns
+                       if pattern.name == name)
+        kwargs = {'username': self.author.username, 'slug': self.group.slug,
+                  'post_id': self.post.id}
+        return reverse(f'posts:{name}', kwargs={
+            key: value for key, value in kwargs.items()
+            if key in pattern.pattern.converters})
+
+    def request(self, name):
+        cache.clear()
+        url = self.url(name)
+        if name == 'add_comment':
+            response = self.client.post(url, {'text': 'Комментарий'})
+        elif name == 'search':
+            response = self.client.get(url, {'q': 'Пост'})
+        else:
+            response = self.client.get(url)
+        if response.streaming:
+            b''.join(response.streaming_content)
+        self.assertLess(response.status_code, 400, url)
+        return response
+
+    def test_every_url_has_query_budget(self):
+        """У каждого URL из posts/urls.py есть бюджет запросов."""
+        names = {pattern.name for pattern in urls.urlpatterns}
+        self.assertEqual(names - set(QUERY_BUDGETS), set())
+
+    def test_query_budgets(self):
+        """URL укладываются в бюджеты запросов при пустом кеше."""
+        for name, budget in QUERY_BUDGETS.items():
+            with self.subTest(name=name):
+                # Править пост может только автор.
+                self.client.force_login(
+                    self.author if name == 'post_edit' else self.reader)
+                with query_budget(budget, label=name):
+                    self.request(name)
+
+    def test_query_count_does_not_grow_with_page_size(self):
+        """Число запросов на страницу не зависит от числа постов на ней."""
+        names = ('index', 'group_posts', 'profile', 'follow_index',
+                 'post_detail', 'post_comments', 'search')
+        assert_constant_queries(
+            {name: partial(self.request, name) for name in names},
+            self.add_posts_and_comments)
+
+
+class PostCardCacheTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth',
+                                            first_name='Лев')
+        cls.group = Group.objects.create(title='Группа', slug='group')
+        cls.post = Post.objects.create(author=cls.user, group=cls.group,
+                                       text='Старый текст')
+
+    def setUp(self):
+        cache.clear()
+
+    def card(self):
+        post = Post.objects.for_cards().get(pk=self.post.pk)
+        return post_cards([post])[0]
+
+    def test_card_served_from_cache(self):
+        """Повторная отрисовка берет карточку из кеша."""
+        first = self.card()
+        Post.objects.filter(pk=self.post.pk).update(text='Без сигнала')
+        self.assertEqual(self.card(), first)
+
+    def test_card_invalidated_on_changes(self):
+        """Правка поста, имени автора или группы обновляет карточку."""
+        self.card()
+        post = Post.objects.get(pk=self.post.pk)
+        post.text = 'Новый текст'
+        post.save()
+        self.assertIn('Новый текст', self.card())
+        self.user.first_name = 'Федор'
+        self.user.save()
+        self.assertIn('Федор', self.card())
+        self.group.slug = 'renamed'
+        self.group.save()
+        self.assertIn('/group/renamed/', self.card())
+
+
+class ConditionalGetTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(title='Группа', slug='group')
+        cls.post = Post.objects.create(author=cls.author, group=cls.group,
+                                       text='Пост')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        self.client.force_login(self.reader)
+        cache.clear()
+
+    def urls(self):
+        return (
+            reverse('posts:index'),
+            reverse('posts:group_posts', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile',
+                    kwargs={'username': self.author.username}),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.id}),
+            reverse('posts:follow_index'),
+        )
+
+    def test_not_modified_without_rendering(self):
+        """Повторный запрос с ETag получает 304 без чтения постов."""
+        for url in self.urls():
+            with self.subTest(url=url):
+                etag = self.client.get(url)['ETag']
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 304)
+                self.assertFalse(response.content)
+                self.assertFalse([
+                    query for query in queries.captured_queries
+                    if 'posts_post"."text' in query['sql']
+                    or 'posts_comment' in query['sql']
+                ])
+
+    def test_etag_changes_with_content(self):
+        """Новый пост или комментарий меняет ETag страниц с ним."""
+        etags = {url: self.client.get(url)['ETag'] for url in self.urls()}
+        Post.objects.create(author=self.author, group=self.group,
+                            text='Новый пост')
+        Comment.objects.create(author=self.reader, post=self.post,
+                               text='Комментарий')
+        for url, etag in etags.items():
+            with self.subTest(url=url):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+                self.assertNotEqual(response['ETag'], etag)
+
+    def test_new_login_refreshes_form_page(self):
+        """После нового входа страница с формой приходит с новым токеном
+        CSRF, а не 304."""
+        User.objects.create_user(username='visitor', password='password')
+        credentials = {'username': 'visitor', 'password': 'password'}
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.id})
+        self.client.post(reverse('users:login'), credentials)
+        etag = self.client.get(url)['ETag']
+        self.client.post(reverse('users:logout'))
+        self.client.post(reverse('users:login'), credentials)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_view_without_scopes_is_misconfigured(self):
+        """Представление без областей кеша не отвечает молча."""
+        view = type('NoScopes', (ConditionalGetMixin, TemplateView), {
+            'template_name': 'posts/index.html'}).as_view()
+        with self.assertRaises(ImproperlyConfigured):
+            view(RequestFactory().get('/'))
+
+    def test_author_rename_refreshes_pages(self):
+        """Смена имени автора сбрасывает закешированные страницы."""
+        url = reverse('posts:index')
+        self.client.get(url)
+        self.author.first_name = 'Федор'
+        self.author.save()
+        self.assertContains(self.client.get(url), 'Федор')
+
+
+THUMBNAIL_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+@override_settings(MEDIA_ROOT=THUMBNAIL_MEDIA_ROOT)
+class ThumbnailTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.post = Post.objects.create(
+            author=cls.user,
+            text='Пост с картинкой',
+            image=SimpleUploadedFile('small.gif', SMALL_GIF, 'image/gif'),
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(THUMBNAIL_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+
+    def card(self):
+        post = Post.objects.for_cards().get(pk=self.post.pk)
+        return post_cards([post])[0]
+
+    def test_image_metadata_saved(self):
+        """Размеры, вес и хеш картинки сохраняются при загрузке."""
+        post = Post.objects.get(pk=self.post.pk)
+        self.assertEqual((post.image_width, post.image_height), (2, 1))
+        self.assertEqual(post.image_size, len(SMALL_GIF))
+        self.assertEqual(post.image_hash,
+                         hashlib.sha256(SMALL_GIF).hexdigest())
+        post.image = 'posts/missing.gif'
+        post.save()
+        self.assertIsNone(post.image_width)
+        self.assertEqual(post.image_hash, '')
+        self.assertFalse(thumbnails.generate(post.pk))
+
+    def test_placeholder_until_thumbnail_ready(self):
+        """Пока миниатюры нет, карточка выводит заглушку, после создания
+        миниатюры закешированная карточка обновляется."""
+        self.assertIn('Изображение обрабатывается', self.card())
+        self.assertTrue(thumbnails.generate(self.post.pk))
+        card = self.card()
+        self.assertNotIn('Изображение обрабатывается', card)
+        self.assertIn(thumbnails.ready(self.post.image).url, card)
+
+    def test_pregenerate_command(self):
+        """Команда создает недостающие миниатюры и пропускает готовые."""
+        out = StringIO()
+        call_command('pregenerate_thumbnails', workers=0, stdout=out)
+        self.assertIn('Создано миниатюр: 1 из 1', out.getvalue())
+        self.assertIsNotNone(thumbnails.ready(self.post.image))
+        call_command('pregenerate_thumbnails', workers=0, stdout=out)
+        self.assertIn('Создано миниатюр: 0 из 0', out.getvalue())
+
+
+EXPORT_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(MEDIA_ROOT=EXPORT_MEDIA_ROOT)
+class ExportTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.group = Group.objects.create(title='Группа', slug='group')
+        cls.post = Post.objects.create(
+            author=cls.user, group=cls.group, text='Пост с картинкой',
+            image=SimpleUploadedFile('small.gif', SMALL_GIF, 'image/gif'),
+        )
+        Post.objects.create(author=cls.user, text='Пост без группы')
+        Comment.objects.create(author=cls.user, post=cls.post,
+                               text='Комментарий, с запятой')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(EXPORT_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def export(self, url_name, arg, **params):
+        response = self.client.get(reverse(url_name, args=[arg]), params)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content)
+
+    def test_export_jsonl_and_csv(self):
+        """Выгрузка автора в JSONL и комментариев группы в CSV."""
+        lines = self.export('posts:profile_export', 'auth').splitlines()
+        posts = [json.loads(line) for line in lines]
+        self.assertEqual([post['text'] for post in posts],
+                         ['Пост с картинкой', 'Пост без группы'])
+        self.assertEqual(posts[0]['image_hash'],
+                         hashlib.sha256(SMALL_GIF).hexdigest())
+        content = self.export('posts:group_export', 'group',
+                              format='csv', kind='comments')
+        rows = list(csv.reader(StringIO(content.decode())))
+        self.assertEqual(rows[0], ['id', 'post', 'created', 'author',
+                                   'text'])
+        self.assertEqual(rows[1][-1], 'Комментарий, с запятой')
+
+    def test_export_zip_with_images(self):
+        """Zip содержит записи и картинки постов."""
+        content = self.export('posts:group_export', 'group', images=1)
+        with zipfile.ZipFile(BytesIO(content)) as archive:
+            self.assertEqual(archive.namelist(),
+                             ['posts.jsonl', self.post.image.name])
+            self.assertEqual(archive.read(self.post.image.name), SMALL_GIF)
+
+    def test_export_command(self):
+        out = StringIO()
+        call_command('export_posts', author='auth', kind='comments',
+                     stdout=out)
+        self.assertEqual(json.loads(out.getvalue())['text'],
+                         'Комментарий, с запятой')
+
+    def test_export_requires_login(self):
+        self.client.logout()
+        response = self.client.get(
+            reverse('posts:profile_export', args=['auth']))
+        self.assertEqual(response.status_code, 302)
+
+
+class SearchViewsTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.post = Post.objects.create(
+            author=cls.user, text='Рецепт <b>борща</b> со сметаной')
+        cls.other = Post.objects.create(
+            author=cls.user, text='Заметки о погоде')
+
+    def search(self, text):
+        return self.client.get(reverse('posts:search'), {'q': text})
+
+    def test_search_finds_and_highlights(self):
+        """Поиск находит пост по префиксу слова и подсвечивает его."""
+        response = self.search('борщ')
+        page = response.context['page_obj']
+        self.assertEqual(list(page), [self.post])
+        self.assertContains(response, '<mark>борща</mark>')
+        self.assertNotContains(response, '<b>')
+
+    def test_search_index_follows_edits_and_deletes(self):
+        """Правка и удаление поста сразу видны в поиске."""
+        self.other.text = 'Заметки о борще'
+        self.other.save()
+        self.assertIn(self.other, self.search('борщ').context['page_obj'])
+        self.other.delete()
+        self.assertNotIn(self.other,
+                         self.search('борщ').context['page_obj'])
+
+    def test_admin_search_uses_full_text_index(self):
+        """Поиск в админке идет по полнотекстовому индексу."""
+        admin = User.objects.create_superuser('admin', 'a@a.ru', 'pass')
+        self.client.force_login(admin)
+        response = self.client.get('/admin/posts/post/', {'q': 'сметан'})
+        self.assertEqual(list(response.context['cl'].result_list),
+                         [self.post])
+
+    def test_admin_search_without_words(self):
+        """Поиск в админке по одним знакам препинания ничего не находит."""
+        admin = User.objects.create_superuser('admin', 'a@a.ru', 'pass')
+        self.client.force_login(admin)
+        for term in ('!!', '-'):
+            with self.subTest(term=term):
+                response = self.client.get('/admin/posts/post/',
+                                           {'q': term})
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(list(response.context['cl'].result_list),
+                                 [])
+
+    def test_rebuild_search_index_command(self):
+        """rebuild_search_index индексирует посты без сигналов."""
+        Post.objects.bulk_create([Post(author=self.user, text='Окрошка')])
+        self.assertEqual(len(self.search('окрошка').context['page_obj']), 0)
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertEqual(len(self.search('окрошка').context['page_obj']), 1)
+
+
+class BenchCommandsTest(TransactionTestCase):
+    # Замеры создают свою временную БД, что невозможно внутри
+    # транзакции TestCase.
+
+    def test_bench_search_command(self):
+        """bench_search проходит на маленьком наборе постов."""
+        out = StringIO()
+        call_command('bench_search', posts=50, repeat=1, stdout=out)
+        self.assertIn('FTS5', out.getvalue())
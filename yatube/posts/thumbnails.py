@@ -0,0 +1,107 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connection, transaction
+from sorl.thumbnail import default, get_thumbnail
+from sorl.thumbnail.conf import defaults as sorl_defaults
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.images import ImageFile
+
+from . import page_cache
+from .models import Post
+from .signals import bump_post_pages
+
+# Единственный размер, который выводят шаблоны карточки и поста.
+GEOMETRY = '960x339'
+OPTIONS = {'crop': 'center', 'upscale': True}
+
+logger = logging.getLogger(__name__)
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.POSTS_THUMBNAIL_WORKERS,
+                thread_name_prefix='thumbnails',
+            )
+    return _executor
+
+
+def _thumbnail_file(source):
+    """Файл миниатюры, как его называет ThumbnailBackend.get_thumbnail."""
+    backend = default.backend
+    options = dict(OPTIONS)
+    if sorl_settings.THUMBNAIL_PRESERVE_FORMAT:
+        options.setdefault('format', backend._get_format(source))
+    for key, value in backend.default_options.items():
+        options.setdefault(key, value)
+    for key, attr in backend.extra_options:
+        value = getattr(sorl_settings, attr)
+        if value != getattr(sorl_defaults, attr):
+            options.setdefault(key, value)
+    name = backend._get_thumbnail_filename(source, GEOMETRY, options)
+    return ImageFile(name, default.storage)
+
+
+def ready(image):
+    """Готовая миниатюра из хранилища sorl или None.
+
+    Исходную картинку не читает и миниатюру не создает.
+    """
+    if not image:
+        return None
+    return default.kvstore.get(_thumbnail_file(ImageFile(image)))
+
+
+def generate(post_id):
+    """Создает миниатюру поста и сбрасывает кеш страниц с ним.
+
+    Возвращает True, если миниатюра готова.
+    """
+    post = Post.objects.for_cards().filter(pk=post_id).first()
+    # Без хеша файл не прочитался при загрузке, sorl его тоже не откроет.
+    if post is None or not post.image or not post.image_hash:
+        return False
+    source = ImageFile(post.image)
+    # Размер исходника известен из модели. Если файл миниатюры уже лежит
+    # в хранилище, sorl не создает его заново, но открыл бы исходник,
+    # чтобы записать его размер в kvstore.
+    source.set_size((post.image_width, post.image_height))
+    default.kvstore.get_or_set(source)
+    get_thumbnail(post.image, GEOMETRY, **OPTIONS)
+    if ready(post.image) is None:
+        # sorl пишет в лог, если исходный файл не читается.
+        return False
+    page_cache.bump(page_cache.post_card_scope(post.pk))
+    bump_post_pages(post, post.group and post.group.slug)
+    return True
+
+
+def generate_in_worker(post_id):
+    try:
+        return generate(post_id)
+    except Exception:
+        logger.exception('Не удалось создать миниатюру поста %s', post_id)
+        return False
+    finally:
+        # У потока пула свое соединение с БД, оно не закроется само.
+        connection.close()
+
+
+def schedule(post):
+    """Создает миниатюру после коммита: в пуле потоков или сразу,
+    если POSTS_THUMBNAIL_WORKERS = 0."""
+    if not post.image:
+        return
+    post_id = post.pk
+    if settings.POSTS_THUMBNAIL_WORKERS:
+        transaction.on_commit(
+            lambda: executor().submit(generate_in_worker, post_id))
+    else:
+        transaction.on_commit(lambda: generate(post_id))
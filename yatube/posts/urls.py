@@ -5,6 +5,9 @@ from . import views
 app_name = 'posts'
 
 urlpatterns = [
+    path('search/',
+         views.search_posts,
+         name='search'),
     path('follow/',
          views.follow_index,
          name='follow_index'),
@@ -19,15 +22,24 @@ urlpatterns = [
     path('posts/<int:post_id>/comment/',
          views.add_comment,
          name='add_comment'),
+    path('posts/<int:post_id>/comments/',
+         views.post_comments,
+         name='post_comments'),
     path('posts/<int:post_id>/edit/',
          views.post_edit,
          name='post_edit'),
     path('create/',
          views.Post_create.as_view(),
          name='post_create'),
+    path('group/<slug:slug>/export/',
+         views.export_posts,
+         name='group_export'),
     path('group/<slug:slug>/',
          views.Group_posts.as_view(),
          name='group_posts'),
+    path('profile/<str:username>/export/',
+         views.export_posts,
+         name='profile_export'),
     path('profile/<str:username>/',
          views.Profile.as_view(),
          name='profile'),
@@ -0,0 +1,17 @@
+from contextlib import contextmanager
+
+
+@contextmanager
+def explicit_auto_now(model, *field_names):
+    """Отключает auto_now_add у полей, чтобы сохранить заданные даты.
+
+    Нужно для массовой загрузки данных с историческими датами.
+    """
+    fields = [model._meta.get_field(name) for name in field_names]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
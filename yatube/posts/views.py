@@ -1,37 +1,126 @@
+from django.conf import settings
 from django.contrib.auth import get_user
 from django.contrib.auth.decorators import login_required
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
 from django.core.paginator import Paginator
+from django.db import transaction
+from django.http import (Http404, HttpResponseBadRequest, JsonResponse,
+                         StreamingHttpResponse)
 from django.views.generic import  CreateView, DetailView, ListView
 from django.shortcuts import get_object_or_404, redirect, render
 from django.urls import reverse, reverse_lazy
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
+from django.views.decorators.http import condition
 # from django.views.decorators.cache import cache_page
 
+from . import counters, export, feed, page_cache, search, thumbnails
 from .forms import CommentForm, PostForm
 from .models import Comment, Follow, Group, Post, User
+from .paginators import CursorPaginator
 
 CHAR_LIM = 30
 POSTS_LIM = 10
-CACHE_TIMEOUT = 20
+# Больше комментариев за раз не выводится: остальные подгружаются.
+COMMENTS_LIM = 20
+CACHE_TIMEOUT = 60 * 60 * 24
 
 
-def pagination(posts, request):
+def use_cursor(request):
+    if 'page' in request.GET:
+        return False
+    return 'cursor' in request.GET or settings.POSTS_CURSOR_PAGINATION
+
+
+def pagination(posts, request, cursor_keys=('pub_date', 'id')):
+    if use_cursor(request):
+        paginator = CursorPaginator(posts, POSTS_LIM, cursor_keys)
+        return paginator.get_page(request.GET.get('cursor'))
     paginator = Paginator(posts, POSTS_LIM)
     page_number = request.GET.get('page')
     page_obj = paginator.get_page(page_number)
     return page_obj
 
 
-class Index(ListView):
+def comments_page(post_id, cursor=None):
+    comments = Comment.objects.filter(post=post_id).select_related('author')
+    paginator = CursorPaginator(comments, COMMENTS_LIM, ('created', 'id'))
+    return paginator.get_page(cursor)
+
+
+class CursorPaginationMixin:
+    def paginate_queryset(self, queryset, page_size):
+        if not use_cursor(self.request):
+            return super().paginate_queryset(queryset, page_size)
+        page = pagination(queryset, self.request)
+        return (page.paginator, page, page.object_list,
+                page.has_other_pages())
+
+
+class ConditionalGetMixin:
+    """ETag из версий областей страницы в page_cache.
+
+    Ответ 304 не трогает посты и шаблоны: нужны только версии из кеша.
+    Области задает cache_scopes или, если они зависят от запроса,
+    get_cache_scopes(). csrf_form - на странице форма с токеном CSRF,
+    см. page_digest.
+    """
+
+    cache_scopes = None
+    csrf_form = False
+
+    def get_cache_scopes(self):
+        if self.cache_scopes is None:
+            raise ImproperlyConfigured(
+                f'{type(self).__name__} requires either a definition of '
+                f'cache_scopes or an implementation of get_cache_scopes()')
+        return self.cache_scopes
+
+    def get(self, request, *args, **kwargs):
+        digest = page_cache.page_digest(request, self.get_cache_scopes(),
+                                        self.csrf_form)
+        etag = quote_etag(digest)
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = self.get_page_response(digest, request,
+                                              *args, **kwargs)
+            response['ETag'] = etag
+        return response
+
+    def get_page_response(self, digest, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
+
+
+class CachedPageMixin(ConditionalGetMixin):
+    """Кеширует страницу до смены версий её областей в page_cache."""
+
+    def get_page_response(self, digest, request, *args, **kwargs):
+        key = page_cache.PAGE_KEY.format(digest)
+        response = cache.get(key)
+        if response is None:
+            response = super().get_page_response(digest, request,
+                                                 *args, **kwargs)
+            response.add_post_render_callback(
+                lambda rendered: cache.set(key, rendered, CACHE_TIMEOUT))
+        return response
+
+
+class Index(CachedPageMixin, CursorPaginationMixin, ListView):
     model = Post
     template_name: str = 'posts/index.html'
     context_object_name = 'posts'
     paginate_by = POSTS_LIM
+    cache_scopes = (page_cache.INDEX, page_cache.GROUPS)
 
     def get_context_data(self, *, object_list=None, **kwargs):
         context = super().get_context_data(**kwargs)
         context['title'] = 'Последние обновления на сайте'
         return context
 
+    def get_queryset(self):
+        return Post.objects.for_cards()
+
 # @cache_page(timeout=CACHE_TIMEOUT, key_prefix='index_page')
 # def index(request):
 #     posts = Post.objects.all()
@@ -46,7 +135,7 @@ class Index(ListView):
 #     return render(request, template, context)
 
 
-class Group_posts(ListView):
+class Group_posts(CachedPageMixin, CursorPaginationMixin, ListView):
     model = Post
     template_name = 'posts/group_list.html'
     context_object_name = 'posts'
@@ -54,12 +143,17 @@ class Group_posts(ListView):
 
     def get_context_data(self, *, object_list=None, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['group'] = get_object_or_404(Group, slug=self.kwargs['slug'])
+        context['group'] = self.group
         context['title'] = 'Записи сообщества ' + str(context['group'])
         return context
 
+    def get_cache_scopes(self):
+        # Группа нужна и для списка постов: загружается один раз.
+        self.group = get_object_or_404(Group, slug=self.kwargs['slug'])
+        return (page_cache.group_scope(self.group.pk), page_cache.GROUPS)
+
     def get_queryset(self):
-        return Post.objects.filter(group__slug=self.kwargs['slug'])
+        return Post.objects.for_cards().filter(group=self.group)
 
 # def group_posts(request, slug):
 #     group = get_object_or_404(Group, slug=slug)
@@ -76,7 +170,7 @@ class Group_posts(ListView):
 #     return render(request, template, context)
 
 
-class Profile(ListView):
+class Profile(CachedPageMixin, CursorPaginationMixin, ListView):
     model = Post
     template_name = 'posts/profile.html'
     context_object_name = 'post'
@@ -84,17 +178,24 @@ class Profile(ListView):
 
     def get_context_data(self, *, object_list=None, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['author'] = get_object_or_404(
-            User, username=self.kwargs['username'])
+        context['author'] = self.author
+        context['counters'] = counters.for_user(self.author)
         context['title'] = (
             'Профайл пользователя ' + str(context['author'].get_full_name()))
-        context['following'] = Follow.objects.filter(
-            user=self.request.user.id, author=context['author']).exists()
+        context['following'] = (
+            self.request.user.is_authenticated
+            and Follow.objects.filter(
+                user=self.request.user, author=self.author).exists())
         return context
 
+    def get_cache_scopes(self):
+        self.author = get_object_or_404(
+            User.objects.select_related('counters'),
+            username=self.kwargs['username'])
+        return (page_cache.author_scope(self.author.pk), page_cache.GROUPS)
+
     def get_queryset(self):
-        user = get_object_or_404(User, username=self.kwargs['username'])
-        return Post.objects.filter(author=user)
+        return Post.objects.for_cards().filter(author=self.author)
 
 # def profile(request, username):
 #     author = get_object_or_404(User, username=username)
@@ -113,9 +214,10 @@ class Profile(ListView):
 #     return render(request, template, context)
 
 
-class Post_detail(DetailView):
+class Post_detail(ConditionalGetMixin, DetailView):
     model = Post
     form_class = CommentForm
+    csrf_form = True
     template_name = 'posts/post_detail.html'
     context_object_name = 'post'
     pk_url_kwarg = 'post_id'
@@ -123,11 +225,27 @@ class Post_detail(DetailView):
     def get_context_data(self, *, object_list=None, **kwargs):
         context = super().get_context_data(**kwargs)
         context['form'] = CommentForm()
-        context['comments'] = Comment.objects.filter(
-            post=self.kwargs['post_id'])
+        context['comments'] = comments_page(self.kwargs['post_id'])
         context['title'] = ('Пост ' + str(context['post']))
+        context['counters'] = counters.for_user(context['post'].author)
         return context
 
+    def get_queryset(self):
+        return Post.objects.for_cards().select_related('author__counters')
+
+    def get_cache_scopes(self):
+        post_id = self.kwargs['post_id']
+        author_id = Post.objects.filter(pk=post_id).values_list(
+            'author_id', flat=True).first()
+        if author_id is None:
+            raise Http404
+        return (page_cache.post_card_scope(post_id),
+                page_cache.comments_scope(post_id),
+                page_cache.author_card_scope(author_id),
+                # Число постов автора.
+                page_cache.author_scope(author_id),
+                page_cache.GROUPS)
+
 # def post_detail(request, post_id):
 #     post = get_object_or_404(Post, pk=post_id)
 #     form = CommentForm(request.POST or None)
@@ -155,10 +273,12 @@ class Post_create(CreateView):
         context['is_edit'] = False
         return context
 
+    @transaction.atomic
     def form_valid(self, form):
         form = form.save(commit=False)
         form.author = get_user(self.request)
         form.save()
+        thumbnails.schedule(form)
         return redirect(reverse('posts:profile', args=[self.request.user]))
 
 # @login_required
@@ -183,7 +303,7 @@ class Post_create(CreateView):
 @login_required
 def post_edit(request, post_id):
     post = get_object_or_404(Post, pk=post_id)
-    if post.author != request.user:
+    if post.author_id != request.user.id:
         return redirect('posts:post_detail', post_id)
     form = PostForm(request.POST or None,
                     files=request.FILES or None,
@@ -191,7 +311,9 @@ def post_edit(request, post_id):
                     )
     if request.method == 'POST':
         if form.is_valid:
-            form.save()
+            post = form.save()
+            if 'image' in form.changed_data:
+                thumbnails.schedule(post)
             return redirect('posts:post_detail', post_id)
     context = {
         'form': form,
@@ -202,6 +324,7 @@ def post_edit(request, post_id):
 
 
 @login_required
+@transaction.atomic
 def add_comment(request, post_id):
     post = get_object_or_404(Post, pk=post_id)
     form = CommentForm(request.POST or None)
@@ -214,10 +337,97 @@ def add_comment(request, post_id):
     return redirect(template, post_id=post_id)
 
 
+def search_posts(request):
+    text = request.GET.get('q', '').strip()
+    if not text:
+        posts = Post.objects.none()
+    elif search.available():
+        posts = search.SearchResults(text)
+    else:
+        posts = Post.objects.for_cards().filter(text__icontains=text)
+    page_obj = Paginator(posts, POSTS_LIM).get_page(request.GET.get('page'))
+    context = {
+        'title': f'Поиск: {text}' if text else 'Поиск',
+        'query': text,
+        'page_obj': page_obj,
+    }
+    template = 'posts/search.html'
+    return render(request, template, context)
+
+
+def post_comments(request, post_id):
+    """Следующая порция комментариев для «Показать еще»: HTML-фрагмент
+    или JSON при ?format=json."""
+    post = get_object_or_404(Post.objects.only('id'), pk=post_id)
+    comments = comments_page(post_id, request.GET.get('cursor'))
+    if request.GET.get('format') == 'json':
+        return JsonResponse({
+            'comments': [
+                {
+                    'id': comment.id,
+                    'author': comment.author.username,
+                    'text': comment.text,
+                    'created': comment.created.isoformat(),
+                }
+                for comment in comments
+            ],
+            'next_cursor': comments.next_cursor,
+        })
+    context = {
+        'post': post,
+        'comments': comments,
+    }
+    template = 'posts/includes/comments.html'
+    return render(request, template, context)
+
+
+EXPORT_CONTENT_TYPES = {
+    'jsonl': 'application/x-ndjson; charset=utf-8',
+    'csv': 'text/csv; charset=utf-8',
+}
+
+
+@login_required
+def export_posts(request, username=None, slug=None):
+    """Потоковая выгрузка постов или комментариев автора или группы."""
+    fmt = request.GET.get('format', 'jsonl')
+    kind = request.GET.get('kind', 'posts')
+    if fmt not in export.FORMATS or kind not in export.KINDS:
+        return HttpResponseBadRequest()
+    author = group = None
+    if username is not None:
+        author = get_object_or_404(User, username=username)
+        name = username
+    else:
+        group = get_object_or_404(Group, slug=slug)
+        name = slug
+    images = bool(request.GET.get('images'))
+    chunks = export.export(fmt, kind, author, group, images)
+    if images:
+        filename = f'{name}-{kind}.zip'
+        response = StreamingHttpResponse(chunks,
+                                         content_type='application/zip')
+    else:
+        filename = f'{name}-{kind}.{fmt}'
+        response = StreamingHttpResponse(
+            chunks, content_type=EXPORT_CONTENT_TYPES[fmt])
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+def follow_etag(request):
+    return page_cache.page_digest(request, (
+        page_cache.INDEX,
+        page_cache.GROUPS,
+        page_cache.feed_scope(request.user.pk),
+    ))
+
+
 @login_required
+@condition(etag_func=follow_etag)
 def follow_index(request):
-    posts = Post.objects.filter(author__following__user=request.user)
-    page_obj = pagination(posts, request)
+    posts = feed.feed_posts(request.user)
+    page_obj = pagination(posts, request, feed.CURSOR_KEYS)
     context = {
         'posts': posts,
         'page_obj': page_obj,
@@ -227,6 +437,7 @@ def follow_index(request):
 
 
 @login_required
+@transaction.atomic
 def profile_follow(request, username):
     author = get_object_or_404(User, username=username)
     if author != request.user:
@@ -237,6 +448,7 @@ def profile_follow(request, username):
 
 
 @login_required
+@transaction.atomic
 def profile_unfollow(request, username):
     author = get_object_or_404(User, username=username)
     Follow.objects.filter(author=author,
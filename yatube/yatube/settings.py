@@ -10,16 +10,95 @@ SECRET_KEY = 'r^4=g3(qmuf-%l-c9)m$7rno$d@7+)2*@+ugv)puu!sr6$(5@d'
 
 DEBUG = True
 
+# Один кеш на все процессы хоста (core.cache.SQLiteCache): сброс версий
+# страниц виден всем воркерам. Файл лучше держать на tmpfs (/dev/shm).
+# core.cache.LocMemCache - кеш в памяти процесса, bench_cache - сравнение.
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': 'core.cache.SQLiteCache',
+        'LOCATION': os.environ.get(
+            'CACHE_LOCATION', os.path.join(BASE_DIR, 'cache.sqlite3')),
+        'OPTIONS': {
+            'MAX_ENTRIES': 100000,
+            'MAX_SIZE': 256 * 1024 * 1024,
+        },
     }
 }
 
+# Тесты получают свой временный кеш (core.benchmark.private_cache).
+TEST_RUNNER = 'core.test_runner.DiscoverRunner'
+
+# Keyset-пагинация лент по курсору вместо ?page=N (старые ссылки работают).
+POSTS_CURSOR_PAGINATION = False
+# Потоки, создающие миниатюры после загрузки; 0 - сразу в запросе.
+POSTS_THUMBNAIL_WORKERS = 2
+
 INTERNAL_IPS = [
     '127.0.0.1',
 ]
 
+# Кто может читать /metrics (Prometheus).
+METRICS_ALLOWED_IPS = INTERNAL_IPS
+# Каталог, где процессы одного хоста (воркеры gunicorn/uWSGI) оставляют
+# свои значения, чтобы /metrics отдавал их сумму; None - только свой
+# процесс. Файлы обновляются не чаще METRICS_FLUSH_INTERVAL секунд;
+# процесс удаляет свой файл при выходе, /metrics - файлы завершившихся
+# процессов. Номера процессов после перезапуска повторяются, поэтому
+# при выкладке каталог нужно очищать до запуска воркеров.
+METRICS_MULTIPROCESS_DIR = os.environ.get('METRICS_MULTIPROCESS_DIR')
+METRICS_FLUSH_INTERVAL = 1
+
+# Журнал SQL-запросов дольше порога и случайной доли остальных
+# (core.slow_queries, отчет - slow_queries_report). SLOW_QUERY_STORE:
+# 'sqlite' - таблица в файле SLOW_QUERY_PATH, 'file' - JSON-строки с
+# ротацией. Без SLOW_QUERY_PATH журнал выключен.
+SLOW_QUERY_PATH = os.environ.get('SLOW_QUERY_PATH')
+SLOW_QUERY_STORE = os.environ.get('SLOW_QUERY_STORE', 'sqlite')
+SLOW_QUERY_THRESHOLD_MS = 100
+SLOW_QUERY_SAMPLE_RATE = 0.01
+# Предел журнала: для 'sqlite' - число записей, для 'file' - размер
+# файла и число ротированных копий.
+SLOW_QUERY_MAX_RECORDS = 100000
+SLOW_QUERY_MAX_BYTES = 10 * 1024 * 1024
+SLOW_QUERY_BACKUP_COUNT = 5
+# Место вызова ищется сначала в этих модулях.
+SLOW_QUERY_CALL_SITE_MODULES = ('posts.views', 'api.views')
+
+# Профилирование отдельных запросов под cProfile (core.profiling):
+# сотрудник передает ключ со страницы «Профили запросов» админки в
+# параметре PROFILING_PARAMETER или заголовке X-Profile-Token. Файлы
+# .pstats лежат в PROFILING_DIR вне MEDIA_ROOT.
+PROFILING_DIR = os.environ.get('PROFILING_DIR',
+                               os.path.join(BASE_DIR, 'profiles'))
+PROFILING_PARAMETER = '_profile'
+PROFILING_HEADER = 'HTTP_X_PROFILE_TOKEN'
+PROFILING_TOKEN_MAX_AGE = 12 * 60 * 60
+PROFILING_TOP = 40
+
+# Фоновая выборка стеков (core.sampling): SAMPLING_RATE раз в секунду
+# каждый процесс снимает стеки потоков, обрабатывающих запросы, и раз в
+# SAMPLING_FLUSH_INTERVAL секунд пишет их в SAMPLING_DIR/<pid>.folded
+# для flamegraph.pl и speedscope; общий файл - collapse_stacks.
+# Без SAMPLING_DIR выборка выключена. Накладные расходы - bench_sampling:
+# одна выборка около 0,1 мс, при 100 Гц прирост в пределах шума (~1%),
+# при 1000 Гц - около 2,5%.
+SAMPLING_DIR = os.environ.get('SAMPLING_DIR')
+SAMPLING_RATE = int(os.environ.get('SAMPLING_RATE', 100))
+SAMPLING_FLUSH_INTERVAL = 60
+SAMPLING_REQUESTS_ONLY = True
+
+# Диагностика памяти через tracemalloc (core.memory): тем же ключом, что
+# и для профилирования, в параметре MEMORY_PARAMETER или заголовке
+# X-Memory-Token. С MEMORY_SNAPSHOT_INTERVAL (секунды) трассировка идет
+# постоянно, и каждый процесс с этим интервалом сохраняет прирост по
+# местам выделения и представлениям; 0 - выключено. Сводка -
+# memory_report. MEMORY_TRACEBACK_FRAMES больше 1 точнее, но дороже.
+MEMORY_PARAMETER = '_memory'
+MEMORY_HEADER = 'HTTP_X_MEMORY_TOKEN'
+MEMORY_SNAPSHOT_INTERVAL = int(os.environ.get('MEMORY_SNAPSHOT_INTERVAL', 0))
+MEMORY_TRACEBACK_FRAMES = 1
+MEMORY_TOP = 20
+
 ALLOWED_HOSTS = [
     'localhost',
     '127.0.0.1',
@@ -35,6 +114,7 @@ INSTALLED_APPS = [
     'core.apps.CoreConfig',
     'users.apps.UsersConfig',
     'posts.apps.PostsConfig',
+    'api.apps.ApiConfig',
     'django.contrib.admin',
     'django.contrib.auth',
     'django.contrib.contenttypes',
@@ -42,10 +122,10 @@ INSTALLED_APPS = [
     'django.contrib.messages',
     'django.contrib.staticfiles',
     'sorl.thumbnail',
-    'debug_toolbar',
 ]
 
 MIDDLEWARE = [
+    'core.timing.ServerTimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -53,9 +133,34 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
-    'debug_toolbar.middleware.DebugToolbarMiddleware',
+    'core.memory.MemoryDiagnosticsMiddleware',
+    'core.profiling.ProfilingMiddleware',
 ]
 
+# Панель отладки тяжелая: только при разработке.
+if DEBUG:
+    INSTALLED_APPS.append('debug_toolbar')
+    MIDDLEWARE.append('debug_toolbar.middleware.DebugToolbarMiddleware')
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        # Строка на запрос от ServerTimingMiddleware; при разработке
+        # запросы и так видны в панели отладки и выводе runserver.
+        'core.timing': {
+            'handlers': ['console'],
+            'level': 'WARNING' if DEBUG else 'INFO',
+            'propagate': False,
+        },
+    },
+}
+
 ROOT_URLCONF = 'yatube.urls'
 LOGIN_URL = 'users:login'
 LOGIN_REDIRECT_URL = 'posts:index'